@@ -0,0 +1,115 @@
+from collections import namedtuple
+from math import isqrt
+
+from .constants import MAX_UINT64
+
+
+class LogicError(Exception):
+    """ Raised where the same operation fails the program on chain """
+
+
+# margin is final - initial side of the assertion, the check passes if it is not negative
+CheckResult = namedtuple('CheckResult', ['passed', 'margin'])
+
+
+# uint64 operations with the same failure conditions as the AVM
+
+def add(a, b):
+    value = a + b
+    if value > MAX_UINT64:
+        raise LogicError("+ overflowed")
+    return value
+
+
+def sub(a, b):
+    if b > a:
+        raise LogicError("- would result negative")
+    return a - b
+
+
+def mul(a, b):
+    value = a * b
+    if value > MAX_UINT64:
+        raise LogicError("* overflowed")
+    return value
+
+
+def div(a, b):
+    if b == 0:
+        raise LogicError("/ 0")
+    return a // b
+
+
+# Byte math (b*, b/) is done with Python ints, the values used by the contract never exceed the 64 byte input limit.
+
+def bsub(a, b):
+    if b > a:
+        raise LogicError("byte math would have negative result")
+    return a - b
+
+
+def bdiv(a, b):
+    if b == 0:
+        raise LogicError("division by zero")
+    return a // b
+
+
+def bsqrt(value):
+    return isqrt(value)
+
+
+def btoi(value):
+    if value > MAX_UINT64:
+        raise LogicError("btoi arg too long")
+    return value
+
+
+def calculate_fixed_input_fee_amounts(input_amount, total_fee_share, protocol_fee_ratio):
+    total_fee = div(mul(input_amount, total_fee_share), 10000)
+    protocol_fee = div(total_fee, protocol_fee_ratio)
+    poolers_fee = sub(total_fee, protocol_fee)
+    return total_fee, poolers_fee, protocol_fee
+
+
+def calculate_fixed_output_fee_amounts(swap_amount, total_fee_share, protocol_fee_ratio):
+    input_amount = div(mul(swap_amount, 10000), sub(10000, total_fee_share))
+
+    total_fee = sub(input_amount, swap_amount)
+    protocol_fee = div(total_fee, protocol_fee_ratio)
+    poolers_fee = sub(total_fee, protocol_fee)
+    return total_fee, poolers_fee, protocol_fee
+
+
+def calculate_fixed_input_swap(input_supply, output_supply, swap_amount):
+    # k = input_supply * output_supply
+    # output_amount = output_supply - (k / (input_supply + swap_amount))
+    k = input_supply * output_supply
+    # +1 for Round Up
+    output_amount = sub(output_supply, add(btoi(bdiv(k, add(input_supply, swap_amount))), 1))
+    return output_amount
+
+
+def calculate_fixed_output_swap(input_supply, output_supply, output_amount):
+    # k = input_supply * output_supply
+    # swap_amount = (k / (output_supply - asset_output_amount)) - input_supply
+    k = input_supply * output_supply
+    # +1 for Round Up
+    swap_amount = sub(add(btoi(bdiv(k, sub(output_supply, output_amount))), 1), input_supply)
+    return swap_amount
+
+
+def check_invariant(initial_asset_1_reserves, initial_asset_2_reserves, final_asset_1_reserves, final_asset_2_reserves, asset_1_poolers_fee_amount=0, asset_2_poolers_fee_amount=0):
+    # Initial K <= Final K without fees
+    initial_k = initial_asset_1_reserves * initial_asset_2_reserves
+    final_k = sub(final_asset_1_reserves, asset_1_poolers_fee_amount) * sub(final_asset_2_reserves, asset_2_poolers_fee_amount)
+    margin = final_k - initial_k
+    return CheckResult(margin >= 0, margin)
+
+
+def check_pool_token_value(initial_asset_1_reserves, initial_asset_2_reserves, initial_issued_pool_tokens, final_asset_1_reserves, final_asset_2_reserves, final_issued_pool_tokens):
+    # (sqrt(initial_k) / initial_issued_pool_tokens) <= (sqrt(final_k) / final_issued_pool_tokens)
+    # (initial_k * final_issued_pool_tokens**2) <= (final_k * initial_issued_pool_tokens**2)
+    tmp_initial = initial_asset_1_reserves * initial_asset_2_reserves * final_issued_pool_tokens * final_issued_pool_tokens
+    tmp_final = final_asset_1_reserves * final_asset_2_reserves * initial_issued_pool_tokens * initial_issued_pool_tokens
+    margin = tmp_final - tmp_initial
+    return CheckResult(margin >= 0, margin)
@@ -0,0 +1,212 @@
+"""
+Arbitrage cycles between the pools of a PoolStateStore.
+
+A cycle is profitable for small amounts if the product of its marginal prices (after fees) is above 1, so the cycles are
+found as negative cycles of the edge weights -log(marginal price) with Bellman-Ford.
+
+A fixed-input swap is out = (1 - f) * x * R_out / (R_in + (1 - f) * x), which has the form A * x / (B + C * x),
+and a chain of swaps has the same form. The profit A * x / (B + C * x) - x is max at x = (sqrt(A * B) - B) / C.
+The closed form ignores the rounding of the contract, the input amount is refined with the exact contract math.
+"""
+from collections import namedtuple
+from math import isqrt
+
+import numpy as np
+
+from .routing import RouteGraph
+
+# profit is in the units of the input asset of the route, the route starts and ends with the same asset
+Opportunity = namedtuple('Opportunity', ['profit', 'route'])
+
+FEE_SCALE = 10000
+
+
+class ArbitrageDetector:
+    """
+    Finds and ranks arbitrage cycles of up to max_length pools.
+
+    scan() searches the whole graph. update(addresses) is for the next blocks: it refreshes the changed pools,
+    re-prices the known cycles and searches the new cycles only through the changed pools.
+    """
+
+    def __init__(self, store, max_length=4, start_asset_ids=None, min_profit=1):
+        self.store = store
+        self.max_length = max_length
+        self.start_asset_ids = start_asset_ids
+        self.min_profit = min_profit
+        self.graph = None
+        # Known profitable cycles, tuples of edges starting with the min edge
+        self.cycles = set()
+
+    def _get_weights(self):
+        graph = self.graph
+        fee = graph.edge_total_fee_share.astype(np.float64) / FEE_SCALE
+        return np.log(graph.edge_input_supply.astype(np.float64)) - np.log(graph.edge_output_supply.astype(np.float64)) - np.log1p(-fee)
+
+    def _get_cycle_coefficients(self, edges):
+        graph = self.graph
+        a, b, c = 1, 1, 0
+        for edge in edges:
+            fee_factor = FEE_SCALE - int(graph.edge_total_fee_share[edge])
+            hop_a = fee_factor * int(graph.edge_output_supply[edge])
+            hop_b = FEE_SCALE * int(graph.edge_input_supply[edge])
+            # hop(chain(x)) = hop_a * a * x / (hop_b * b + (hop_b * c + fee_factor * a) * x)
+            a, b, c = hop_a * a, hop_b * b, hop_b * c + fee_factor * a
+        return a, b, c
+
+    def _get_profit(self, edges, input_amount):
+        output_amount = self.graph._get_output_amount(edges, input_amount)
+        return None if output_amount is None else output_amount - input_amount
+
+    def _get_optimal_input(self, edges):
+        # Returns the input amount with the max exact profit, None if the cycle is not profitable
+        a, b, c = self._get_cycle_coefficients(edges)
+        if a <= b:
+            return None
+        estimate = max((isqrt(a * b) - b) // c, 1)
+
+        # The exact profit is concave apart from the rounding, ternary search around the estimate
+        low, high = estimate // 2, estimate * 2
+        best_profit, best_input = -1, None
+        for input_amount in (estimate, low, high):
+            profit = self._get_profit(edges, input_amount)
+            if profit is not None and profit > best_profit:
+                best_profit, best_input = profit, input_amount
+        while high - low > 2:
+            left = low + (high - low) // 3
+            right = high - (high - low) // 3
+            left_profit = self._get_profit(edges, left)
+            right_profit = self._get_profit(edges, right)
+            for input_amount, profit in ((left, left_profit), (right, right_profit)):
+                if profit is not None and profit > best_profit:
+                    best_profit, best_input = profit, input_amount
+            if left_profit is None or (right_profit is not None and left_profit < right_profit):
+                low = left
+            else:
+                high = right
+        if best_profit < self.min_profit:
+            return None
+        return best_input
+
+    def _add_cycle(self, edges):
+        # Cycles with repeated assets are made of smaller cycles, they are left out
+        if len(edges) > self.max_length or len({self.graph.edge_src[edge] for edge in edges}) != len(edges):
+            return
+        i = edges.index(min(edges))
+        self.cycles.add(tuple(edges[i:] + edges[:i]))
+
+    def _get_predecessor_cycles(self, predecessors):
+        # Returns the cycles of the predecessor edges, each asset has at most one predecessor edge
+        graph = self.graph
+        states = np.zeros(len(predecessors), dtype=np.int8)
+        cycles = []
+        for start in range(len(predecessors)):
+            path = []
+            asset = start
+            while asset >= 0 and states[asset] == 0:
+                states[asset] = 1
+                path.append(asset)
+                edge = predecessors[asset]
+                asset = graph.edge_src[edge] if edge >= 0 else -1
+            if asset >= 0 and states[asset] == 1:
+                cycle_assets = path[path.index(asset):]
+                cycles.append([predecessors[a] for a in reversed(cycle_assets)])
+            for a in path:
+                states[a] = 2
+        return cycles
+
+    def scan(self):
+        """ Searches the whole graph, returns the Opportunities by profit """
+        self.graph = RouteGraph(self.store)
+        self.cycles = set()
+        graph = self.graph
+        asset_count = len(graph.asset_ids)
+        if not asset_count:
+            return []
+        weights = self._get_weights()
+
+        # Bellman-Ford from a virtual source connected to all assets, the cycles of the predecessors are negative.
+        # It does not converge if there is a negative cycle, the cycles longer than max_length are not needed anyway.
+        distances = np.zeros(asset_count)
+        predecessors = np.full(asset_count, -1)
+        for _ in range(4 * self.max_length):
+            candidates = distances[graph.edge_src] + weights
+            order = np.lexsort((candidates, graph.edge_dst))
+            dst = graph.edge_dst[order]
+            first = np.insert(dst[1:] != dst[:-1], 0, True)
+            edges, dst = order[first], dst[first]
+            improved = candidates[edges] < distances[dst] - 1e-12
+            if not improved.any():
+                break
+            distances[dst[improved]] = candidates[edges[improved]]
+            predecessors[dst[improved]] = edges[improved]
+            for cycle in self._get_predecessor_cycles(predecessors):
+                self._add_cycle([int(edge) for edge in cycle])
+        return self.get_opportunities()
+
+    def _find_cycle(self, edge, weights):
+        # Returns the most negative cycle through the edge, a path back from its destination to its source
+        graph = self.graph
+        asset_count = len(graph.asset_ids)
+        src, dst = graph.edge_src[edge], graph.edge_dst[edge]
+        allowed = graph.edge_pool != graph.edge_pool[edge]
+        distances = np.full(asset_count, np.inf)
+        distances[dst] = 0
+        layers = []
+        best = None
+        for length in range(1, self.max_length):
+            candidates = np.where(allowed, distances[graph.edge_src] + weights, np.inf)
+            order = np.lexsort((candidates, graph.edge_dst))
+            edge_dst = graph.edge_dst[order]
+            first = np.insert(edge_dst[1:] != edge_dst[:-1], 0, True)
+            edges = order[first]
+            layer = np.full(asset_count, -1)
+            distances = np.full(asset_count, np.inf)
+            reached = np.isfinite(candidates[edges])
+            layer[graph.edge_dst[edges[reached]]] = edges[reached]
+            distances[graph.edge_dst[edges[reached]]] = candidates[edges[reached]]
+            layers.append(layer)
+            weight = distances[src] + weights[edge]
+            if weight < 0 and (best is None or weight < best[0]):
+                best = (weight, length)
+        if best is None:
+            return None
+
+        path = []
+        asset = src
+        for layer in reversed(layers[:best[1]]):
+            path.append(int(layer[asset]))
+            asset = graph.edge_src[layer[asset]]
+        return [edge] + path[::-1]
+
+    def update(self, addresses):
+        """ Updates the changed pools, returns the Opportunities by profit """
+        if self.graph is None or not self.graph.update_pools(self.store, addresses):
+            return self.scan()
+        weights = self._get_weights()
+        for address in addresses:
+            for edge in self.graph.pool_edges[address]:
+                cycle = self._find_cycle(edge, weights)
+                if cycle is not None:
+                    self._add_cycle(cycle)
+        return self.get_opportunities()
+
+    def get_opportunities(self):
+        """ Prices the known cycles at every start asset, the unprofitable cycles are dropped """
+        graph = self.graph
+        opportunities = []
+        for cycle in list(self.cycles):
+            a, b, _ = self._get_cycle_coefficients(cycle)
+            if a <= b:
+                self.cycles.discard(cycle)
+                continue
+            for i in range(len(cycle)):
+                edges = cycle[i:] + cycle[:i]
+                if self.start_asset_ids is not None and int(graph.asset_ids[graph.edge_src[edges[0]]]) not in self.start_asset_ids:
+                    continue
+                input_amount = self._get_optimal_input(edges)
+                if input_amount is not None:
+                    route = graph._get_route(edges, input_amount)
+                    opportunities.append(Opportunity(route.output_amount - input_amount, route))
+        opportunities.sort(key=lambda opportunity: opportunity.profit, reverse=True)
+        return opportunities
@@ -1,9 +1,11 @@
-from algojig import TealishProgram
 from algosdk.logic import get_application_address
 
-amm_pool_template = TealishProgram('contracts/pool_template.tl')
-amm_approval_program = TealishProgram('contracts/amm_approval.tl')
-amm_clear_state_program = TealishProgram('contracts/amm_clear_state.tl')
+from .program_cache import LazyTealishProgram
+
+# Programs are compiled on first use
+amm_pool_template = LazyTealishProgram('contracts/pool_template.tl')
+amm_approval_program = LazyTealishProgram('contracts/amm_approval.tl')
+amm_clear_state_program = LazyTealishProgram('contracts/amm_clear_state.tl')
 
 METHOD_BOOTSTRAP = "bootstrap"
 METHOD_ADD_LIQUIDITY = "add_liquidity"
@@ -1,4 +1,8 @@
+import os
+import sys
+import time
 import unittest
+from copy import deepcopy
 from decimal import Decimal
 
 from algosdk.encoding import decode_address
@@ -7,9 +11,46 @@ from algosdk.future import transaction
 from .constants import *
 from .utils import get_pool_logicsig_bytecode
 
+# Set to print the ledger snapshot timings of the test classes
+PRINT_LEDGER_SNAPSHOT_TIMINGS = bool(os.environ.get('TINYMAN_LEDGER_SNAPSHOT_TIMINGS'))
+
+
+def copy_ledger(ledger):
+    """
+    Deep copy of the ledger state, the app programs are immutable and shared with the copy.
+    The sqlite connections of the last evaluation are closed (the next evaluation opens new ones), the copy has None.
+    """
+    memo = {id(app['approval_program']): app['approval_program'] for app in ledger.apps.values()}
+    for name in ('db', 'block_db'):
+        connection = getattr(ledger, name, None)
+        if connection is not None:
+            memo[id(connection)] = None
+    return deepcopy(ledger, memo)
+
+
+class LedgerSnapshot:
+
+    def __init__(self, ledger, attributes, build_time):
+        self.ledger = copy_ledger(ledger)
+        self.attributes = attributes
+        self.build_time = build_time
+        self.restore_count = 0
+        self.restore_time = 0
+
+    def restore(self, test_case):
+        start = time.perf_counter()
+        test_case.ledger = copy_ledger(self.ledger)
+        for name, value in self.attributes.items():
+            setattr(test_case, name, value)
+        self.restore_count += 1
+        self.restore_time += time.perf_counter() - start
 
-class BaseTestCase(unittest.TestCase):
-    maxDiff = None
+
+class LedgerHelpers:
+    """
+    Ledger setup and transaction helpers of the tests, they use the ledger, sp, account and asset attributes of the instance.
+    A plain class so that the harnesses which are not test cases (tests.fuzzing) can use them too.
+    """
 
     def create_amm_app(self):
         if self.app_creator_address not in self.ledger.accounts:
@@ -95,7 +136,8 @@ class BaseTestCase(unittest.TestCase):
                 b'asset_2_protocol_fees': 0,
             }
         )
-        self.assertEqual(self.ledger.get_account_balance(pool_address)[0], minimum_balance)
+        balance = self.ledger.get_account_balance(pool_address)[0]
+        assert balance == minimum_balance, f'{balance} != {minimum_balance}'
         return pool_address, pool_token_asset_id
 
     def set_initial_pool_liquidity(self, pool_address, asset_1_id, asset_2_id, pool_token_asset_id, asset_1_reserves, asset_2_reserves, liquidity_provider_address=None):
@@ -287,3 +329,40 @@ class BaseTestCase(unittest.TestCase):
     @classmethod
     def sign_txns(cls, txns, secret_key):
         return [txn.sign(secret_key) for txn in txns]
+
+
+class BaseTestCase(LedgerHelpers, unittest.TestCase):
+    maxDiff = None
+    ledger_snapshot = None
+
+    @classmethod
+    def tearDownClass(cls):
+        snapshot = cls.__dict__.get('ledger_snapshot')
+        if PRINT_LEDGER_SNAPSHOT_TIMINGS and snapshot is not None and snapshot.restore_count:
+            print(
+                f'\n{cls.__name__}: ledger built once in {snapshot.build_time * 1000:.3f} ms, '
+                f'restored {snapshot.restore_count} times in {snapshot.restore_time / snapshot.restore_count * 1000:.3f} ms on average',
+                file=sys.stderr
+            )
+        # setUpClass creates new accounts on every run
+        cls.ledger_snapshot = None
+
+    def reset_ledger(self):
+        """
+        Sets a fresh copy of the ledger built by the build_ledger method of the test class.
+        The ledger is built once per test class, the next calls restore a copy of it and the attributes (pool_address etc.) set by build_ledger.
+        """
+        cls = type(self)
+        if getattr(cls, 'build_ledger', None) is None:
+            raise TypeError(f'{cls.__name__} does not define build_ledger, there is no ledger to snapshot.')
+        snapshot = cls.__dict__.get('ledger_snapshot')
+        if snapshot is not None:
+            snapshot.restore(self)
+            return
+
+        start = time.perf_counter()
+        attributes = dict(vars(self))
+        self.build_ledger()
+        build_time = time.perf_counter() - start
+        attributes = {name: value for name, value in vars(self).items() if name != 'ledger' and (name not in attributes or attributes[name] is not value)}
+        cls.ledger_snapshot = LedgerSnapshot(self.ledger, attributes, build_time)
@@ -0,0 +1,348 @@
+"""
+Differential testing of the arithmetic functions of amm_approval.tl against their Python mirror in amm_math.
+
+    python -m tests.differential [--function NAME ...] [--offsets N] [--corpus FILE] [--replay FILE]
+
+The cases are a grid of the arguments near 0, 1, 2^32, 2^63 and 2^64-1, where the uint64 overflows are.
+The compiled subroutines of the functions are copied from contracts/build/amm_approval.teal into a driver app which
+loops over the cases of an app call and logs their results. An evaluation is a group of up to 16 app calls with as
+many cases as the app args and logs allow, the opcode budget is increased with inner app calls when it runs low.
+
+A failing case fails the whole group, so only the cases the mirror expects to succeed are batched. If a batch fails
+anyway it is bisected to the failing cases. The cases the mirror expects to fail are evaluated one by one and the
+error of the AVM must contain the message of the LogicError.
+Mismatches are appended to a JSON lines corpus which can be evaluated again with --replay.
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from collections import namedtuple
+
+from algojig import TealProgram, get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from .amm_math import (LogicError, calculate_fixed_input_fee_amounts, calculate_fixed_input_swap,
+                       calculate_fixed_output_fee_amounts, calculate_fixed_output_swap)
+from .constants import MAX_UINT64, PROTOCOL_FEE_RATIO, TOTAL_FEE_SHARE
+from .profiler import AMM_APPROVAL_TEAL_FILENAME
+
+# arity is the number of uint64 arguments, result_count the number of uint64 results
+ArithmeticFunction = namedtuple('ArithmeticFunction', ['name', 'arity', 'result_count', 'mirror'])
+
+FUNCTIONS = {function.name: function for function in [
+    ArithmeticFunction('calculate_fixed_input_fee_amounts', 1, 3, calculate_fixed_input_fee_amounts),
+    ArithmeticFunction('calculate_fixed_output_fee_amounts', 1, 3, calculate_fixed_output_fee_amounts),
+    ArithmeticFunction('calculate_fixed_input_swap', 3, 1, lambda *args: (calculate_fixed_input_swap(*args[:3]),)),
+    ArithmeticFunction('calculate_fixed_output_swap', 3, 1, lambda *args: (calculate_fixed_output_swap(*args[:3]),)),
+]}
+
+# The fee functions read total_fee_share and protocol_fee_ratio from the local state of Txn.Accounts[1],
+# the other functions ignore them.
+DiffCase = namedtuple('DiffCase', ['function', 'args', 'total_fee_share', 'protocol_fee_ratio'])
+
+# kind is 'result', 'outcome' or 'error' (both fail with different errors).
+# expected and actual are the result lists or the error messages.
+Mismatch = namedtuple('Mismatch', ['case', 'kind', 'expected', 'actual'])
+
+BOUNDARIES = (0, 1, 2**32, 2**63, MAX_UINT64)
+FEE_PARAMETERS = [(total_fee_share, protocol_fee_ratio) for total_fee_share in (1, TOTAL_FEE_SHARE, 100, 10_000) for protocol_fee_ratio in (3, PROTOCOL_FEE_RATIO, 10)]
+
+DRIVER_APP_ID = 20
+MAX_GROUP_SIZE = 16
+MAX_INNER_TRANSACTIONS = 256
+MAX_APP_ARGS_SIZE = 2048
+MAX_LOG_SIZE = 1024
+# The fees of a group are paid from this balance, it is set again before every group
+USER_BALANCE = 100_000_000
+# The budget is increased before a case if it is lower than this, a case costs less than 100
+MIN_CASE_BUDGET = 200
+
+# Scratch slots of the driver, the subroutines use lower slots
+FUNCTION_NAME_SLOT = 200
+ARGUMENTS_SLOT = 201
+RESULTS_SLOT = 202
+OFFSET_SLOT = 203
+
+
+def get_boundary_values(offsets=1):
+    """ Returns the sorted uint64 values within offsets of the boundaries """
+    values = {boundary + offset for boundary in BOUNDARIES for offset in range(-offsets, offsets + 1)}
+    return sorted(value for value in values if 0 <= value <= MAX_UINT64)
+
+
+def generate_boundary_cases(function_names=None, offsets=1):
+    """ Returns the cases of the boundary grid, every combination of the boundary values for each function """
+    values = get_boundary_values(offsets)
+    cases = []
+    for name in function_names or FUNCTIONS:
+        function = FUNCTIONS[name]
+        fee_parameters = FEE_PARAMETERS if name.endswith('fee_amounts') else [(TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)]
+        for total_fee_share, protocol_fee_ratio in fee_parameters:
+            for args in itertools.product(values, repeat=function.arity):
+                cases.append(DiffCase(name, args, total_fee_share, protocol_fee_ratio))
+    return cases
+
+
+def evaluate_mirror(case):
+    """ Returns the results of the Python mirror as a tuple, or the LogicError """
+    try:
+        return tuple(FUNCTIONS[case.function].mirror(*case.args, case.total_fee_share, case.protocol_fee_ratio))
+    except LogicError as e:
+        return e
+
+
+def get_subroutine(teal, name):
+    """ Returns the lines of the compiled subroutine of the Tealish function, from its label to its retsub """
+    lines = teal.splitlines()
+    start = lines.index(f'__func__{name}:')
+    end = next(i for i in range(start, len(lines)) if lines[i].strip() == 'retsub')
+    subroutine = lines[start:end + 1]
+    if any(line.strip().split(' ')[0] in ('b', 'bz', 'bnz') for line in subroutine):
+        raise ValueError(f'{name} has branches, only straight line subroutines can be copied.')
+    return subroutine
+
+
+def build_driver_teal(approval_teal):
+    """ Returns the TEAL of the driver app with the subroutines of the functions copied from the approval program """
+    teal = [
+        '#pragma version 7',
+        '// Differential test driver of the arithmetic functions, see tests/differential.py',
+        'txna ApplicationArgs 0',
+        f'store {FUNCTION_NAME_SLOT}',
+        'txna ApplicationArgs 1',
+        f'store {ARGUMENTS_SLOT}',
+        'pushbytes ""',
+        f'store {RESULTS_SLOT}',
+        'pushint 0',
+        f'store {OFFSET_SLOT}',
+        'driver__loop:',
+        f'load {OFFSET_SLOT}',
+        f'load {ARGUMENTS_SLOT}',
+        'len',
+        '<',
+        'bz driver__done',
+        'global OpcodeBudget',
+        f'pushint {MIN_CASE_BUDGET}',
+        '<',
+        'bz driver__call',
+        'callsub __func__increase_cost_budget',
+        'driver__call:',
+    ]
+    for name in FUNCTIONS:
+        teal += [f'load {FUNCTION_NAME_SLOT}', f'pushbytes "{name}"', '==', f'bnz driver__{name}']
+    teal.append('err')
+
+    for name, function in FUNCTIONS.items():
+        teal.append(f'driver__{name}:')
+        for i in range(function.arity):
+            teal += [f'load {ARGUMENTS_SLOT}', f'load {OFFSET_SLOT}', f'pushint {i * 8}', '+', 'extract_uint64']
+        teal.append(f'callsub __func__{name}')
+        # The first result is on the top of the stack
+        teal.append('itob')
+        for _ in range(function.result_count - 1):
+            teal += ['swap', 'itob', 'concat']
+        teal += [
+            f'load {RESULTS_SLOT}', 'swap', 'concat', f'store {RESULTS_SLOT}',
+            f'load {OFFSET_SLOT}', f'pushint {function.arity * 8}', '+', f'store {OFFSET_SLOT}',
+            'b driver__loop',
+        ]
+
+    teal += ['driver__done:', f'load {RESULTS_SLOT}', 'log', 'pushint 1', 'return']
+    for name in [*FUNCTIONS, 'increase_cost_budget']:
+        teal += [''] + get_subroutine(approval_teal, name)
+    return '\n'.join(teal) + '\n'
+
+
+def get_call_capacity(function):
+    """ Returns the maximum number of cases of an app call, limited by the app args and the log size """
+    return min((MAX_APP_ARGS_SIZE - len(function.name)) // (function.arity * 8), MAX_LOG_SIZE // (function.result_count * 8))
+
+
+def pack_calls(cases):
+    """ Returns the cases split into app calls, the cases of an app call have the same function and fee parameters """
+    calls = []
+    key = lambda case: (case.function, case.total_fee_share, case.protocol_fee_ratio)
+    for _, key_cases in itertools.groupby(sorted(cases, key=key), key=key):
+        key_cases = list(key_cases)
+        capacity = get_call_capacity(FUNCTIONS[key_cases[0].function])
+        calls += [key_cases[i:i + capacity] for i in range(0, len(key_cases), capacity)]
+    return calls
+
+
+class DifferentialHarness:
+    """
+    A ledger with the driver app and an account per fee parameter pair with the parameters in its local state.
+    """
+
+    def __init__(self, approval_teal_filename=AMM_APPROVAL_TEAL_FILENAME):
+        with open(approval_teal_filename) as f:
+            self.driver_program = TealProgram(teal=build_driver_teal(f.read()))
+        self.sp = get_suggested_params()
+        self.user_sk, self.user_addr = generate_account()
+        self.evaluation_count = 0
+
+        self.ledger = JigLedger()
+        self.ledger.set_account_balance(self.user_addr, USER_BALANCE)
+        self.ledger.create_app(app_id=DRIVER_APP_ID, approval_program=self.driver_program, creator=self.user_addr, local_ints=2, local_bytes=0)
+        # Min balance and the extra min balance of the applications created by increase_cost_budget
+        self.ledger.set_account_balance(get_application_address(DRIVER_APP_ID), 200_000)
+        self.fee_accounts = {}
+
+    def get_fee_account(self, total_fee_share, protocol_fee_ratio):
+        address = self.fee_accounts.get((total_fee_share, protocol_fee_ratio))
+        if address is None:
+            _, address = generate_account()
+            self.ledger.set_account_balance(address, 1_000_000)
+            self.ledger.set_local_state(
+                address=address,
+                app_id=DRIVER_APP_ID,
+                state={
+                    b'total_fee_share': total_fee_share,
+                    b'protocol_fee_ratio': protocol_fee_ratio,
+                }
+            )
+            self.fee_accounts[(total_fee_share, protocol_fee_ratio)] = address
+        return address
+
+    def evaluate_group(self, calls):
+        """ Evaluates the calls in a group, returns the results of the cases by the case or raises LogicEvalError """
+        txn_group = []
+        for i, call_cases in enumerate(calls):
+            case = call_cases[0]
+            txn_group.append(
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=DRIVER_APP_ID,
+                    app_args=[case.function, b''.join(arg.to_bytes(8, 'big') for call_case in call_cases for arg in call_case.args)],
+                    accounts=[self.get_fee_account(case.total_fee_share, case.protocol_fee_ratio)],
+                    note=i.to_bytes(1, 'big'),
+                )
+            )
+            txn_group[-1].fee = 0
+        # The first transaction pays the fees of the group and the inner transactions
+        txn_group[0].fee = (len(txn_group) + MAX_INNER_TRANSACTIONS) * self.sp.min_fee
+        txn_group = transaction.assign_group_id(txn_group)
+
+        self.evaluation_count += 1
+        self.ledger.set_account_balance(self.user_addr, USER_BALANCE)
+        block = self.ledger.eval_transactions([txn.sign(self.user_sk) for txn in txn_group])
+
+        results = {}
+        for call_cases, txn in zip(calls, block[b'txns']):
+            log = txn[b'dt'][b'lg'][0]
+            values = [int.from_bytes(log[i:i + 8], 'big') for i in range(0, len(log), 8)]
+            result_count = FUNCTIONS[call_cases[0].function].result_count
+            for i, case in enumerate(call_cases):
+                results[case] = tuple(values[i * result_count:(i + 1) * result_count])
+        return results
+
+    def evaluate(self, cases):
+        """ Returns the results of the cases by the case, the results of the failing cases are the LogicEvalErrors """
+        results = {}
+        calls = pack_calls(cases)
+        for i in range(0, len(calls), MAX_GROUP_SIZE):
+            group_cases = [case for call_cases in calls[i:i + MAX_GROUP_SIZE] for case in call_cases]
+            results.update(self._bisect(group_cases))
+        return results
+
+    def _bisect(self, cases):
+        try:
+            return self.evaluate_group(pack_calls(cases))
+        except LogicEvalError as e:
+            if len(cases) == 1:
+                return {cases[0]: e}
+        middle = len(cases) // 2
+        results = self._bisect(cases[:middle])
+        results.update(self._bisect(cases[middle:]))
+        return results
+
+
+def compare(case, expected, actual):
+    """ Returns the Mismatch of the mirror result and the chain result of the case, None if they agree """
+    if isinstance(expected, LogicError) and isinstance(actual, LogicEvalError):
+        if str(expected) not in actual.error:
+            return Mismatch(case, 'error', str(expected), actual.error)
+        return None
+    if isinstance(expected, LogicError) or isinstance(actual, LogicEvalError):
+        return Mismatch(case, 'outcome', str(expected) if isinstance(expected, LogicError) else list(expected), actual.error if isinstance(actual, LogicEvalError) else list(actual))
+    if expected != actual:
+        return Mismatch(case, 'result', list(expected), list(actual))
+    return None
+
+
+def run_cases(harness, cases):
+    """ Evaluates the cases with the mirror and on chain, returns the mismatches """
+    expected = {case: evaluate_mirror(case) for case in cases}
+    # Each failing case needs its own evaluation
+    passing_cases = [case for case in cases if not isinstance(expected[case], LogicError)]
+    failing_cases = [case for case in cases if isinstance(expected[case], LogicError)]
+    actual = harness.evaluate(passing_cases)
+    for case in failing_cases:
+        actual.update(harness.evaluate([case]))
+
+    mismatches = []
+    for case in cases:
+        mismatch = compare(case, expected[case], actual[case])
+        if mismatch:
+            mismatches.append(mismatch)
+    return mismatches
+
+
+def write_corpus(filename, mismatches):
+    """ Appends the mismatches to the JSON lines corpus """
+    with open(filename, 'a') as f:
+        for mismatch in mismatches:
+            f.write(json.dumps(dict(mismatch.case._asdict(), args=list(mismatch.case.args), kind=mismatch.kind, expected=mismatch.expected, actual=mismatch.actual)) + '\n')
+
+
+def read_corpus(filename):
+    """ Returns the cases of the corpus """
+    cases = []
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                cases.append(DiffCase(record['function'], tuple(record['args']), record['total_fee_share'], record['protocol_fee_ratio']))
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tests.differential', description='Compares the arithmetic functions of the approval program with the Python mirror.')
+    parser.add_argument('--function', choices=list(FUNCTIONS), action='append', dest='functions', help='the functions to test, all by default')
+    parser.add_argument('--offsets', type=int, default=1, help='the distance of the values from the boundaries')
+    parser.add_argument('--corpus', default='differential_corpus.jsonl', help='the file the mismatches are appended to')
+    parser.add_argument('--replay', metavar='CORPUS', help='evaluate the cases of a corpus instead of the boundary grid')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    cases = read_corpus(args.replay) if args.replay else generate_boundary_cases(args.functions, args.offsets)
+    # The same case can be in a corpus more than once
+    cases = list(dict.fromkeys(cases))
+    harness = DifferentialHarness()
+    mismatches = run_cases(harness, cases)
+    duration = time.perf_counter() - start
+
+    for mismatch in mismatches:
+        print(f'{mismatch.kind.upper()}: {mismatch.case}\n  expected: {mismatch.expected}\n  actual: {mismatch.actual}', file=sys.stderr)
+    if mismatches and not args.replay:
+        write_corpus(args.corpus, mismatches)
+        print(f'The mismatches are appended to {args.corpus}, replay with: python -m tests.differential --replay {args.corpus}', file=sys.stderr)
+
+    print(
+        f'Ran {len(cases)} cases in {harness.evaluation_count} evaluations in {duration:.3f}s, '
+        f'{len(cases) / max(harness.evaluation_count, 1):.1f} cases per evaluation',
+        file=sys.stderr
+    )
+    print('OK' if not mismatches else f'FAILED (mismatches={len(mismatches)})', file=sys.stderr)
+    return 0 if not mismatches else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Streams the asset movements of the AMM app calls out of evaluated blocks.
+
+Each event is a transfer into or out of a pool, labelled with the method of the app call it belongs to:
+    - The inner transfers of the app call (outputs, change, claimed fees, loans) are resolved to amounts and receivers.
+    - The transfers to the pool in the same group (inputs, repayments) belong to the next app call of that pool.
+
+Blocks are walked group by group, nothing is kept beyond the current transaction group.
+"""
+import csv
+from collections import namedtuple
+from itertools import groupby, islice
+
+from algosdk.encoding import encode_address
+
+from .constants import APPLICATION_ID
+
+# Addresses are raw public keys and the method is bytes, they are converted only by the writers.
+Event = namedtuple('Event', ['round', 'txn_index', 'method', 'pool_address', 'asset_id', 'amount', 'sender', 'receiver'])
+
+
+def _get_transfer(fields):
+    # Returns (asset_id, amount, sender, receiver) of pay and axfer transactions, None otherwise
+    txn_type = fields.get(b'type')
+    if txn_type == b'pay':
+        return 0, fields.get(b'amt', 0), fields[b'snd'], fields.get(b'rcv')
+    if txn_type == b'axfer':
+        return fields.get(b'xaid', 0), fields.get(b'aamt', 0), fields[b'snd'], fields.get(b'arcv')
+    return None
+
+
+def _iter_group_events(block_round, group, app_id):
+    # Pending transfers to the pools: [(txn_index, transfer)]
+    pending = []
+
+    def visit(txn_index, txn):
+        fields = txn[b'txn']
+        transfer = _get_transfer(fields)
+        if transfer is not None:
+            pending.append((txn_index, transfer))
+            return
+
+        inner_txns = txn.get(b'dt', {}).get(b'itx', [])
+        if fields.get(b'type') != b'appl' or fields.get(b'apid') != app_id or not fields.get(b'apaa') or not fields.get(b'apat'):
+            # Other apps (i.e. proxies) may transfer to the pools and call the AMM app with inner transactions
+            for inner_txn in inner_txns:
+                yield from visit(txn_index, inner_txn)
+            return
+
+        method = fields[b'apaa'][0]
+        pool_address = fields[b'apat'][0]
+        remaining = []
+        for i, transfer in pending:
+            if transfer[3] == pool_address:
+                yield Event(block_round, i, method, pool_address, *transfer)
+            else:
+                remaining.append((i, transfer))
+        pending[:] = remaining
+
+        for inner_txn in inner_txns:
+            # The inner app calls are the opcode budget increases
+            transfer = _get_transfer(inner_txn[b'txn'])
+            if transfer is not None:
+                yield Event(block_round, txn_index, method, pool_address, *transfer)
+
+    for txn_index, txn in group:
+        yield from visit(txn_index, txn)
+
+
+def iter_events(blocks, app_id=APPLICATION_ID):
+    """
+    Yields the events of the blocks lazily.
+
+    blocks is an iterable of blocks returned by JigLedger.eval_transactions or decoded algod blocks
+    (msgpack.unpackb(data, raw=True), with or without the b'block' wrapper).
+    """
+    for block in blocks:
+        block = block.get(b'block', block)
+        block_round = block.get(b'rnd', 0)
+        txns = enumerate(block.get(b'txns', []))
+        # Ungrouped transactions are groups of one, id() keeps them apart
+        for _, group in groupby(txns, key=lambda item: item[1][b'txn'].get(b'grp') or id(item[1])):
+            yield from _iter_group_events(block_round, group, app_id)
+
+
+def format_event(event):
+    """ Returns the event with the addresses encoded and the method decoded """
+    return event._replace(
+        method=event.method.decode(),
+        pool_address=encode_address(event.pool_address),
+        sender=encode_address(event.sender),
+        receiver=encode_address(event.receiver),
+    )
+
+
+def write_csv(events, file):
+    """ Writes the events to a file object as CSV with a header row, returns the number of events """
+    writer = csv.writer(file)
+    writer.writerow(Event._fields)
+    count = 0
+    for event in events:
+        writer.writerow(format_event(event))
+        count += 1
+    return count
+
+
+def iter_columns(events, chunk_size=10_000):
+    """
+    Yields the events in chunks of columns ({field: [values]}) for columnar writers.
+    i.e. pyarrow.Table.from_pydict(chunk) per chunk
+    """
+    events = iter(events)
+    while True:
+        chunk = list(islice(events, chunk_size))
+        if not chunk:
+            return
+        yield {field: list(values) for field, values in zip(Event._fields, zip(*map(format_event, chunk)))}
@@ -0,0 +1,592 @@
+"""
+Property-based fuzzing of the AMM. Random pools and transaction groups are evaluated with AlgoJig in a process pool
+and the results are compared with the Python mirror of the contract math.
+
+    python -m tests.fuzzing [-j PROCESSES] [-n CASES] [--seed SEED] [--no-shrink] [--replay CASE ...]
+
+Every case is generated from its own seed (--seed + i). A reported case is printed as JSON, --replay evaluates the
+JSON cases and the seeds again. A seed replays the generated case, i.e. the case before it was shrunk.
+A case fails if the group is accepted or rejected unlike the mirror, if the pool state after the group is not the
+one of the mirror, or if the pool properties (the constant product and the pool token value) do not hold.
+Failing cases are shrunk to smaller reserves and amounts which fail in the same way before they are reported.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import unittest
+from collections import Counter, namedtuple
+from concurrent.futures import as_completed
+from math import isqrt
+
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .amm_math import LogicError, add, calculate_fixed_input_fee_amounts, check_invariant, check_pool_token_value, sub
+from .constants import *
+from .core import LedgerHelpers, copy_ledger
+from .pool_state import PoolStateStore
+from .quotes import (get_add_liquidity_quote, get_fixed_input_swap_quote, get_fixed_output_swap_quote,
+                     get_remove_liquidity_quote)
+
+OPERATIONS = (
+    'swap-fixed-input', 'swap-fixed-output',
+    'add-liquidity-flexible', 'add-liquidity-single',
+    'remove-liquidity', 'remove-liquidity-single',
+    'flash-loan', 'flash-swap',
+)
+
+# asset is the input asset of the swaps and the asset of the single modes (1 or 2), None for the other operations.
+# amounts per operation:
+#   swap-fixed-input: (input_amount, min_output)
+#   swap-fixed-output: (input_amount, output_amount)
+#   add-liquidity-flexible: (asset_1_amount, asset_2_amount)
+#   add-liquidity-single: (amount,)
+#   remove-liquidity, remove-liquidity-single: (pool_token_amount,)
+#   flash-loan: (asset_1_amount, asset_2_amount, asset_1_repayment_amount, asset_2_repayment_amount)
+#   flash-swap: (asset_1_output_amount, asset_2_output_amount, asset_1_input_amount, asset_2_input_amount)
+FuzzCase = namedtuple('FuzzCase', ['seed', 'operation', 'asset', 'asset_1_reserves', 'asset_2_reserves', 'total_fee_share', 'protocol_fee_ratio', 'amounts'])
+
+PoolModel = namedtuple('PoolModel', ['asset_1_reserves', 'asset_2_reserves', 'issued_pool_tokens', 'asset_1_protocol_fees', 'asset_2_protocol_fees'])
+
+# kind is 'outcome', 'state', 'property' or 'error' (the group is rejected outside of the program)
+Mismatch = namedtuple('Mismatch', ['case', 'kind', 'expected', 'actual'])
+
+MIN_RESERVES_PRODUCT = (LOCKED_POOL_TOKENS + 1) ** 2
+BLOCK_TIMESTAMP = 1000
+APP_CALL_FEE = 10_000
+
+
+def _random_amount(rng, low, high):
+    """ Returns an int in [low, high], the bounds and the small and large values are more likely than uniform """
+    if high <= low:
+        return low
+    if rng.random() < 0.2:
+        return rng.choice([low, low + 1, high - 1, high])
+    value = rng.getrandbits(rng.randint(1, high.bit_length()))
+    return min(max(value, low), high)
+
+
+def _nearby(rng, value, low, high):
+    """ Returns the value or one of its neighbours in [low, high] """
+    return min(max(value + rng.choice([0, 0, -1, 1]), low), high)
+
+
+def _generate_amounts(rng, operation, asset, asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio):
+    reserves = {1: asset_1_reserves, 2: asset_2_reserves}
+    # The user has MAX_ASSET_AMOUNT of each asset before the initial liquidity
+    balances = {1: MAX_ASSET_AMOUNT - asset_1_reserves, 2: MAX_ASSET_AMOUNT - asset_2_reserves}
+    fees = (total_fee_share, protocol_fee_ratio)
+
+    if operation == 'swap-fixed-input':
+        input_supply, output_supply = reserves[asset], reserves[3 - asset]
+        input_amount = _random_amount(rng, 0, balances[asset])
+        min_output = 0
+        try:
+            output_amount = get_fixed_input_swap_quote(input_supply, output_supply, input_amount, *fees).output_amount
+            min_output = rng.choice([0, _nearby(rng, output_amount, 0, MAX_UINT64)])
+        except LogicError:
+            pass
+        return (input_amount, min_output)
+
+    if operation == 'swap-fixed-output':
+        input_supply, output_supply = reserves[asset], reserves[3 - asset]
+        output_amount = _random_amount(rng, 0, output_supply)
+        try:
+            required_input_amount = get_fixed_output_swap_quote(input_supply, output_supply, output_amount, *fees).input_amount
+            input_amount = rng.choice([required_input_amount, required_input_amount + 1, _random_amount(rng, required_input_amount - 1, balances[asset])])
+            input_amount = min(max(input_amount, 0), balances[asset])
+        except LogicError:
+            input_amount = _random_amount(rng, 0, balances[asset])
+        return (input_amount, output_amount)
+
+    if operation == 'add-liquidity-flexible':
+        return (_random_amount(rng, 0, balances[1]), _random_amount(rng, 0, balances[2]))
+
+    if operation == 'add-liquidity-single':
+        return (_random_amount(rng, 0, balances[asset]),)
+
+    if operation in ('remove-liquidity', 'remove-liquidity-single'):
+        # The user has all the pool tokens except the locked ones
+        return (_random_amount(rng, 0, isqrt(asset_1_reserves * asset_2_reserves) - LOCKED_POOL_TOKENS),)
+
+    if operation == 'flash-loan':
+        amounts = [rng.choice([0, _random_amount(rng, 1, reserves[i])]) for i in (1, 2)]
+        repayment_amounts = []
+        for i, amount in zip((1, 2), amounts):
+            if not amount:
+                repayment_amounts.append(0)
+                continue
+            # The fee without the uint64 overflow check, the contract rejects the loans where it overflows
+            total_fee_amount = amount * total_fee_share // 10000
+            donation_amount = rng.choice([0, 0, -1, _random_amount(rng, 0, balances[i])])
+            repayment_amounts.append(min(max(amount + total_fee_amount + donation_amount, 0), balances[i] + amount))
+        return (*amounts, *repayment_amounts)
+
+    if operation == 'flash-swap':
+        output_amounts = [rng.choice([0, _random_amount(rng, 1, reserves[i])]) for i in (1, 2)]
+        input_amounts = [_random_amount(rng, 0, balances[i] + output_amounts[i - 1]) for i in (1, 2)]
+        # Pay back the other asset like a fixed output swap
+        for i in (1, 2):
+            if output_amounts[i - 1] and not output_amounts[2 - i]:
+                try:
+                    quote = get_fixed_output_swap_quote(reserves[3 - i], reserves[i], output_amounts[i - 1], *fees)
+                    input_amounts[i - 1] = 0
+                    input_amounts[2 - i] = _nearby(rng, quote.input_amount, 0, balances[3 - i])
+                except LogicError:
+                    pass
+        return (*output_amounts, *input_amounts)
+
+    raise ValueError(f'Unknown operation {operation}.')
+
+
+def generate_case(seed):
+    """ Returns the FuzzCase of the seed, the same seed always generates the same case """
+    rng = random.Random(seed)
+    operation = rng.choice(OPERATIONS)
+    asset = rng.choice([1, 2]) if operation in ('swap-fixed-input', 'swap-fixed-output', 'add-liquidity-single', 'remove-liquidity-single') else None
+    asset_1_reserves = _random_amount(rng, 1, MAX_ASSET_AMOUNT)
+    # The initial liquidity must issue more than the locked pool tokens
+    asset_2_reserves = _random_amount(rng, -(-MIN_RESERVES_PRODUCT // asset_1_reserves), MAX_ASSET_AMOUNT)
+    if rng.random() < 0.5:
+        asset_1_reserves, asset_2_reserves = asset_2_reserves, asset_1_reserves
+    total_fee_share = rng.choice([TOTAL_FEE_SHARE, rng.randint(1, 100)])
+    protocol_fee_ratio = rng.choice([PROTOCOL_FEE_RATIO, rng.randint(3, 10)])
+    amounts = _generate_amounts(rng, operation, asset, asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio)
+    return FuzzCase(seed, operation, asset, asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio, amounts)
+
+
+def case_to_json(case):
+    return json.dumps(case._asdict())
+
+
+def case_from_json(text):
+    case = json.loads(text)
+    return FuzzCase(**dict(case, amounts=tuple(case['amounts'])))
+
+
+def parse_replay_case(value):
+    """ Returns the FuzzCase of a --replay argument, a JSON case or a seed """
+    if value.lstrip().startswith('{'):
+        return case_from_json(value)
+    return generate_case(int(value))
+
+
+def is_valid_case(case):
+    """ Returns True if the pool of the case can be set up, the amounts are not checked against the balances """
+    return (
+        1 <= case.asset_1_reserves <= MAX_ASSET_AMOUNT
+        and 1 <= case.asset_2_reserves <= MAX_ASSET_AMOUNT
+        and case.asset_1_reserves * case.asset_2_reserves >= MIN_RESERVES_PRODUCT
+        and 1 <= case.total_fee_share <= 100
+        and 3 <= case.protocol_fee_ratio <= 10
+        and all(0 <= amount <= MAX_UINT64 for amount in case.amounts)
+    )
+
+
+def apply_operation(pool, case):
+    """
+    Returns the PoolModel after the group of the case, with the asserts and the uint64 failures of the contract.
+    Raises LogicError if the group would be rejected by the program.
+    """
+    fees = (case.total_fee_share, case.protocol_fee_ratio)
+    operation = case.operation
+
+    if operation in ('swap-fixed-input', 'swap-fixed-output'):
+        if case.asset == 1:
+            input_supply, output_supply = pool.asset_1_reserves, pool.asset_2_reserves
+        else:
+            input_supply, output_supply = pool.asset_2_reserves, pool.asset_1_reserves
+        if operation == 'swap-fixed-input':
+            input_amount, min_output = case.amounts
+            quote = get_fixed_input_swap_quote(input_supply, output_supply, input_amount, *fees)
+            if quote.output_amount < min_output:
+                raise LogicError('assert(output_amount >= min_output)')
+        else:
+            input_amount, output_amount = case.amounts
+            quote = get_fixed_output_swap_quote(input_supply, output_supply, output_amount, *fees, input_amount=input_amount)
+        input_supply = add(input_supply, add(quote.swap_amount, quote.poolers_fee_amount))
+        output_supply = sub(output_supply, quote.output_amount)
+        if case.asset == 1:
+            return pool._replace(asset_1_reserves=input_supply, asset_2_reserves=output_supply, asset_1_protocol_fees=add(pool.asset_1_protocol_fees, quote.protocol_fee_amount))
+        return pool._replace(asset_1_reserves=output_supply, asset_2_reserves=input_supply, asset_2_protocol_fees=add(pool.asset_2_protocol_fees, quote.protocol_fee_amount))
+
+    if operation in ('add-liquidity-flexible', 'add-liquidity-single'):
+        if operation == 'add-liquidity-flexible':
+            asset_1_amount, asset_2_amount = case.amounts
+        elif case.asset == 1:
+            asset_1_amount, asset_2_amount = case.amounts[0], 0
+        else:
+            asset_1_amount, asset_2_amount = 0, case.amounts[0]
+        quote = get_add_liquidity_quote(pool.asset_1_reserves, pool.asset_2_reserves, pool.issued_pool_tokens, asset_1_amount, asset_2_amount, *fees)
+        pool = pool._replace(asset_1_reserves=quote.asset_1_reserves, asset_2_reserves=quote.asset_2_reserves, issued_pool_tokens=quote.issued_pool_tokens)
+        if quote.swap_from_asset_1:
+            return pool._replace(asset_1_protocol_fees=add(pool.asset_1_protocol_fees, quote.protocol_fee_amount))
+        return pool._replace(asset_2_protocol_fees=add(pool.asset_2_protocol_fees, quote.protocol_fee_amount))
+
+    if operation in ('remove-liquidity', 'remove-liquidity-single'):
+        single_asset = case.asset if operation == 'remove-liquidity-single' else None
+        quote = get_remove_liquidity_quote(pool.asset_1_reserves, pool.asset_2_reserves, pool.issued_pool_tokens, case.amounts[0], *fees, single_asset=single_asset)
+        pool = pool._replace(asset_1_reserves=quote.asset_1_reserves, asset_2_reserves=quote.asset_2_reserves, issued_pool_tokens=quote.issued_pool_tokens)
+        # The other asset is swapped
+        if single_asset == 1:
+            return pool._replace(asset_2_protocol_fees=add(pool.asset_2_protocol_fees, quote.protocol_fee_amount))
+        if single_asset == 2:
+            return pool._replace(asset_1_protocol_fees=add(pool.asset_1_protocol_fees, quote.protocol_fee_amount))
+        return pool
+
+    reserves = [pool.asset_1_reserves, pool.asset_2_reserves]
+    protocol_fees = [pool.asset_1_protocol_fees, pool.asset_2_protocol_fees]
+
+    if operation == 'flash-loan':
+        amounts, repayment_amounts = case.amounts[:2], case.amounts[2:]
+        # flash_loan
+        if not any(amounts):
+            raise LogicError('assert(index_diff > 1)')
+        for i, amount in enumerate(amounts):
+            if amount > reserves[i]:
+                raise LogicError(f'assert(asset_{i + 1}_amount <= asset_{i + 1}_reserves)')
+        # verify_flash_loan
+        for i, (amount, repayment_amount) in enumerate(zip(amounts, repayment_amounts)):
+            if not amount:
+                continue
+            total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(amount, *fees)
+            if not total_fee_amount:
+                raise LogicError(f'assert(asset_{i + 1}_total_fee_amount)')
+            if repayment_amount < add(amount, total_fee_amount):
+                raise LogicError(f'assert(Gtxn[asset_{i + 1}_txn_index].AssetAmount >= asset_{i + 1}_repayment_amount)')
+            protocol_fees[i] = add(protocol_fees[i], protocol_fee_amount)
+            reserves[i] = add(reserves[i], poolers_fee_amount)
+        return pool._replace(asset_1_reserves=reserves[0], asset_2_reserves=reserves[1], asset_1_protocol_fees=protocol_fees[0], asset_2_protocol_fees=protocol_fees[1])
+
+    if operation == 'flash-swap':
+        output_amounts, input_amounts = case.amounts[:2], case.amounts[2:]
+        # flash_swap
+        if not any(input_amounts):
+            raise LogicError('assert(index_diff > 1)')
+        if not any(output_amounts):
+            raise LogicError('assert(asset_1_output_amount || asset_2_output_amount)')
+        for i, amount in enumerate(output_amounts):
+            if amount > reserves[i]:
+                raise LogicError(f'assert(asset_{i + 1}_output_amount <= asset_{i + 1}_reserves)')
+        # verify_flash_swap
+        total_fee_amounts = [0, 0]
+        poolers_fee_amounts = [0, 0]
+        for i, (output_amount, input_amount) in enumerate(zip(output_amounts, input_amounts)):
+            protocol_fee_amount = 0
+            if input_amount:
+                total_fee_amounts[i], poolers_fee_amounts[i], protocol_fee_amount = calculate_fixed_input_fee_amounts(input_amount, *fees)
+                protocol_fees[i] = add(protocol_fees[i], protocol_fee_amount)
+            reserves[i] = add(sub(reserves[i], output_amount), sub(input_amount, protocol_fee_amount))
+        if not any(total_fee_amounts):
+            raise LogicError('assert(asset_1_total_fee_amount || asset_2_total_fee_amount)')
+        if not check_invariant(pool.asset_1_reserves, pool.asset_2_reserves, *reserves, *poolers_fee_amounts).passed:
+            raise LogicError('check_invariant')
+        return pool._replace(asset_1_reserves=reserves[0], asset_2_reserves=reserves[1], asset_1_protocol_fees=protocol_fees[0], asset_2_protocol_fees=protocol_fees[1])
+
+    raise ValueError(f'Unknown operation {operation}.')
+
+
+def check_properties(initial, final, case):
+    """ Returns the name of the first property the final pool state breaks, None if all of them hold """
+    if case.operation.startswith(('swap', 'flash')):
+        # The product of the reserves does not decrease
+        if not check_invariant(initial.asset_1_reserves, initial.asset_2_reserves, final.asset_1_reserves, final.asset_2_reserves).passed:
+            return 'invariant'
+    elif final.issued_pool_tokens:
+        # The value of a pool token does not decrease
+        if not check_pool_token_value(initial.asset_1_reserves, initial.asset_2_reserves, initial.issued_pool_tokens, final.asset_1_reserves, final.asset_2_reserves, final.issued_pool_tokens).passed:
+            return 'pool_token_value'
+    elif final.asset_1_reserves or final.asset_2_reserves:
+        return 'empty_pool'
+    return None
+
+
+def _get_pool_model(pool_state):
+    return PoolModel(*(getattr(pool_state, field) for field in PoolModel._fields))
+
+
+class FuzzHarness(LedgerHelpers):
+    """
+    Evaluates the cases in a ledger with a bootstrapped pool, with the ledger helpers of the test cases.
+    The ledger is built once, each case runs on a copy of it.
+    """
+
+    def __init__(self):
+        self.sp = get_suggested_params()
+        self.app_creator_sk, self.app_creator_address = generate_account()
+        self.user_sk, self.user_addr = generate_account()
+        self.asset_1_id = 5
+        self.asset_2_id = 2
+
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.template = copy_ledger(self.ledger)
+
+    def prepare(self, case):
+        self.ledger = copy_ledger(self.template)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, case.asset_1_reserves, case.asset_2_reserves, liquidity_provider_address=self.user_addr)
+        self.ledger.update_local_state(
+            address=self.pool_address,
+            app_id=APPLICATION_ID,
+            state_delta={
+                b'total_fee_share': case.total_fee_share,
+                b'protocol_fee_ratio': case.protocol_fee_ratio,
+            }
+        )
+
+    def get_app_call_transaction(self, app_args, foreign_assets):
+        txn = transaction.ApplicationNoOpTxn(
+            sender=self.user_addr,
+            sp=self.sp,
+            index=APPLICATION_ID,
+            app_args=app_args,
+            foreign_assets=foreign_assets,
+            accounts=[self.pool_address],
+        )
+        txn.fee = APP_CALL_FEE
+        return txn
+
+    def get_transfer_transaction(self, asset, amount):
+        return transaction.AssetTransferTxn(
+            sender=self.user_addr,
+            sp=self.sp,
+            receiver=self.pool_address,
+            index=self.asset_1_id if asset == 1 else self.asset_2_id,
+            amt=amount,
+        )
+
+    def get_transactions(self, case):
+        asset_ids = [self.asset_1_id, self.asset_2_id]
+        operation = case.operation
+
+        if operation == 'swap-fixed-input':
+            return [self.get_transfer_transaction(case.asset, case.amounts[0]), self.get_app_call_transaction([METHOD_SWAP, 'fixed-input', case.amounts[1]], asset_ids)]
+        if operation == 'swap-fixed-output':
+            return [self.get_transfer_transaction(case.asset, case.amounts[0]), self.get_app_call_transaction([METHOD_SWAP, 'fixed-output', case.amounts[1]], asset_ids)]
+        if operation == 'add-liquidity-flexible':
+            return self.get_add_liquidity_transactions(*case.amounts, app_call_fee=APP_CALL_FEE)
+        if operation == 'add-liquidity-single':
+            amounts = (case.amounts[0], None) if case.asset == 1 else (None, case.amounts[0])
+            return self.get_add_liquidity_transactions(*amounts, app_call_fee=APP_CALL_FEE)
+        if operation == 'remove-liquidity':
+            return self.get_remove_liquidity_transactions(case.amounts[0], app_call_fee=APP_CALL_FEE)
+        if operation == 'remove-liquidity-single':
+            return self.get_remove_liquidity_single_transactions(case.amounts[0], asset_ids[case.asset - 1], app_call_fee=APP_CALL_FEE)
+
+        if operation in ('flash-loan', 'flash-swap'):
+            if operation == 'flash-loan':
+                method, verify_method, verify_foreign_assets = METHOD_FLASH_LOAN, METHOD_VERIFY_FLASH_LOAN, []
+            else:
+                method, verify_method, verify_foreign_assets = METHOD_FLASH_SWAP, METHOD_VERIFY_FLASH_SWAP, asset_ids
+            output_amounts, input_amounts = case.amounts[:2], case.amounts[2:]
+            if operation == 'flash-loan':
+                # Only the borrowed assets are repaid
+                input_amounts = [input_amount if output_amount else 0 for output_amount, input_amount in zip(output_amounts, input_amounts)]
+            transfers = [self.get_transfer_transaction(asset, amount) for asset, amount in zip((1, 2), input_amounts) if amount]
+            index_diff = len(transfers) + 1
+            return [
+                self.get_app_call_transaction([method, index_diff, *output_amounts], asset_ids),
+                *transfers,
+                self.get_app_call_transaction([verify_method, index_diff], verify_foreign_assets),
+            ]
+
+        raise ValueError(f'Unknown operation {operation}.')
+
+    def evaluate(self, case):
+        """
+        Returns (initial, final, error), the PoolModels before and after the group.
+        final is None and error is the exception if the group is rejected.
+        """
+        self.prepare(case)
+        store = PoolStateStore.from_ledger(self.ledger)
+        initial = _get_pool_model(store.get(self.pool_address))
+        txn_group = transaction.assign_group_id(self.get_transactions(case))
+        try:
+            block = self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk), block_timestamp=BLOCK_TIMESTAMP)
+        except Exception as e:
+            return initial, None, e
+        store.apply_block(block)
+        return initial, _get_pool_model(store.get(self.pool_address)), None
+
+
+def check_case(harness, case):
+    """ Returns (rejected, mismatch), mismatch is None if the chain and the mirror agree and the properties hold """
+    initial, final, error = harness.evaluate(case)
+    try:
+        expected = apply_operation(initial, case)
+    except LogicError as e:
+        expected = e
+
+    rejected = final is None
+    if rejected and not isinstance(error, LogicEvalError):
+        return rejected, Mismatch(case, 'error', repr(expected), repr(error))
+    if rejected != isinstance(expected, LogicError):
+        return rejected, Mismatch(case, 'outcome', repr(expected), repr(error) if rejected else repr(final))
+    if rejected:
+        return rejected, None
+    if expected != final:
+        return rejected, Mismatch(case, 'state', repr(expected), repr(final))
+    failed_property = check_properties(initial, final, case)
+    if failed_property:
+        return rejected, Mismatch(case, 'property', failed_property, repr(final))
+    return rejected, None
+
+
+def _shrink_candidates(case):
+    def smaller(value, low):
+        # The lower bound first, then the value minus halving steps
+        if value > low:
+            yield low
+        step = (value - low) // 2
+        while step:
+            yield value - step
+            step //= 2
+
+    for i, amount in enumerate(case.amounts):
+        for value in smaller(amount, 0):
+            yield case._replace(amounts=case.amounts[:i] + (value,) + case.amounts[i + 1:])
+    for field in ('asset_1_reserves', 'asset_2_reserves'):
+        for value in smaller(getattr(case, field), 1):
+            yield case._replace(**{field: value})
+
+
+def shrink(case, is_failing, max_attempts=200):
+    """
+    Returns a smaller case for which is_failing(case) is still True, the amounts and the reserves are reduced greedily.
+    is_failing is called at most max_attempts times.
+    """
+    attempts = 0
+    improved = True
+    while improved and attempts < max_attempts:
+        improved = False
+        for candidate in _shrink_candidates(case):
+            if not is_valid_case(candidate):
+                continue
+            if attempts == max_attempts:
+                break
+            attempts += 1
+            if is_failing(candidate):
+                case = candidate
+                improved = True
+                break
+    return case
+
+
+_harness = None
+
+
+def _get_harness():
+    global _harness
+    if _harness is None:
+        _harness = FuzzHarness()
+    return _harness
+
+
+def run_seeds(seeds, shrink_failures=True):
+    """ Evaluates the cases of the seeds in this process, returns the counts and the (shrunk) mismatches """
+    harness = _get_harness()
+    start = time.perf_counter()
+    operations = Counter()
+    rejections = Counter()
+    mismatches = []
+    for seed in seeds:
+        case = generate_case(seed)
+        rejected, mismatch = check_case(harness, case)
+        operations[case.operation] += 1
+        rejections[case.operation] += rejected
+        if mismatch:
+            if shrink_failures:
+                def is_failing(candidate):
+                    candidate_mismatch = check_case(harness, candidate)[1]
+                    return candidate_mismatch is not None and candidate_mismatch.kind == mismatch.kind
+                mismatch = check_case(harness, shrink(case, is_failing))[1]
+            mismatches.append(mismatch)
+    return dict(operations=operations, rejections=rejections, mismatches=mismatches, duration=time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tests.fuzzing', description='Fuzzes the AMM against the Python mirror of the contract math.')
+    parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('-n', '--cases', type=int, default=1000, help='number of cases')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the first case, random by default')
+    parser.add_argument('--chunk-size', type=int, default=50, help='number of cases per task')
+    parser.add_argument('--no-shrink', action='store_false', dest='shrink', help='report the failing cases as they are generated')
+    parser.add_argument('--replay', type=parse_replay_case, nargs='+', metavar='CASE', help='evaluate the JSON cases or the cases of the seeds in this process')
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        harness = _get_harness()
+        failed = False
+        for case in args.replay:
+            rejected, mismatch = check_case(harness, case)
+            print(f'{case}\n  {"rejected" if rejected else "accepted"}, {mismatch.kind if mismatch else "OK"}')
+            if mismatch:
+                print(f'  expected: {mismatch.expected}\n  actual: {mismatch.actual}')
+                failed = True
+        return 1 if failed else 0
+
+    seed = random.randrange(2**32) if args.seed is None else args.seed
+    seeds = range(seed, seed + args.cases)
+    chunks = [seeds[i:i + args.chunk_size] for i in range(0, len(seeds), args.chunk_size)]
+    print(f'Fuzzing {args.cases} cases from seed {seed} with {args.processes} processes', file=sys.stderr)
+
+    # Compile the programs once, the workers read them from the program cache
+    from .constants import amm_approval_program, amm_clear_state_program, amm_pool_template
+    for program in [amm_approval_program, amm_clear_state_program, amm_pool_template]:
+        program.load()
+
+    from .parallel import get_executor
+
+    start = time.perf_counter()
+    operations = Counter()
+    rejections = Counter()
+    mismatches = []
+    worker_duration = 0
+    with get_executor(args.processes) as executor:
+        futures = [executor.submit(run_seeds, chunk, args.shrink) for chunk in chunks]
+        for future in as_completed(futures):
+            result = future.result()
+            operations.update(result['operations'])
+            rejections.update(result['rejections'])
+            mismatches.extend(result['mismatches'])
+            worker_duration += result['duration']
+            cases = sum(operations.values())
+            print(f'{cases}/{args.cases} cases, {len(mismatches)} failures, {cases / (time.perf_counter() - start):.1f} cases/s', file=sys.stderr)
+    duration = time.perf_counter() - start
+
+    for mismatch in sorted(mismatches, key=lambda mismatch: mismatch.case.seed):
+        print(
+            f'\n{unittest.TextTestResult.separator1}\n{mismatch.kind.upper()}: {mismatch.case}\n'
+            f'  expected: {mismatch.expected}\n  actual: {mismatch.actual}\n'
+            f"  replay: python -m tests.fuzzing --replay '{case_to_json(mismatch.case)}'\n"
+            f'  the seed {mismatch.case.seed} replays the case before shrinking: python -m tests.fuzzing --replay {mismatch.case.seed}',
+            file=sys.stderr
+        )
+
+    print(f'\n{unittest.TextTestResult.separator2}', file=sys.stderr)
+    for operation in OPERATIONS:
+        if operations[operation]:
+            print(f'{operation:<24} {operations[operation]:>8} cases {rejections[operation] / operations[operation]:>8.1%} rejected', file=sys.stderr)
+    cases = sum(operations.values())
+    print(
+        f'Ran {cases} cases in {duration:.3f}s ({args.processes} processes), '
+        f'{cases / duration:.1f} cases/s, {worker_duration / max(cases, 1) * 1000:.3f} ms per case in a worker',
+        file=sys.stderr
+    )
+    print('OK' if not mismatches else f'FAILED (failures={len(mismatches)})', file=sys.stderr)
+    return 0 if not mismatches else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Decodes the logs of the approval program into records.
+
+The logs are "<name> %i" + itob(value), they are matched by the name bytes without decoding to str.
+"""
+from collections import namedtuple
+
+from .constants import APPLICATION_ID
+
+SwapLogs = namedtuple('SwapLogs', ['input_asset_id', 'input_amount', 'swap_amount', 'change', 'output_asset_id', 'output_amount', 'poolers_fee_amount', 'protocol_fee_amount', 'total_fee_amount'])
+# The swap of the single asset mode
+AddLiquidityLogs = namedtuple('AddLiquidityLogs', ['input_asset_id', 'output_asset_id', 'swap_amount', 'poolers_fee_amount', 'protocol_fee_amount', 'total_fee_amount'])
+RemoveLiquidityLogs = namedtuple('RemoveLiquidityLogs', ['input_asset_id', 'input_amount', 'swap_amount', 'output_asset_id', 'output_amount', 'poolers_fee_amount', 'protocol_fee_amount', 'total_fee_amount'])
+VerifyFlashLoanLogs = namedtuple('VerifyFlashLoanLogs', [
+    'asset_1_output_amount', 'asset_1_input_amount', 'asset_1_donation_amount', 'asset_1_poolers_fee_amount', 'asset_1_protocol_fee_amount', 'asset_1_total_fee_amount',
+    'asset_2_output_amount', 'asset_2_input_amount', 'asset_2_donation_amount', 'asset_2_poolers_fee_amount', 'asset_2_protocol_fee_amount', 'asset_2_total_fee_amount',
+])
+# The balances of the pool after the transfers, they are logged without names
+FlashSwapLogs = namedtuple('FlashSwapLogs', ['asset_1_balance_after_transfer', 'asset_2_balance_after_transfer'])
+VerifyFlashSwapLogs = namedtuple('VerifyFlashSwapLogs', [
+    'asset_1_output_amount', 'asset_1_input_amount', 'asset_1_poolers_fee_amount', 'asset_1_protocol_fee_amount', 'asset_1_total_fee_amount',
+    'asset_2_output_amount', 'asset_2_input_amount', 'asset_2_poolers_fee_amount', 'asset_2_protocol_fee_amount', 'asset_2_total_fee_amount',
+])
+
+# Records by the method (Txn.ApplicationArgs[0]), the fields which are not logged are 0
+LOG_RECORDS = {
+    b'swap': SwapLogs,
+    b'add_liquidity': AddLiquidityLogs,
+    b'remove_liquidity': RemoveLiquidityLogs,
+    b'verify_flash_loan': VerifyFlashLoanLogs,
+    b'flash_swap': FlashSwapLogs,
+    b'verify_flash_swap': VerifyFlashSwapLogs,
+}
+
+# len(" %i") + len(itob(value))
+_SUFFIX_LENGTH = 3 + 8
+_FIELD_INDEXES = {record: {f'{field} %i'.encode(): i for i, field in enumerate(record._fields)} for record in LOG_RECORDS.values()}
+
+
+def iter_int_logs(logs):
+    """ Yields (name, value) pairs of the "<name> %i" logs, name is bytes """
+    for log in logs:
+        if log[-_SUFFIX_LENGTH:-8] == b' %i':
+            yield log[:-_SUFFIX_LENGTH], int.from_bytes(log[-8:], 'big')
+
+
+def decode_logs(txn, app_id=APPLICATION_ID):
+    """
+    Returns the log record of an app call of the block or None if the method does not log.
+    """
+    fields = txn[b'txn']
+    if fields.get(b'type') != b'appl' or fields.get(b'apid') != app_id:
+        return None
+    app_args = fields.get(b'apaa')
+    if not app_args:
+        return None
+    record = LOG_RECORDS.get(app_args[0])
+    logs = txn.get(b'dt', {}).get(b'lg')
+    if record is None or not logs:
+        return None
+
+    if record is FlashSwapLogs:
+        return FlashSwapLogs(int.from_bytes(logs[0], 'big'), int.from_bytes(logs[1], 'big'))
+
+    indexes = _FIELD_INDEXES[record]
+    values = [0] * len(indexes)
+    for log in logs:
+        i = indexes.get(log[:-8])
+        if i is not None:
+            values[i] = int.from_bytes(log[-8:], 'big')
+    return record(*values)
+
+
+def _iter_app_calls(txn, txn_index):
+    yield txn_index, txn
+    for inner_txn in txn.get(b'dt', {}).get(b'itx', []):
+        yield from _iter_app_calls(inner_txn, txn_index)
+
+
+def decode_block_logs(block, app_id=APPLICATION_ID):
+    """
+    Returns (txn_index, record) pairs of all app calls of the block in one pass, including the inner app calls.
+    txn_index is the index of the outer transaction.
+    """
+    records = []
+    for txn_index, txn in enumerate(block[b'txns']):
+        for txn_index, app_call in _iter_app_calls(txn, txn_index):
+            record = decode_logs(app_call, app_id=app_id)
+            if record is not None:
+                records.append((txn_index, record))
+    return records
@@ -0,0 +1,184 @@
+"""
+Memory mapped ring buffers of the cumulative price samples of the pools.
+
+Each sample is a timestamp and the two cumulative prices at full width, as big-endian byte columns.
+update_price_oracle adds to the cumulative prices with b+, its operands are at most 64 bytes so a cumulative price
+has at most 65 bytes. The differences of the samples, and the TWAPs, are exact.
+
+File layout: header, pool table (public key, ring start, sample count), samples (pool_capacity x sample_capacity).
+"""
+import os
+
+import numpy as np
+from algosdk.encoding import decode_address
+
+from .constants import APPLICATION_ID
+from .twap import Observation
+
+HEADER_MAGIC = b'TMORCL\x00\x02'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('app_id', '>u8'), ('pool_capacity', '>u8'), ('sample_capacity', '>u8'), ('pool_count', '>u8')])
+POOL_DTYPE = np.dtype([('public_key', 'u1', 32), ('start', '>u8'), ('count', '>u8')])
+CUMULATIVE_PRICE_SIZE = 65
+SAMPLE_DTYPE = np.dtype([
+    ('timestamp', '>u8'),
+    ('asset_1_cumulative_price', 'u1', CUMULATIVE_PRICE_SIZE),
+    ('asset_2_cumulative_price', 'u1', CUMULATIVE_PRICE_SIZE),
+])
+
+
+def _to_bytes(values):
+    try:
+        data = b''.join(int(value).to_bytes(CUMULATIVE_PRICE_SIZE, 'big') for value in values)
+    except OverflowError:
+        raise ValueError(f'A cumulative price is negative or longer than {CUMULATIVE_PRICE_SIZE} bytes.') from None
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(values), CUMULATIVE_PRICE_SIZE)
+
+
+def _to_int(value):
+    return int.from_bytes(value.tobytes(), 'big')
+
+
+class OracleSampler:
+    """
+    Cumulative price samples of up to pool_capacity pools, the last sample_capacity samples per pool.
+    The capacities of an existing file are read from its header.
+    """
+
+    def __init__(self, path, app_id=APPLICATION_ID, pool_capacity=1024, sample_capacity=1024):
+        self.path = path
+        self.app_id = app_id
+        if not os.path.exists(path):
+            self._create(pool_capacity, sample_capacity)
+        self._open()
+
+    def _create(self, pool_capacity, sample_capacity):
+        size = HEADER_DTYPE.itemsize + pool_capacity * POOL_DTYPE.itemsize + pool_capacity * sample_capacity * SAMPLE_DTYPE.itemsize
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header[0] = (HEADER_MAGIC, self.app_id, pool_capacity, sample_capacity, 0)
+            f.write(header.tobytes())
+            f.truncate(size)
+        os.replace(tmp_path, self.path)
+
+    def _open(self):
+        self.header = np.memmap(self.path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+        magic, app_id, pool_capacity, sample_capacity, _ = self.header[0]
+        if magic != HEADER_MAGIC:
+            raise ValueError(f'{self.path} is not an oracle sample file.')
+        if app_id != self.app_id:
+            raise ValueError(f'{self.path} has the samples of app {app_id}, not {self.app_id}.')
+
+        self.pool_capacity = int(pool_capacity)
+        self.sample_capacity = int(sample_capacity)
+        offset = HEADER_DTYPE.itemsize
+        self.pools = np.memmap(self.path, dtype=POOL_DTYPE, mode='r+', offset=offset, shape=(self.pool_capacity,))
+        offset += self.pool_capacity * POOL_DTYPE.itemsize
+        self.samples = np.memmap(self.path, dtype=SAMPLE_DTYPE, mode='r+', offset=offset, shape=(self.pool_capacity, self.sample_capacity))
+        self.slots = {self.pools['public_key'][i].tobytes(): i for i in range(int(self.header['pool_count'][0]))}
+
+    def flush(self):
+        for array in (self.header, self.pools, self.samples):
+            array.flush()
+
+    def close(self):
+        self.flush()
+        # The memory maps are closed when they are not referenced
+        self.header = self.pools = self.samples = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _get_slot(self, public_key):
+        slot = self.slots.get(public_key)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == self.pool_capacity:
+                raise ValueError(f'{self.path} is full, the pool capacity is {self.pool_capacity}.')
+            self.pools['public_key'][slot] = np.frombuffer(public_key, dtype=np.uint8)
+            self.slots[public_key] = slot
+            self.header['pool_count'] = len(self.slots)
+        return slot
+
+    def add_samples(self, public_keys, timestamps, asset_1_cumulative_prices, asset_2_cumulative_prices):
+        """
+        Appends one sample per pool (a pool is updated at most once per block), the prices are ints of up to 65 bytes.
+        """
+        if len(set(public_keys)) != len(public_keys):
+            raise ValueError('There are multiple samples of a pool.')
+        if not public_keys:
+            return
+        slots = np.array([self._get_slot(public_key) for public_key in public_keys])
+        starts = self.pools['start'][slots]
+        counts = self.pools['count'][slots]
+        positions = (starts + counts) % self.sample_capacity
+        full = counts == self.sample_capacity
+
+        samples = np.zeros(len(slots), dtype=SAMPLE_DTYPE)
+        samples['timestamp'] = timestamps
+        samples['asset_1_cumulative_price'] = _to_bytes(asset_1_cumulative_prices)
+        samples['asset_2_cumulative_price'] = _to_bytes(asset_2_cumulative_prices)
+        self.samples[slots, positions] = samples
+
+        self.pools['start'][slots] = np.where(full, (starts + 1) % self.sample_capacity, starts)
+        self.pools['count'][slots] = np.where(full, counts, counts + 1)
+
+    def add_block(self, block):
+        """ Appends the samples of the price oracle updates in the local state deltas of a block """
+        samples = {}
+        for txn in block.get(b'block', block).get(b'txns', []):
+            self._collect_samples(txn, samples)
+        if samples:
+            timestamps, asset_1_cumulative_prices, asset_2_cumulative_prices = zip(*samples.values())
+            self.add_samples(list(samples), list(timestamps), list(asset_1_cumulative_prices), list(asset_2_cumulative_prices))
+
+    def _collect_samples(self, txn, samples):
+        fields = txn[b'txn']
+        if fields.get(b'type') == b'appl' and fields.get(b'apid') == self.app_id:
+            accounts = fields.get(b'apat', [])
+            for account_index, delta in txn.get(b'dt', {}).get(b'ld', {}).items():
+                if b'cumulative_price_update_timestamp' not in delta or b'asset_1_cumulative_price' not in delta:
+                    continue
+                public_key = fields[b'snd'] if account_index == 0 else accounts[account_index - 1]
+                samples[public_key] = (
+                    delta[b'cumulative_price_update_timestamp'].get(b'ui', 0),
+                    int.from_bytes(delta[b'asset_1_cumulative_price'].get(b'bs', b''), 'big'),
+                    int.from_bytes(delta[b'asset_2_cumulative_price'].get(b'bs', b''), 'big'),
+                )
+        for inner_txn in txn.get(b'dt', {}).get(b'itx', []):
+            self._collect_samples(inner_txn, samples)
+
+    def _get_pool_samples(self, address):
+        slot = self.slots.get(decode_address(address))
+        if slot is None:
+            return self.samples[0, :0]
+        start, count = int(self.pools['start'][slot]), int(self.pools['count'][slot])
+        return np.roll(self.samples[slot], -start)[:count]
+
+    def get_observations(self, address):
+        """ Returns the samples of the pool in time order """
+        return [
+            Observation(int(sample['timestamp']), _to_int(sample['asset_1_cumulative_price']), _to_int(sample['asset_2_cumulative_price']))
+            for sample in self._get_pool_samples(address)
+        ]
+
+    def get_twap(self, address, start, end):
+        """
+        Returns (asset_1_price, asset_2_price) scaled by 2^64 between the last samples at or before start and end,
+        and the timestamps of these samples.
+        """
+        samples = self._get_pool_samples(address)
+        i, j = np.searchsorted(samples['timestamp'], [start, end], side='right') - 1
+        if i < 0 or samples['timestamp'][j] <= samples['timestamp'][i]:
+            raise ValueError('There are not enough samples in the window.')
+        first, last = samples[i], samples[j]
+        time_delta = int(last['timestamp']) - int(first['timestamp'])
+        asset_1_price = (_to_int(last['asset_1_cumulative_price']) - _to_int(first['asset_1_cumulative_price'])) // time_delta
+        asset_2_price = (_to_int(last['asset_2_cumulative_price']) - _to_int(first['asset_2_cumulative_price'])) // time_delta
+        return asset_1_price, asset_2_price, int(first['timestamp']), int(last['timestamp'])
@@ -0,0 +1,211 @@
+"""
+Runs the test suite in a process pool, test classes are distributed to the workers.
+
+    python -m tests.parallel [-j PROCESSES] [-v] [tests ...]
+
+AlgoJig evaluates transactions with a binary which always uses the /tmp/jig directory, the directory cannot be
+configured. Every worker runs a copy of the binary in which /tmp/jig is replaced with its own directory of the same
+length (/tmp/j00, /tmp/j01, ...), and its JigLedger files are in that directory.
+"""
+import argparse
+import importlib.resources
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+JIG_DIR = '/tmp/jig'
+
+
+def create_jig_dir(binary_dir):
+    """
+    Creates a free jig directory which has the length of /tmp/jig and a copy of the AlgoJig binary in binary_dir which uses it.
+    The binary removes and creates the jig directory again, so it cannot be in the jig directory.
+    """
+    import algojig
+    from algojig import gojig
+
+    source = importlib.resources.files(algojig).joinpath(gojig.binary)
+    with source.open('rb') as f:
+        program = f.read()
+    if JIG_DIR.encode() not in program:
+        raise RuntimeError(f'The AlgoJig binary {source} does not use {JIG_DIR}.')
+
+    for i in range(256):
+        jig_dir = f'{JIG_DIR[:-2]}{i:02x}'
+        try:
+            os.mkdir(jig_dir)
+        except FileExistsError:
+            continue
+        break
+    else:
+        raise RuntimeError(f'There is no free jig directory, remove the {JIG_DIR[:-2]}XX directories of the earlier runs.')
+
+    binary = os.path.join(binary_dir, f'algojig-{os.path.basename(jig_dir)}')
+    with open(binary, 'wb') as f:
+        # Go strings are not null terminated, a replacement of the same length keeps the binary valid
+        f.write(program.replace(JIG_DIR.encode(), jig_dir.encode()))
+    shutil.copymode(source, binary)
+    if sys.platform == 'darwin':
+        # The signature of the original binary is not valid for the copy
+        subprocess.run(['codesign', '--force', '--sign', '-', binary], check=True, capture_output=True)
+    return jig_dir, binary
+
+
+def use_jig_dir(jig_dir, binary):
+    """ The ledgers of this process evaluate the transactions with the binary and the files of jig_dir """
+    from algojig import gojig
+    from algojig.ledger import JigLedger
+
+    def run(command, *args, input=None):
+        return subprocess.run([binary, command, *args], capture_output=True, input=input)
+
+    def __init__(self):
+        jig_ledger_init(self)
+        for name in ['filename', 'block_db_filename', 'stxn_filename']:
+            setattr(self, name, getattr(self, name).replace(JIG_DIR, jig_dir, 1))
+
+    jig_ledger_init = getattr(JigLedger.__init__, 'jig_ledger_init', JigLedger.__init__)
+    __init__.jig_ledger_init = jig_ledger_init
+    gojig.run = run
+    JigLedger.__init__ = __init__
+
+
+def init_worker(jig_dirs):
+    use_jig_dir(*jig_dirs.get())
+
+    # Warm up, the programs are read from the program cache
+    from .constants import amm_approval_program, amm_clear_state_program, amm_pool_template
+    for program in [amm_approval_program, amm_clear_state_program, amm_pool_template]:
+        program.load()
+
+
+@contextmanager
+def get_executor(processes):
+    """ Process pool whose workers have their own jig directories, the directories are removed on exit """
+    jig_dirs = multiprocessing.Queue()
+    created_jig_dirs = []
+    with tempfile.TemporaryDirectory(prefix='algojig-') as binary_dir:
+        try:
+            for _ in range(processes):
+                jig_dir, binary = create_jig_dir(binary_dir)
+                created_jig_dirs.append(jig_dir)
+                jig_dirs.put((jig_dir, binary))
+            with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(jig_dirs,)) as executor:
+                yield executor
+        finally:
+            for jig_dir in created_jig_dirs:
+                shutil.rmtree(jig_dir, ignore_errors=True)
+
+
+def run_tests(test_ids, verbosity):
+    suite = unittest.defaultTestLoader.loadTestsFromNames(test_ids)
+    stream = io.StringIO()
+    # Only the progress is written to the stream, the errors are reported by the main process
+    result = unittest.TextTestResult(unittest.runner._WritelnDecorator(stream), descriptions=True, verbosity=verbosity)
+    result.startTestRun()
+    try:
+        suite(result)
+    finally:
+        result.stopTestRun()
+    return dict(
+        tests_run=result.testsRun,
+        failures=[(str(test), traceback) for test, traceback in result.failures],
+        errors=[(str(test), traceback) for test, traceback in result.errors],
+        skipped=len(result.skipped),
+        expected_failures=len(result.expectedFailures),
+        unexpected_successes=len(result.unexpectedSuccesses),
+        output=stream.getvalue(),
+    )
+
+
+def _iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+
+def get_test_classes(names):
+    """ Returns the test ids grouped by the test class, largest classes first """
+    loader = unittest.defaultTestLoader
+    if names:
+        suite = loader.loadTestsFromNames(names)
+    else:
+        suite = loader.discover('.')
+
+    test_classes = defaultdict(list)
+    for test in _iter_tests(suite):
+        if isinstance(test, unittest.loader._FailedTest):
+            # Import errors are raised in the worker
+            test_classes[test.id()].append(test.id())
+        else:
+            test_classes[f'{type(test).__module__}.{type(test).__qualname__}'].append(test.id())
+    return sorted(test_classes.values(), key=len, reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tests.parallel', description='Runs the test classes in parallel.')
+    parser.add_argument('tests', nargs='*', help='test modules, classes or methods, all tests are discovered by default')
+    parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('-v', '--verbose', action='store_const', const=2, default=1, dest='verbosity')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    test_classes = get_test_classes(args.tests)
+
+    # Compile the programs once, the workers read them from the program cache
+    from .constants import amm_approval_program, amm_clear_state_program, amm_pool_template
+    for program in [amm_approval_program, amm_clear_state_program, amm_pool_template]:
+        program.load()
+
+    tests_run = skipped = expected_failures = unexpected_successes = 0
+    failures = []
+    errors = []
+    with get_executor(args.processes) as executor:
+        futures = [executor.submit(run_tests, test_ids, args.verbosity) for test_ids in test_classes]
+        for future in as_completed(futures):
+            result = future.result()
+            sys.stderr.write(result['output'])
+            sys.stderr.flush()
+            tests_run += result['tests_run']
+            skipped += result['skipped']
+            expected_failures += result['expected_failures']
+            unexpected_successes += result['unexpected_successes']
+            failures.extend(result['failures'])
+            errors.extend(result['errors'])
+    duration = time.perf_counter() - start
+
+    for flavour, items in [('ERROR', errors), ('FAIL', failures)]:
+        for test, traceback in items:
+            sys.stderr.write(f'\n{unittest.TextTestResult.separator1}\n{flavour}: {test}\n{unittest.TextTestResult.separator2}\n{traceback}')
+    sys.stderr.write(f'\n{unittest.TextTestResult.separator2}\nRan {tests_run} tests in {duration:.3f}s ({args.processes} processes)\n\n')
+
+    infos = []
+    if failures:
+        infos.append(f'failures={len(failures)}')
+    if errors:
+        infos.append(f'errors={len(errors)}')
+    if skipped:
+        infos.append(f'skipped={skipped}')
+    if expected_failures:
+        infos.append(f'expected failures={expected_failures}')
+    if unexpected_successes:
+        infos.append(f'unexpected successes={unexpected_successes}')
+    successful = not failures and not errors and not unexpected_successes
+    status = 'OK' if successful else 'FAILED'
+    sys.stderr.write(f'{status} ({", ".join(infos)})\n' if infos else f'{status}\n')
+    return 0 if successful else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
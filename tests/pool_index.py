@@ -0,0 +1,147 @@
+import heapq
+import mmap
+import os
+import struct
+
+from algosdk.encoding import decode_address
+
+from .constants import ALGO_ASSET_ID
+from .utils import derive_pool_public_key
+
+# File layout: header (magic, app_id) followed by records sorted by the public key of the pool address.
+# record: public key (32 bytes) + asset_1_id (uint64) + asset_2_id (uint64)
+HEADER = struct.Struct('>8sQ')
+HEADER_MAGIC = b'TMPIDX\x00\x01'
+RECORD = struct.Struct('>32sQQ')
+KEY_SIZE = 32
+
+
+class PoolAddressIndex:
+    """
+    Persistent pool address -> (asset_1_id, asset_2_id) index of a Tinyman app.
+
+    Lookups are binary searches on the memory mapped file. New pools are kept in memory until flush(),
+    which merges them into the sorted file.
+    """
+
+    def __init__(self, path, app_id):
+        self.path = path
+        self.app_id = app_id
+        self.pending = {}
+        self.asset_ids = None
+        self._file = None
+        self._mmap = None
+        self.count = 0
+
+        if not os.path.exists(path):
+            self._write_records([])
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, 'rb')
+        header = self._file.read(HEADER.size)
+        magic, app_id = HEADER.unpack(header)
+        if magic != HEADER_MAGIC:
+            raise ValueError(f'{self.path} is not a pool address index.')
+        if app_id != self.app_id:
+            raise ValueError(f'{self.path} is the index of app {app_id}, not {self.app_id}.')
+
+        size = os.fstat(self._file.fileno()).st_size
+        self.count = (size - HEADER.size) // RECORD.size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+        self.close()
+
+    def __len__(self):
+        return self.count + len(self.pending)
+
+    def _key(self, i):
+        offset = HEADER.size + i * RECORD.size
+        return self._mmap[offset:offset + KEY_SIZE]
+
+    def _records(self):
+        for i in range(self.count):
+            yield RECORD.unpack_from(self._mmap, HEADER.size + i * RECORD.size)
+
+    def lookup_public_key(self, public_key):
+        if public_key in self.pending:
+            return self.pending[public_key]
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < public_key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == public_key:
+            _, asset_1_id, asset_2_id = RECORD.unpack_from(self._mmap, HEADER.size + low * RECORD.size)
+            return asset_1_id, asset_2_id
+        return None
+
+    def lookup(self, address):
+        """ Returns (asset_1_id, asset_2_id) of the pool or None if the address is not in the index """
+        return self.lookup_public_key(decode_address(address))
+
+    def __contains__(self, address):
+        return self.lookup(address) is not None
+
+    def add_pool(self, asset_1_id, asset_2_id):
+        # The contract requires asset_1_id > asset_2_id
+        asset_1_id, asset_2_id = max(asset_1_id, asset_2_id), min(asset_1_id, asset_2_id)
+        public_key = derive_pool_public_key(self.app_id, asset_1_id, asset_2_id)
+        if self.lookup_public_key(public_key) is None:
+            self.pending[public_key] = (asset_1_id, asset_2_id)
+        if self.asset_ids is not None:
+            self.asset_ids.update((asset_1_id, asset_2_id))
+
+    def get_asset_ids(self):
+        if self.asset_ids is None:
+            self.asset_ids = {ALGO_ASSET_ID}
+            for _, asset_1_id, asset_2_id in self._records():
+                self.asset_ids.add(asset_1_id)
+                self.asset_ids.add(asset_2_id)
+            for asset_1_id, asset_2_id in self.pending.values():
+                self.asset_ids.add(asset_1_id)
+                self.asset_ids.add(asset_2_id)
+        return self.asset_ids
+
+    def add_asset(self, asset_id):
+        """ Adds the pools of the new asset with every asset in the index (and ALGO) """
+        asset_ids = self.get_asset_ids()
+        if asset_id in asset_ids:
+            return
+        for other_asset_id in list(asset_ids):
+            self.add_pool(asset_id, other_asset_id)
+        asset_ids.add(asset_id)
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending = sorted((public_key, asset_1_id, asset_2_id) for public_key, (asset_1_id, asset_2_id) in self.pending.items())
+        records = heapq.merge(self._records(), pending)
+        self._write_records(records)
+        self.pending = {}
+        self.close()
+        self._open()
+
+    def _write_records(self, records):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(HEADER_MAGIC, self.app_id))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,145 @@
+"""
+Local pool state cache which is kept up to date by applying the local state deltas of the evaluated blocks.
+"""
+from collections import namedtuple
+
+import numpy as np
+from algosdk.encoding import decode_address, encode_address
+
+from .constants import APPLICATION_ID
+
+UINT_KEYS = (
+    'asset_1_id', 'asset_2_id', 'pool_token_asset_id',
+    'asset_1_reserves', 'asset_2_reserves', 'issued_pool_tokens',
+    'asset_1_protocol_fees', 'asset_2_protocol_fees',
+    'total_fee_share', 'protocol_fee_ratio',
+    'cumulative_price_update_timestamp', 'lock',
+)
+# The cumulative prices are byte math results, they are kept left padded to the max byte math length
+BYTES_KEYS = ('asset_1_cumulative_price', 'asset_2_cumulative_price')
+BYTES_SIZE = 64
+
+PoolState = namedtuple('PoolState', UINT_KEYS + BYTES_KEYS)
+
+_UINT_INDEXES = {key.encode(): i for i, key in enumerate(UINT_KEYS)}
+_BYTES_INDEXES = {key.encode(): i for i, key in enumerate(BYTES_KEYS)}
+
+# EvalDelta action types
+SET_BYTES = 1
+SET_UINT = 2
+DELETE = 3
+
+
+class PoolStateStore:
+    """
+    Local states of the pools of an app in array columns, one row per pool.
+
+    The rows are found by the public key of the pool address, reads and delta updates are O(1).
+    Uint values are in a uint64 array and the cumulative prices in a uint8 array, 50k pools take ~11MB.
+    """
+
+    def __init__(self, app_id=APPLICATION_ID, capacity=1024):
+        self.app_id = app_id
+        self.rows = {}
+        self.uints = np.zeros((capacity, len(UINT_KEYS)), dtype=np.uint64)
+        self.bytes = np.zeros((capacity, len(BYTES_KEYS), BYTES_SIZE), dtype=np.uint8)
+
+    @classmethod
+    def from_ledger(cls, ledger, app_id=APPLICATION_ID):
+        store = cls(app_id=app_id)
+        for address, account in ledger.accounts.items():
+            local_state = account.get('local_states', {}).get(app_id)
+            if local_state and b'asset_1_id' in local_state:
+                store.set_pool(address, local_state)
+        return store
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, address):
+        return decode_address(address) in self.rows
+
+    @property
+    def nbytes(self):
+        return self.uints.nbytes + self.bytes.nbytes
+
+    def _get_row(self, public_key):
+        row = self.rows.get(public_key)
+        if row is None:
+            row = len(self.rows)
+            if row == len(self.uints):
+                self.uints = np.concatenate([self.uints, np.zeros_like(self.uints)])
+                self.bytes = np.concatenate([self.bytes, np.zeros_like(self.bytes)])
+            self.rows[public_key] = row
+        return row
+
+    def _set(self, row, key, value):
+        i = _UINT_INDEXES.get(key)
+        if i is not None:
+            self.uints[row, i] = value
+            return
+        i = _BYTES_INDEXES.get(key)
+        if i is not None:
+            if len(value) > BYTES_SIZE:
+                raise ValueError(f'{key.decode()} is longer than {BYTES_SIZE} bytes.')
+            self.bytes[row, i] = 0
+            if value:
+                self.bytes[row, i, BYTES_SIZE - len(value):] = np.frombuffer(value, dtype=np.uint8)
+
+    def set_pool(self, address, local_state):
+        """ Sets the pool state from a local state dict ({b'key': int | bytes}) """
+        row = self._get_row(decode_address(address))
+        self.uints[row] = 0
+        self.bytes[row] = 0
+        for key, value in local_state.items():
+            self._set(row, key, value)
+
+    def apply_local_deltas(self, txn):
+        """ Applies the local state deltas of an app call (b'txn' and b'dt' of a block transaction) """
+        fields = txn[b'txn']
+        accounts = fields.get(b'apat', [])
+        for account_index, delta in txn.get(b'dt', {}).get(b'ld', {}).items():
+            # 0 is the sender, the others are Txn.Accounts
+            public_key = fields[b'snd'] if account_index == 0 else accounts[account_index - 1]
+            row = self._get_row(public_key)
+            for key, value_delta in delta.items():
+                action = value_delta[b'at']
+                if action == SET_UINT:
+                    self._set(row, key, value_delta.get(b'ui', 0))
+                elif action == SET_BYTES:
+                    self._set(row, key, value_delta.get(b'bs', b''))
+                elif action == DELETE:
+                    self._set(row, key, 0 if key in _UINT_INDEXES else b'')
+
+    def _apply_txn(self, txn):
+        fields = txn[b'txn']
+        if fields.get(b'type') == b'appl' and fields.get(b'apid') == self.app_id:
+            self.apply_local_deltas(txn)
+        for inner_txn in txn.get(b'dt', {}).get(b'itx', []):
+            self._apply_txn(inner_txn)
+
+    def apply_block(self, block):
+        """ Applies the local state deltas of the app calls of a block, including the inner app calls """
+        block = block.get(b'block', block)
+        for txn in block.get(b'txns', []):
+            self._apply_txn(txn)
+
+    def get(self, address):
+        """ Returns the PoolState of the pool or None if the pool is not in the store """
+        row = self.rows.get(decode_address(address))
+        if row is None:
+            return None
+        values = [int(value) for value in self.uints[row]]
+        values += [int.from_bytes(value.tobytes(), 'big') for value in self.bytes[row]]
+        return PoolState(*values)
+
+    def get_value(self, address, key):
+        """ Returns a uint value of the pool, i.e. get_value(address, 'asset_1_reserves') """
+        return int(self.uints[self.rows[decode_address(address)], UINT_KEYS.index(key)])
+
+    def column(self, key):
+        """ Returns the uint values of all pools as an array view, in the order of addresses() """
+        return self.uints[:len(self.rows), UINT_KEYS.index(key)]
+
+    def addresses(self):
+        return [encode_address(public_key) for public_key in self.rows]
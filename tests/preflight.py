@@ -0,0 +1,381 @@
+"""
+Static validation of transaction groups against the structural asserts of the approval program.
+
+The failures are reported with the source line of the approval program that would fail first,
+the same line is in the `source` of the LogicEvalError raised by the ledger.
+
+The asserts on the reserves, the issued pool tokens and the balances are not checked because
+they can be changed by the previous transactions of the group.
+"""
+from math import isqrt
+
+from algosdk.future.transaction import OnComplete
+
+from .amm_math import LogicError, add, calculate_fixed_input_fee_amounts
+from .constants import APPLICATION_ID, LOCKED_POOL_TOKENS
+
+AMM_METHODS = {
+    b"add_initial_liquidity", b"add_liquidity", b"remove_liquidity", b"swap",
+    b"flash_loan", b"verify_flash_loan", b"flash_swap", b"verify_flash_swap",
+}
+ADMIN_METHODS = {b"set_fee_collector", b"set_fee_setter", b"set_fee_manager", b"claim_fees", b"claim_extra", b"set_fee"}
+
+
+class PreflightError(LogicError):
+
+    def __init__(self, txn_index, source_line):
+        super().__init__(source_line)
+        self.txn_index = txn_index
+        self.source_line = source_line
+
+
+def get_pool_states(ledger, app_id=APPLICATION_ID):
+    """ Returns the local states of the pools in the ledger by the pool address """
+    pool_states = {}
+    for address, account in ledger.accounts.items():
+        local_state = account.get('local_states', {}).get(app_id)
+        if local_state and b'asset_1_id' in local_state:
+            pool_states[address] = local_state
+    return pool_states
+
+
+# Transaction fields as the program sees them, the fields of the other transaction types are zero values
+
+def _type_enum(txn):
+    return txn.type
+
+
+def _receiver(txn):
+    return txn.receiver if txn.type == 'pay' else None
+
+
+def _amount(txn):
+    return txn.amt if txn.type == 'pay' else 0
+
+
+def _asset_receiver(txn):
+    return txn.receiver if txn.type == 'axfer' else None
+
+
+def _xfer_asset(txn):
+    return txn.index if txn.type == 'axfer' else 0
+
+
+def _asset_amount(txn):
+    return txn.amount if txn.type == 'axfer' else 0
+
+
+class _AppCall:
+
+    def __init__(self, txns, txn_index, pool_states, locks, app_id):
+        self.txns = txns
+        self.txn_index = txn_index
+        self.txn = txns[txn_index]
+        self.pool_states = pool_states
+        self.locks = locks
+        self.app_id = app_id
+        self.user_address = self.txn.sender
+
+    def fail(self, source_line):
+        raise PreflightError(self.txn_index, source_line)
+
+    def check(self, condition, source_line):
+        if not condition:
+            self.fail(source_line)
+
+    def index(self, value, source_line):
+        # uint64 arithmetic of the group indexes
+        if value < 0:
+            self.fail(source_line)
+        return value
+
+    def gtxn(self, index, source_line):
+        if index >= len(self.txns):
+            self.fail(source_line)
+        return self.txns[index]
+
+    def arg(self, txn, index, source_line):
+        app_args = txn.app_args or []
+        if txn.type != 'appl' or index >= len(app_args):
+            self.fail(source_line)
+        return app_args[index]
+
+    def account(self, txn, index, source_line):
+        if index == 0:
+            return txn.sender
+        accounts = txn.accounts or []
+        if txn.type != 'appl' or index > len(accounts):
+            self.fail(source_line)
+        return accounts[index - 1]
+
+    def btoi(self, value, source_line):
+        if len(value) > 8:
+            self.fail(source_line)
+        return int.from_bytes(value, 'big')
+
+    def application_id(self, txn):
+        return txn.index if txn.type == 'appl' else 0
+
+    def on_completion(self, txn):
+        return txn.on_complete if txn.type == 'appl' else OnComplete.NoOpOC
+
+    def validate(self):
+        self.method = self.arg(self.txn, 0, 'switch Txn.ApplicationArgs[0]:')
+        if self.method in ADMIN_METHODS:
+            return
+
+        # amm
+        self.pool_address = self.account(self.txn, 1, 'bytes pool_address = Txn.Accounts[1]')
+        state = self.pool_states.get(self.pool_address)
+        if state is None:
+            self.fail('int asset_1_id = app_local_get(1, "asset_1_id")')
+        self.asset_1_id = state.get(b'asset_1_id', 0)
+        self.asset_2_id = state.get(b'asset_2_id', 0)
+        self.pool_token_asset_id = state.get(b'pool_token_asset_id', 0)
+        self.total_fee_share = state.get(b'total_fee_share', 0)
+        self.protocol_fee_ratio = state.get(b'protocol_fee_ratio', 0)
+
+        lock = self.locks.get(self.pool_address, state.get(b'lock', 0))
+        self.check(lock == (self.method == b"verify_flash_swap"), 'assert(app_local_get(1, "lock") == (Txn.ApplicationArgs[0] == "verify_flash_swap"))')
+
+        if self.method not in AMM_METHODS:
+            self.fail('switch Txn.ApplicationArgs[0]:')
+        getattr(self, self.method.decode())()
+
+    def swap(self):
+        input_txn_index = self.index(self.txn_index - 1, 'int input_txn_index = Txn.GroupIndex - 1')
+        mode = self.arg(self.txn, 1, 'bytes mode = Txn.ApplicationArgs[1]')
+        self.btoi(self.arg(self.txn, 2, 'int min_output = btoi(Txn.ApplicationArgs[2])'), 'int min_output = btoi(Txn.ApplicationArgs[2])')
+
+        input_txn = self.gtxn(input_txn_index, 'if Gtxn[input_txn_index].TypeEnum == Pay:')
+        if _type_enum(input_txn) == 'pay':
+            self.check(_receiver(input_txn) == self.pool_address, 'assert(Gtxn[input_txn_index].Receiver == pool_address)')
+            input_asset_id = 0
+            input_amount = _amount(input_txn)
+        elif _type_enum(input_txn) == 'axfer':
+            self.check(_asset_receiver(input_txn) == self.pool_address, 'assert(Gtxn[input_txn_index].AssetReceiver == pool_address)')
+            input_asset_id = _xfer_asset(input_txn)
+            input_amount = _asset_amount(input_txn)
+        else:
+            self.fail('error()')
+        self.check(input_txn.sender == self.user_address, 'assert(Gtxn[input_txn_index].Sender == user_address)')
+        self.check(input_amount, 'assert(input_amount)')
+
+        if input_asset_id not in (self.asset_1_id, self.asset_2_id):
+            self.fail('error()')
+        if mode not in (b'fixed-input', b'fixed-output'):
+            self.fail('error()')
+
+    def add_liquidity(self):
+        mode = self.arg(self.txn, 1, 'bytes mode = Txn.ApplicationArgs[1]')
+        self.btoi(self.arg(self.txn, 2, 'int min_output = btoi(Txn.ApplicationArgs[2])'), 'int min_output = btoi(Txn.ApplicationArgs[2])')
+
+        is_adding_asset_1 = is_adding_asset_2 = False
+        if mode == b"flexible":
+            asset_1_txn_index = self.index(self.txn_index - 2, 'asset_1_txn_index = Txn.GroupIndex - 2')
+            asset_2_txn_index = self.index(self.txn_index - 1, 'asset_2_txn_index = Txn.GroupIndex - 1')
+            is_adding_asset_1 = is_adding_asset_2 = True
+        elif mode == b"single":
+            txn_index = self.index(self.txn_index - 1, 'int txn_index = Txn.GroupIndex - 1')
+            xfer_asset = _xfer_asset(self.gtxn(txn_index, 'if Gtxn[txn_index].XferAsset == asset_1_id:'))
+            if xfer_asset == self.asset_1_id:
+                asset_1_txn_index = txn_index
+                is_adding_asset_1 = True
+            elif xfer_asset == self.asset_2_id:
+                asset_2_txn_index = txn_index
+                is_adding_asset_2 = True
+            else:
+                self.fail('error()')
+        else:
+            self.fail('error()')
+
+        if is_adding_asset_1:
+            txn = self.gtxn(asset_1_txn_index, 'assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)')
+            self.check(_type_enum(txn) == 'axfer', 'assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)')
+            self.check(_asset_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_1_txn_index].AssetReceiver == pool_address)')
+            self.check(_xfer_asset(txn) == self.asset_1_id, 'assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)')
+            self.check(txn.sender == self.user_address, 'assert(Gtxn[asset_1_txn_index].Sender == user_address)')
+
+        if is_adding_asset_2:
+            txn = self.check_asset_2_transfer(asset_2_txn_index)
+            self.check(txn.sender == self.user_address, 'assert(Gtxn[asset_2_txn_index].Sender == user_address)')
+
+    def check_asset_2_transfer(self, asset_2_txn_index):
+        if self.asset_2_id == 0:
+            txn = self.gtxn(asset_2_txn_index, 'assert(Gtxn[asset_2_txn_index].TypeEnum == Pay)')
+            self.check(_type_enum(txn) == 'pay', 'assert(Gtxn[asset_2_txn_index].TypeEnum == Pay)')
+            self.check(_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_2_txn_index].Receiver == pool_address)')
+        else:
+            txn = self.gtxn(asset_2_txn_index, 'assert(Gtxn[asset_2_txn_index].TypeEnum == Axfer)')
+            self.check(_type_enum(txn) == 'axfer', 'assert(Gtxn[asset_2_txn_index].TypeEnum == Axfer)')
+            self.check(_asset_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_2_txn_index].AssetReceiver == pool_address)')
+            self.check(_xfer_asset(txn) == self.asset_2_id, 'assert(Gtxn[asset_2_txn_index].XferAsset == asset_2_id)')
+        return txn
+
+    def add_initial_liquidity(self):
+        asset_1_txn_index = self.index(self.txn_index - 2, 'asset_1_txn_index = Txn.GroupIndex - 2')
+        asset_2_txn_index = self.index(self.txn_index - 1, 'asset_2_txn_index = Txn.GroupIndex - 1')
+
+        txn = self.gtxn(asset_1_txn_index, 'assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)')
+        self.check(_type_enum(txn) == 'axfer', 'assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)')
+        self.check(_asset_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_1_txn_index].AssetReceiver == pool_address)')
+        self.check(_xfer_asset(txn) == self.asset_1_id, 'assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)')
+        self.check(txn.sender == self.user_address, 'assert(Gtxn[asset_1_txn_index].Sender == user_address)')
+        asset_1_amount = _asset_amount(txn)
+        self.check(asset_1_amount, 'assert(asset_1_amount)')
+
+        txn = self.check_asset_2_transfer(asset_2_txn_index)
+        asset_2_amount = _amount(txn) if self.asset_2_id == 0 else _asset_amount(txn)
+        self.check(asset_2_amount, 'assert(asset_2_amount)')
+        self.check(txn.sender == self.user_address, 'assert(Gtxn[asset_2_txn_index].Sender == user_address)')
+
+        self.check(isqrt(asset_1_amount * asset_2_amount) > LOCKED_POOL_TOKENS, 'assert(issued_pool_tokens > LOCKED_POOL_TOKENS)')
+
+    def remove_liquidity(self):
+        self.btoi(self.arg(self.txn, 1, 'int min_output_1 = btoi(Txn.ApplicationArgs[1])'), 'int min_output_1 = btoi(Txn.ApplicationArgs[1])')
+        self.btoi(self.arg(self.txn, 2, 'int min_output_2 = btoi(Txn.ApplicationArgs[2])'), 'int min_output_2 = btoi(Txn.ApplicationArgs[2])')
+
+        pool_token_txn_index = self.index(self.txn_index - 1, 'int pool_token_txn_index = Txn.GroupIndex - 1')
+        txn = self.gtxn(pool_token_txn_index, 'assert(Gtxn[pool_token_txn_index].TypeEnum == Axfer)')
+        self.check(_type_enum(txn) == 'axfer', 'assert(Gtxn[pool_token_txn_index].TypeEnum == Axfer)')
+        self.check(_asset_receiver(txn) == self.pool_address, 'assert(Gtxn[pool_token_txn_index].AssetReceiver == pool_address)')
+        self.check(_xfer_asset(txn) == self.pool_token_asset_id, 'assert(Gtxn[pool_token_txn_index].XferAsset == pool_token_asset_id)')
+        self.check(txn.sender == self.user_address, 'assert(Gtxn[pool_token_txn_index].Sender == user_address)')
+        self.check(_asset_amount(txn), 'assert(removed_pool_token_amount)')
+
+        assets = self.txn.foreign_assets or []
+        if len(assets) == 2:
+            self.check(assets[0] == self.asset_1_id, 'assert(Txn.Assets[0] == asset_1_id)')
+            self.check(assets[1] == self.asset_2_id, 'assert(Txn.Assets[1] == asset_2_id)')
+        elif len(assets) == 1:
+            if assets[0] not in (self.asset_1_id, self.asset_2_id):
+                self.fail('error()')
+        else:
+            self.fail('error()')
+
+    def check_pair_txn(self, txn, method, prefix):
+        # The common asserts of flash_loan, verify_flash_loan, flash_swap and verify_flash_swap on the other app call
+        self.check(_type_enum(txn) == 'appl', f'assert(Gtxn[{prefix}_txn_index].TypeEnum == Appl)')
+        self.check(self.on_completion(txn) == OnComplete.NoOpOC, f'assert(Gtxn[{prefix}_txn_index].OnCompletion == NoOp)')
+        self.check(self.application_id(txn) == self.app_id, f'assert(Gtxn[{prefix}_txn_index].ApplicationID == Global.CurrentApplicationID)')
+        source_line = f'assert(Gtxn[{prefix}_txn_index].ApplicationArgs[0] == "{method}")'
+        self.check(self.arg(txn, 0, source_line) == method.encode(), source_line)
+        # index diffs must be the same
+        source_line = f'assert(Gtxn[{prefix}_txn_index].ApplicationArgs[1] == Txn.ApplicationArgs[1])'
+        self.check(self.arg(txn, 1, source_line) == self.txn.app_args[1], source_line)
+        # pools must be the same
+        source_line = f'assert(Gtxn[{prefix}_txn_index].Accounts[1] == Txn.Accounts[1])'
+        self.check(self.account(txn, 1, source_line) == self.pool_address, source_line)
+
+    def flash_loan(self):
+        index_diff = self.btoi(self.arg(self.txn, 1, 'int index_diff = btoi(Txn.ApplicationArgs[1])'), 'int index_diff = btoi(Txn.ApplicationArgs[1])')
+        verify_flash_loan_txn_index = self.txn_index + index_diff
+        asset_1_amount = self.btoi(self.arg(self.txn, 2, 'int asset_1_amount = btoi(Txn.ApplicationArgs[2])'), 'int asset_1_amount = btoi(Txn.ApplicationArgs[2])')
+        asset_2_amount = self.btoi(self.arg(self.txn, 3, 'int asset_2_amount = btoi(Txn.ApplicationArgs[3])'), 'int asset_2_amount = btoi(Txn.ApplicationArgs[3])')
+        if asset_1_amount and asset_2_amount:
+            self.check(index_diff > 2, 'assert(index_diff > 2)')
+        else:
+            self.check(index_diff > 1, 'assert(index_diff > 1)')
+            self.check(asset_1_amount or asset_2_amount, 'assert(asset_1_amount || asset_2_amount)')
+
+        txn = self.gtxn(verify_flash_loan_txn_index, 'assert(Gtxn[verify_flash_loan_txn_index].TypeEnum == Appl)')
+        self.check_pair_txn(txn, 'verify_flash_loan', 'verify_flash_loan')
+        self.check(txn.sender == self.user_address, 'assert(Gtxn[verify_flash_loan_txn_index].Sender == user_address)')
+
+    def get_repayment_amount(self, output_amount, asset):
+        source_line = f'{asset}_total_fee_amount, {asset}_poolers_fee_amount, {asset}_protocol_fee_amount = calculate_fixed_input_fee_amounts({asset}_output_amount)'
+        try:
+            total_fee_amount, _, _ = calculate_fixed_input_fee_amounts(output_amount, self.total_fee_share, self.protocol_fee_ratio)
+        except LogicError:
+            self.fail(source_line)
+        self.check(total_fee_amount, f'assert({asset}_total_fee_amount)')
+        try:
+            return add(output_amount, total_fee_amount)
+        except LogicError:
+            self.fail(f'{asset}_repayment_amount = {asset}_output_amount + {asset}_total_fee_amount')
+
+    def verify_flash_loan(self):
+        index_diff = self.btoi(self.arg(self.txn, 1, 'int index_diff = btoi(Txn.ApplicationArgs[1])'), 'int index_diff = btoi(Txn.ApplicationArgs[1])')
+        flash_loan_txn_index = self.index(self.txn_index - index_diff, 'int flash_loan_txn_index = Txn.GroupIndex - index_diff')
+        txn = self.gtxn(flash_loan_txn_index, 'assert(Gtxn[flash_loan_txn_index].TypeEnum == Appl)')
+        self.check_pair_txn(txn, 'flash_loan', 'flash_loan')
+        self.check(txn.sender == self.user_address, 'assert(Gtxn[flash_loan_txn_index].Sender == user_address)')
+        asset_1_output_amount = self.btoi(self.arg(txn, 2, 'int asset_1_output_amount = btoi(Gtxn[flash_loan_txn_index].ApplicationArgs[2])'), 'int asset_1_output_amount = btoi(Gtxn[flash_loan_txn_index].ApplicationArgs[2])')
+        asset_2_output_amount = self.btoi(self.arg(txn, 3, 'int asset_2_output_amount = btoi(Gtxn[flash_loan_txn_index].ApplicationArgs[3])'), 'int asset_2_output_amount = btoi(Gtxn[flash_loan_txn_index].ApplicationArgs[3])')
+
+        if asset_1_output_amount:
+            asset_1_repayment_amount = self.get_repayment_amount(asset_1_output_amount, 'asset_1')
+            if asset_2_output_amount:
+                asset_1_txn_index = self.index(self.txn_index - 2, 'asset_1_txn_index = Txn.GroupIndex - 2')
+            else:
+                asset_1_txn_index = self.index(self.txn_index - 1, 'asset_1_txn_index = Txn.GroupIndex - 1')
+
+            txn = self.gtxn(asset_1_txn_index, 'assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)')
+            self.check(_type_enum(txn) == 'axfer', 'assert(Gtxn[asset_1_txn_index].TypeEnum == Axfer)')
+            self.check(_xfer_asset(txn) == self.asset_1_id, 'assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)')
+            self.check(_asset_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_1_txn_index].AssetReceiver == pool_address)')
+            self.check(_asset_amount(txn) >= asset_1_repayment_amount, 'assert(Gtxn[asset_1_txn_index].AssetAmount >= asset_1_repayment_amount)')
+            self.check(txn.sender == self.user_address, 'assert(Gtxn[asset_1_txn_index].Sender == user_address)')
+
+        if asset_2_output_amount:
+            asset_2_repayment_amount = self.get_repayment_amount(asset_2_output_amount, 'asset_2')
+            asset_2_txn_index = self.index(self.txn_index - 1, 'int asset_2_txn_index = Txn.GroupIndex - 1')
+            if self.asset_2_id == 0:
+                txn = self.gtxn(asset_2_txn_index, 'assert(Gtxn[asset_2_txn_index].TypeEnum == Pay)')
+                self.check(_type_enum(txn) == 'pay', 'assert(Gtxn[asset_2_txn_index].TypeEnum == Pay)')
+                self.check(_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_2_txn_index].Receiver == pool_address)')
+                self.check(_amount(txn) >= asset_2_repayment_amount, 'assert(Gtxn[asset_2_txn_index].Amount >= asset_2_repayment_amount)')
+            else:
+                txn = self.gtxn(asset_2_txn_index, 'assert(Gtxn[asset_2_txn_index].TypeEnum == Axfer)')
+                self.check(_type_enum(txn) == 'axfer', 'assert(Gtxn[asset_2_txn_index].TypeEnum == Axfer)')
+                self.check(_xfer_asset(txn) == self.asset_2_id, 'assert(Gtxn[asset_2_txn_index].XferAsset == asset_2_id)')
+                self.check(_asset_receiver(txn) == self.pool_address, 'assert(Gtxn[asset_2_txn_index].AssetReceiver == pool_address)')
+                self.check(_asset_amount(txn) >= asset_2_repayment_amount, 'assert(Gtxn[asset_2_txn_index].AssetAmount >= asset_2_repayment_amount)')
+            self.check(txn.sender == self.user_address, 'assert(Gtxn[asset_2_txn_index].Sender == user_address)')
+
+    def flash_swap(self):
+        index_diff = self.btoi(self.arg(self.txn, 1, 'int index_diff = btoi(Txn.ApplicationArgs[1])'), 'int index_diff = btoi(Txn.ApplicationArgs[1])')
+        self.check(index_diff > 1, 'assert(index_diff > 1)')
+        verify_flash_swap_txn_index = self.txn_index + index_diff
+        txn = self.gtxn(verify_flash_swap_txn_index, 'assert(Gtxn[verify_flash_swap_txn_index].TypeEnum == Appl)')
+        self.check_pair_txn(txn, 'verify_flash_swap', 'verify_flash_swap')
+        self.check(txn.sender == self.user_address, 'assert(Gtxn[verify_flash_swap_txn_index].Sender == user_address)')
+        asset_1_output_amount = self.btoi(self.arg(self.txn, 2, 'int asset_1_output_amount = btoi(Txn.ApplicationArgs[2])'), 'int asset_1_output_amount = btoi(Txn.ApplicationArgs[2])')
+        asset_2_output_amount = self.btoi(self.arg(self.txn, 3, 'int asset_2_output_amount = btoi(Txn.ApplicationArgs[3])'), 'int asset_2_output_amount = btoi(Txn.ApplicationArgs[3])')
+        self.check(asset_1_output_amount or asset_2_output_amount, 'assert(asset_1_output_amount || asset_2_output_amount)')
+        self.locks[self.pool_address] = 1
+
+    def verify_flash_swap(self):
+        index_diff = self.btoi(self.arg(self.txn, 1, 'int index_diff = btoi(Txn.ApplicationArgs[1])'), 'int index_diff = btoi(Txn.ApplicationArgs[1])')
+        flash_swap_txn_index = self.index(self.txn_index - index_diff, 'int flash_swap_txn_index = Txn.GroupIndex - index_diff')
+        txn = self.gtxn(flash_swap_txn_index, 'assert(Gtxn[flash_swap_txn_index].TypeEnum == Appl)')
+        self.check_pair_txn(txn, 'flash_swap', 'flash_swap')
+        self.locks[self.pool_address] = 0
+
+
+def validate_transaction_group(txn_group, pool_states, app_id=APPLICATION_ID):
+    """
+    Raises PreflightError for the first app call of the group which fails a structural assert.
+    txn_group can contain signed or unsigned transactions, pool_states is a dict of the pool local states by the pool address.
+    """
+    txns = [getattr(txn, 'transaction', txn) for txn in txn_group]
+    # The lock is set by flash_swap and reset by verify_flash_swap in the same group
+    locks = {}
+    for txn_index, txn in enumerate(txns):
+        if txn.type == 'appl' and txn.index == app_id and txn.on_complete == OnComplete.NoOpOC:
+            _AppCall(txns, txn_index, pool_states, locks, app_id).validate()
+
+
+def validate_transaction_groups(txn_groups, pool_states, app_id=APPLICATION_ID):
+    """
+    Returns a list with a PreflightError or None for each group.
+    """
+    errors = []
+    for txn_group in txn_groups:
+        try:
+            validate_transaction_group(txn_group, pool_states, app_id=app_id)
+        except PreflightError as e:
+            errors.append(e)
+        else:
+            errors.append(None)
+    return errors
@@ -0,0 +1,115 @@
+"""
+Python mirror of price_oracle_reader.tl, the reference consumer of the price oracle of the pools.
+
+The reader keeps the last observation of each pool in its global state and stores the average prices since the
+previous observation, as (cumulative price - previous cumulative price) / time delta scaled by PRICE_SCALE_FACTOR.
+The global state is a dict of the same keys and values as the app ({b'<pool public key>_asset_1_price': bytes, ...}),
+read() returns the global state delta the app call would have (b'dt' b'gd' of the block transaction).
+"""
+from algosdk.encoding import decode_address
+
+from .amm_math import LogicError, bdiv, bsub, sub
+from .utils import int_to_bytes_without_zero_padding
+
+ASSET_1_CUMULATIVE_PRICE_SUFFIX = b'_asset_1_cumulative_price'
+ASSET_2_CUMULATIVE_PRICE_SUFFIX = b'_asset_2_cumulative_price'
+PRICE_UPDATE_TIMESTAMP_SUFFIX = b'_price_update_timestamp'
+ASSET_1_PRICE_SUFFIX = b'_asset_1_price'
+ASSET_2_PRICE_SUFFIX = b'_asset_2_price'
+
+# EvalDelta action types
+SET_BYTES = 1
+SET_UINT = 2
+
+
+def _to_bytes(value):
+    # The local state values are kept as they are, i.e. the initial BYTE_ZERO is 8 bytes
+    return value if isinstance(value, bytes) else int_to_bytes_without_zero_padding(value)
+
+
+def _int(value):
+    return int.from_bytes(value, 'big') if isinstance(value, bytes) else value
+
+
+def calculate_prices(previous_cumulative_prices, cumulative_prices, time_delta):
+    """
+    Returns (asset_1_price, asset_2_price) as the byte values the reader stores, byte math results have no zero padding.
+    The cumulative prices are (asset_1_cumulative_price, asset_2_cumulative_price) pairs of bytes or ints.
+    """
+    if time_delta == 0:
+        raise LogicError("division by zero")
+    return tuple(
+        int_to_bytes_without_zero_padding(bdiv(bsub(_int(current), _int(previous)), time_delta))
+        for previous, current in zip(previous_cumulative_prices, cumulative_prices)
+    )
+
+
+class PriceOracleReader:
+    """
+    Global state of a price_oracle_reader.tl app. The pools are read in order, like the app calls of the blocks.
+    A read fails with LogicError where the app call fails, the global state is not changed then.
+    """
+
+    def __init__(self, global_state=None):
+        self.global_state = dict(global_state or {})
+
+    @staticmethod
+    def _keys(pool_address):
+        public_key = decode_address(pool_address) if isinstance(pool_address, str) else pool_address
+        return tuple(public_key + suffix for suffix in (
+            ASSET_1_CUMULATIVE_PRICE_SUFFIX, ASSET_2_CUMULATIVE_PRICE_SUFFIX, PRICE_UPDATE_TIMESTAMP_SUFFIX,
+            ASSET_1_PRICE_SUFFIX, ASSET_2_PRICE_SUFFIX,
+        ))
+
+    def read(self, pool_address, asset_1_cumulative_price, asset_2_cumulative_price, cumulative_price_update_timestamp):
+        """
+        Reads the oracle state of the pool (local state values, the cumulative prices are bytes or ints)
+        and returns the global state delta.
+        """
+        asset_1_cumulative_price_key, asset_2_cumulative_price_key, timestamp_key, asset_1_price_key, asset_2_price_key = self._keys(pool_address)
+        previous_timestamp = self.global_state.get(timestamp_key, 0)
+        time_delta = sub(cumulative_price_update_timestamp, previous_timestamp)
+        if not time_delta:
+            return {}
+
+        updates = {}
+        if previous_timestamp:
+            asset_1_price, asset_2_price = calculate_prices(
+                (self.global_state[asset_1_cumulative_price_key], self.global_state[asset_2_cumulative_price_key]),
+                (asset_1_cumulative_price, asset_2_cumulative_price),
+                time_delta,
+            )
+            updates[asset_1_price_key] = asset_1_price
+            updates[asset_2_price_key] = asset_2_price
+        updates[asset_1_cumulative_price_key] = _to_bytes(asset_1_cumulative_price)
+        updates[asset_2_cumulative_price_key] = _to_bytes(asset_2_cumulative_price)
+        updates[timestamp_key] = cumulative_price_update_timestamp
+
+        # Puts of the same value are not in the delta
+        delta = {}
+        for key, value in updates.items():
+            if self.global_state.get(key) != value:
+                delta[key] = {b'at': SET_UINT, b'ui': value} if isinstance(value, int) else {b'at': SET_BYTES, b'bs': value}
+        self.global_state.update(updates)
+        return delta
+
+    def read_pool_state(self, pool_address, pool_state):
+        """
+        Reads a PoolState of PoolStateStore. The store keeps the cumulative prices as ints, so the initial BYTE_ZERO
+        is stored as empty bytes, the prices are the same.
+        """
+        return self.read(pool_address, pool_state.asset_1_cumulative_price, pool_state.asset_2_cumulative_price, pool_state.cumulative_price_update_timestamp)
+
+    def read_many(self, observations):
+        """
+        Reads (pool_address, asset_1_cumulative_price, asset_2_cumulative_price, cumulative_price_update_timestamp) tuples
+        in order and returns the deltas. A failing read raises LogicError, the reads before it are kept.
+        """
+        return [self.read(*observation) for observation in observations]
+
+    def get_prices(self, pool_address):
+        """ Returns (asset_1_price, asset_2_price) as ints scaled by PRICE_SCALE_FACTOR, or None before the second read """
+        keys = self._keys(pool_address)
+        if keys[3] not in self.global_state:
+            return None
+        return int.from_bytes(self.global_state[keys[3]], 'big'), int.from_bytes(self.global_state[keys[4]], 'big')
@@ -0,0 +1,343 @@
+"""
+Opcode cost profiler of the AMM approval program.
+
+The annotated TEAL (contracts/build/amm_approval.teal) is split into basic blocks. A probe is added after every
+conditional branch which counts the executions of the fall through path in a uint64 counter, the counters are logged
+before every `return`. A counter overflow fails the evaluation (`+ overflowed`) instead of wrapping.
+The other execution counts follow from the control flow, the program has no loops. The cost of an op is its
+static opcode cost multiplied by the execution count of its basic block. Costs are attributed to the Tealish source
+line (the `//` comment before the op) and to the enclosing Tealish block or function.
+
+A probe per basic block would not fit into the maximum program size (8192 bytes).
+The probes have their own cost, so the profiled group is extended with app calls to a budget app which pool
+their budget with the group. The cost of the probes is not included in the profile.
+The instrumented program is installed on a copy of the ledger with JigLedger.create_app.
+"""
+import re
+from collections import defaultdict, namedtuple
+from copy import deepcopy
+
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import APP_GLOBAL_BYTES, APP_GLOBAL_INTS, APP_LOCAL_BYTES, APP_LOCAL_INTS, APPLICATION_ID
+from .core import copy_ledger
+
+AMM_APPROVAL_TEAL_FILENAME = 'contracts/build/amm_approval.teal'
+
+# Opcode costs of the AVM (v7), other opcodes cost 1
+OPCODE_COSTS = {
+    'sha256': 35,
+    'keccak256': 130,
+    'sha512_256': 45,
+    'sha3_256': 130,
+    'ed25519verify': 1900,
+    'ed25519verify_bare': 1900,
+    'ecdsa_verify': 1700,
+    'ecdsa_pk_decompress': 650,
+    'ecdsa_pk_recover': 2000,
+    'vrf_verify': 5700,
+    'bsqrt': 40,
+    'b+': 10,
+    'b-': 10,
+    'b/': 20,
+    'b*': 20,
+    'b%': 20,
+    'b|': 6,
+    'b&': 6,
+    'b^': 6,
+    'b~': 4,
+}
+DEFAULT_OPCODE_COST = 1
+
+CONDITIONAL_BRANCH_OPCODES = {'bz', 'bnz'}
+# Ops which end a basic block
+BRANCH_OPCODES = {'b', 'callsub', 'retsub', 'return', 'err'} | CONDITIONAL_BRANCH_OPCODES
+
+PROBE_SLOT = 254
+PROFILE_SLOT = 255
+PROBE_LABEL = 'profiler__probe'
+# The offset of the uint64 counter of the probe is stored in PROBE_SLOT
+PROBE_SUBROUTINE = [
+    f'{PROBE_LABEL}:',
+    'pushint 8',
+    '*',
+    f'store {PROBE_SLOT}',
+    f'load {PROFILE_SLOT}',
+    f'load {PROBE_SLOT}',
+    f'load {PROFILE_SLOT}',
+    f'load {PROBE_SLOT}',
+    'extract_uint64',
+    'pushint 1',
+    '+',
+    'itob',
+    'replace3',
+    f'store {PROFILE_SLOT}',
+    'retsub',
+]
+COUNTER_SIZE = 8
+# The counters are logged at once
+MAX_LOG_SIZE = 1024
+
+MAX_GROUP_SIZE = 16
+BUDGET_APP_ID = 10_000
+BUDGET_APP_TEAL = '#pragma version 7\npushint 1\nreturn\n'
+
+TealOp = namedtuple('TealOp', ['teal_line_no', 'opcode', 'cost', 'basic_block', 'source_line', 'scope'])
+
+TOP_LEVEL_SCOPE = '(top level)'
+
+
+class BasicBlock:
+
+    def __init__(self):
+        self.labels = []
+        self.ops = []
+        # Index of the probe counting the fall through executions of the conditional branch
+        self.probe = None
+
+    @property
+    def last_op(self):
+        return self.ops[-1] if self.ops else None
+
+
+def get_opcode_cost(opcode):
+    return OPCODE_COSTS.get(opcode, DEFAULT_OPCODE_COST)
+
+
+def parse_annotated_teal(teal):
+    """
+    Returns the ops and the basic blocks of the TEAL, and the instrumented TEAL which counts the executions of the
+    fall through paths of the conditional branches.
+    """
+    ops = []
+    basic_blocks = []
+    instrumented_lines = []
+    scopes = []
+    source_line = None
+    basic_block = None
+    probe_count = 0
+
+    for teal_line_no, line in enumerate(teal.split('\n')):
+        stripped_line = line.strip()
+        indent = len(line) - len(line.lstrip())
+
+        if not stripped_line or stripped_line.startswith('#'):
+            instrumented_lines.append(line)
+            continue
+
+        if stripped_line.startswith('//'):
+            comment = stripped_line[2:].strip()
+            scope_match = re.match(r'(block|func) (\w+)', comment)
+            if scope_match:
+                while scopes and scopes[-1][0] >= indent:
+                    scopes.pop()
+                scopes.append((indent, scope_match.group(2)))
+                source_line = comment
+            elif comment:
+                source_line = re.sub(r' \[slot \d+\]$', '', comment)
+            instrumented_lines.append(line)
+            continue
+
+        instrumented_lines.append(line)
+        label_match = re.match(r'^(\w+):', stripped_line)
+        if label_match:
+            if basic_block is None or basic_block.ops:
+                basic_block = BasicBlock()
+                basic_blocks.append(basic_block)
+            basic_block.labels.append(label_match.group(1))
+            continue
+
+        opcode, *args = stripped_line.split('//')[0].split()
+        if opcode in ('load', 'store') and int(args[0]) in (PROBE_SLOT, PROFILE_SLOT):
+            raise ValueError(f'Scratch slot {args[0]} is used by the program, it is reserved for the profiler.')
+        if opcode in ('switch', 'match'):
+            raise ValueError(f'{opcode} is not supported.')
+
+        if basic_block is None:
+            basic_block = BasicBlock()
+            basic_blocks.append(basic_block)
+        scope = '.'.join(name for _, name in scopes) or TOP_LEVEL_SCOPE
+        op = TealOp(teal_line_no + 1, opcode, get_opcode_cost(opcode), len(basic_blocks) - 1, source_line, scope)
+        ops.append(op)
+        basic_block.ops.append((op, args))
+
+        padding = ' ' * indent
+        if opcode == 'return':
+            instrumented_lines[-1:-1] = [padding + f'load {PROFILE_SLOT}', padding + 'log']
+        if opcode in CONDITIONAL_BRANCH_OPCODES:
+            instrumented_lines.extend([padding + f'pushint {probe_count}', padding + f'callsub {PROBE_LABEL}'])
+            basic_block.probe = probe_count
+            probe_count += 1
+        if opcode in BRANCH_OPCODES:
+            basic_block = None
+
+    if probe_count * COUNTER_SIZE > MAX_LOG_SIZE:
+        raise ValueError(f'The counters of {probe_count} probes do not fit in a log.')
+    pragma_index = next(i for i, line in enumerate(instrumented_lines) if line.startswith('#pragma'))
+    instrumented_lines[pragma_index + 1:pragma_index + 1] = [
+        f'pushint {probe_count * COUNTER_SIZE}',
+        'bzero',
+        f'store {PROFILE_SLOT}',
+    ]
+    instrumented_lines.extend(PROBE_SUBROUTINE)
+    return ops, basic_blocks, probe_count, '\n'.join(instrumented_lines)
+
+
+def get_basic_block_counts(basic_blocks, probe_counts):
+    """ Returns the execution counts of the basic blocks from the fall through counts of the conditional branches """
+    label_indexes = {label: i for i, basic_block in enumerate(basic_blocks) for label in basic_block.labels}
+
+    # incoming edges: (source block index, function of the source block count)
+    incoming_edges = defaultdict(list)
+    for i, basic_block in enumerate(basic_blocks):
+        op, args = basic_block.last_op
+        next_index = i + 1
+        if op.opcode == 'b':
+            incoming_edges[label_indexes[args[0]]].append((i, lambda count: count))
+        elif op.opcode in CONDITIONAL_BRANCH_OPCODES:
+            probe_count = probe_counts[basic_block.probe]
+            incoming_edges[label_indexes[args[0]]].append((i, lambda count, probe_count=probe_count: count - probe_count))
+            incoming_edges[next_index].append((i, lambda count, probe_count=probe_count: probe_count))
+        elif op.opcode == 'callsub':
+            # The subroutine returns to the next op
+            incoming_edges[label_indexes[args[0]]].append((i, lambda count: count))
+            incoming_edges[next_index].append((i, lambda count: count))
+        elif op.opcode not in BRANCH_OPCODES:
+            incoming_edges[next_index].append((i, lambda count: count))
+
+    counts = [None] * len(basic_blocks)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(basic_blocks)):
+            if counts[i] is not None:
+                continue
+            edges = incoming_edges[i]
+            if all(counts[source] is not None for source, _ in edges):
+                counts[i] = (1 if i == 0 else 0) + sum(f(counts[source]) for source, f in edges)
+                changed = True
+    if None in counts:
+        raise ValueError('Programs with loops are not supported.')
+    return counts
+
+
+def get_inner_transaction_count(txn):
+    inner_transactions = txn.get(b'dt', {}).get(b'itx', [])
+    return len(inner_transactions) + sum(get_inner_transaction_count(inner_txn) for inner_txn in inner_transactions)
+
+
+class CostProfile:
+    """ Opcode cost of an app call """
+
+    def __init__(self, ops, basic_block_counts, txn_index, inner_transaction_count=0):
+        self.ops = ops
+        self.basic_block_counts = basic_block_counts
+        self.txn_index = txn_index
+        self.inner_transaction_count = inner_transaction_count
+
+    def get_op_cost(self, op):
+        return op.cost * self.basic_block_counts[op.basic_block]
+
+    @property
+    def total_cost(self):
+        return sum(self.get_op_cost(op) for op in self.ops)
+
+    def get_source_line_costs(self):
+        """ Returns (scope, source line, cost) of the executed Tealish lines in program order """
+        costs = {}
+        for op in self.ops:
+            cost = self.get_op_cost(op)
+            if cost:
+                key = (op.scope, op.source_line)
+                costs[key] = costs.get(key, 0) + cost
+        return [(scope, source_line, cost) for (scope, source_line), cost in costs.items()]
+
+    def get_scope_costs(self):
+        """ Returns {scope: cost} of the executed Tealish blocks and functions """
+        costs = defaultdict(int)
+        for op in self.ops:
+            cost = self.get_op_cost(op)
+            if cost:
+                costs[op.scope] += cost
+        return dict(costs)
+
+    def format_cost_table(self, lines=False):
+        rows = [(scope, cost) for scope, cost in sorted(self.get_scope_costs().items(), key=lambda item: -item[1])]
+        width = max([len(scope) for scope, _ in rows] + [len('total')])
+        table = [f'{"block / func":<{width}}  {"cost":>6}']
+        for scope, cost in rows:
+            table.append(f'{scope:<{width}}  {cost:>6}')
+        table.append(f'{"total":<{width}}  {self.total_cost:>6}')
+        if lines:
+            table.append('')
+            for scope, source_line, cost in self.get_source_line_costs():
+                table.append(f'{cost:>6}  {scope}: {source_line}')
+        return '\n'.join(table)
+
+
+class CostProfiler:
+
+    def __init__(self, teal_filename=AMM_APPROVAL_TEAL_FILENAME, app_id=APPLICATION_ID):
+        from algojig import TealProgram
+        with open(teal_filename) as f:
+            self.teal = f.read()
+        self.app_id = app_id
+        self.ops, self.basic_blocks, self.probe_count, self.instrumented_teal = parse_annotated_teal(self.teal)
+        self.instrumented_program = TealProgram(teal=self.instrumented_teal)
+        self.budget_app_program = TealProgram(teal=BUDGET_APP_TEAL)
+        self.budget_sk, self.budget_address = generate_account()
+
+    def prepare_ledger(self, ledger):
+        ledger = copy_ledger(ledger)
+        # The global and local states of the app are kept
+        ledger.create_app(
+            app_id=self.app_id,
+            approval_program=self.instrumented_program,
+            local_ints=APP_LOCAL_INTS,
+            local_bytes=APP_LOCAL_BYTES,
+            global_ints=APP_GLOBAL_INTS,
+            global_bytes=APP_GLOBAL_BYTES
+        )
+        ledger.create_app(app_id=BUDGET_APP_ID, approval_program=self.budget_app_program)
+        ledger.set_account_balance(self.budget_address, 1_000_000)
+        return ledger
+
+    def sign_group(self, txn_group, signers, sp):
+        txn_group = deepcopy(txn_group)
+        for txn in txn_group:
+            txn.group = None
+        budget_txns = [
+            transaction.ApplicationNoOpTxn(sender=self.budget_address, sp=sp, index=BUDGET_APP_ID, note=i.to_bytes(1, 'big'))
+            for i in range(MAX_GROUP_SIZE - len(txn_group))
+        ]
+        txn_group = transaction.assign_group_id(txn_group + budget_txns)
+
+        stxns = []
+        for txn in txn_group:
+            signer = self.budget_sk if txn.sender == self.budget_address else signers[txn.sender]
+            if isinstance(signer, transaction.LogicSigAccount):
+                stxns.append(transaction.LogicSigTransaction(txn, signer))
+            else:
+                stxns.append(txn.sign(signer))
+        return stxns
+
+    def profile(self, ledger, txn_group, signers, sp, block_timestamp=1000):
+        """
+        Evaluates the group on a copy of the ledger with the instrumented program and returns a CostProfile for each app call.
+        signers: {address: secret key or LogicSigAccount}, the group is signed again because budget app calls are added to it.
+        """
+        ledger = self.prepare_ledger(ledger)
+        stxns = self.sign_group(txn_group, signers, sp)
+        block = ledger.eval_transactions(stxns, block_timestamp=block_timestamp)
+
+        profiles = []
+        for txn_index, txn in enumerate(block[b'txns'][:len(txn_group)]):
+            if txn[b'txn'].get(b'apid') != self.app_id:
+                continue
+            counters = txn[b'dt'][b'lg'][-1]
+            assert len(counters) == self.probe_count * COUNTER_SIZE
+            probe_counts = [int.from_bytes(counters[i:i + COUNTER_SIZE], 'big') for i in range(0, len(counters), COUNTER_SIZE)]
+            basic_block_counts = get_basic_block_counts(self.basic_blocks, probe_counts)
+            profiles.append(CostProfile(self.ops, basic_block_counts, txn_index, get_inner_transaction_count(txn)))
+        return profiles
@@ -0,0 +1,76 @@
+import hashlib
+import importlib.metadata
+import os
+import pickle
+
+# Compiled programs are pickled under a key of the Tealish source and the compiler versions,
+# so editing a contract (or upgrading Tealish/AlgoJig) is always a cache miss.
+PROGRAM_CACHE_DIR = os.environ.get('TINYMAN_PROGRAM_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.program_cache'))
+
+
+def _get_version(package):
+    try:
+        return importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+def get_program_cache_key(source):
+    h = hashlib.sha256()
+    for package in ['tealish', 'algojig']:
+        h.update(f'{package}=={_get_version(package)}\n'.encode())
+    h.update(source)
+    return h.hexdigest()
+
+
+def load_tealish_program(filename):
+    """ The same as TealishProgram(filename), compiled programs are read from the cache when the source is unchanged. """
+    with open(filename, 'rb') as f:
+        source = f.read()
+    cache_key = get_program_cache_key(source)
+    cache_path = os.path.join(PROGRAM_CACHE_DIR, f'{os.path.basename(filename)}.{cache_key}.pickle')
+
+    try:
+        with open(cache_path, 'rb') as f:
+            program = pickle.load(f)
+        program.filename = filename
+        return program
+    except Exception:
+        # Missing or unreadable cache entry
+        pass
+
+    from algojig import TealishProgram
+    program = TealishProgram(filename)
+    try:
+        os.makedirs(PROGRAM_CACHE_DIR, exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(program, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # The cache is an optimization, a read-only checkout still works
+        pass
+    return program
+
+
+class LazyTealishProgram:
+    """ A TealishProgram proxy, the program is loaded with load_tealish_program on first attribute access. """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._program = None
+
+    def load(self):
+        if self._program is None:
+            self._program = load_tealish_program(self.filename)
+        return self._program
+
+    def __getattr__(self, name):
+        # Only called for attributes which are not set on the proxy
+        if name.startswith('__') or name == '_program':
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        state = 'loaded' if self._program is not None else 'not loaded'
+        return f'<LazyTealishProgram {self.filename} ({state})>'
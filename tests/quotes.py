@@ -0,0 +1,449 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .amm_math import (LogicError, add, bdiv, bsqrt, btoi, calculate_fixed_input_fee_amounts, calculate_fixed_input_swap,
+                       calculate_fixed_output_fee_amounts, calculate_fixed_output_swap, check_pool_token_value, sub)
+from .constants import LOCKED_POOL_TOKENS, MAX_UINT64
+
+SwapQuote = namedtuple('SwapQuote', ['input_amount', 'swap_amount', 'change', 'output_amount', 'poolers_fee_amount', 'protocol_fee_amount', 'total_fee_amount'])
+
+# Batch quotes are arrays of the same fields and a `valid` mask.
+# The fields of the invalid elements (the ones the contract would reject) are undefined.
+SwapQuotes = namedtuple('SwapQuotes', ['valid', *SwapQuote._fields])
+
+# The reserves and issued pool tokens are the pool state after the transaction
+AddLiquidityQuote = namedtuple('AddLiquidityQuote', ['asset_1_amount', 'asset_2_amount', 'pool_tokens_out', 'swap_amount', 'swap_from_asset_1', 'fee_as_pool_tokens', 'poolers_fee_amount', 'protocol_fee_amount', 'total_fee_amount', 'asset_1_reserves', 'asset_2_reserves', 'issued_pool_tokens'])
+AddLiquidityQuotes = namedtuple('AddLiquidityQuotes', ['valid', *AddLiquidityQuote._fields])
+
+# asset_1_amount and asset_2_amount are the amounts sent to the user, the swap fields are 0 in the two asset mode
+RemoveLiquidityQuote = namedtuple('RemoveLiquidityQuote', ['pool_token_amount', 'asset_1_amount', 'asset_2_amount', 'swap_amount', 'swap_output_amount', 'poolers_fee_amount', 'protocol_fee_amount', 'total_fee_amount', 'asset_1_reserves', 'asset_2_reserves', 'issued_pool_tokens'])
+RemoveLiquidityQuotes = namedtuple('RemoveLiquidityQuotes', ['valid', *RemoveLiquidityQuote._fields])
+
+
+def get_fixed_input_swap_quote(input_supply, output_supply, input_amount, total_fee_share, protocol_fee_ratio):
+    # Mirrors the fixed-input branch of the swap block
+    if not input_amount:
+        raise LogicError('assert(input_amount)')
+
+    total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(input_amount, total_fee_share, protocol_fee_ratio)
+    swap_amount = sub(input_amount, total_fee_amount)
+    output_amount = calculate_fixed_input_swap(input_supply, output_supply, swap_amount)
+
+    if not output_amount:
+        raise LogicError('assert(output_amount)')
+    if not total_fee_amount:
+        raise LogicError('assert(total_fee_amount)')
+
+    # input reserves update
+    add(input_supply, add(swap_amount, poolers_fee_amount))
+    return SwapQuote(input_amount, swap_amount, 0, output_amount, poolers_fee_amount, protocol_fee_amount, total_fee_amount)
+
+
+def get_fixed_output_swap_quote(input_supply, output_supply, output_amount, total_fee_share, protocol_fee_ratio, input_amount=None):
+    # Mirrors the fixed-output branch of the swap block, input_amount defaults to the required input amount (no change)
+    swap_amount = calculate_fixed_output_swap(input_supply, output_supply, output_amount)
+    total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_output_fee_amounts(swap_amount, total_fee_share, protocol_fee_ratio)
+    required_input_amount = add(swap_amount, total_fee_amount)
+    if input_amount is None:
+        input_amount = required_input_amount
+
+    if not input_amount:
+        raise LogicError('assert(input_amount)')
+    if not output_amount:
+        raise LogicError('assert(output_amount)')
+    if not total_fee_amount:
+        raise LogicError('assert(total_fee_amount)')
+    if input_amount < required_input_amount:
+        raise LogicError('assert(input_amount >= required_input_amount)')
+
+    # input reserves update
+    add(input_supply, add(swap_amount, poolers_fee_amount))
+    change = input_amount - required_input_amount
+    return SwapQuote(input_amount, swap_amount, change, output_amount, poolers_fee_amount, protocol_fee_amount, total_fee_amount)
+
+
+# Vectorized uint64 arithmetic.
+# Intermediate values of the contract's byte math (k = input_supply * output_supply) need 128 bits,
+# they are handled as (hi, lo) uint64 limb pairs.
+
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_SHIFT_32 = np.uint64(32)
+_MAX_UINT64 = np.uint64(MAX_UINT64)
+_TWO_TO_THE_64 = float(2**64)
+# The largest float64 below 2**64
+_MAX_FLOAT_UINT64 = float(2**64 - 2**11)
+
+
+def _as_uint64(value):
+    return np.asarray(value, dtype=np.uint64)
+
+
+def _mul_128(a, b):
+    # 64 x 64 -> 128 bit multiplication with 32 bit limbs
+    a_lo, a_hi = a & _MASK_32, a >> _SHIFT_32
+    b_lo, b_hi = b & _MASK_32, b >> _SHIFT_32
+    lo_lo = a_lo * b_lo
+    lo_hi = a_lo * b_hi
+    hi_lo = a_hi * b_lo
+    hi_hi = a_hi * b_hi
+    middle = (lo_lo >> _SHIFT_32) + (lo_hi & _MASK_32) + (hi_lo & _MASK_32)
+    lo = (lo_lo & _MASK_32) | (middle << _SHIFT_32)
+    hi = hi_hi + (lo_hi >> _SHIFT_32) + (hi_lo >> _SHIFT_32) + (middle >> _SHIFT_32)
+    return hi, lo
+
+
+def _sub_128(a_hi, a_lo, b_hi, b_lo):
+    # a - b for a >= b
+    borrow = (a_lo < b_lo).astype(np.uint64)
+    return a_hi - b_hi - borrow, a_lo - b_lo
+
+
+def _ge_128(a_hi, a_lo, b_hi, b_lo):
+    return (a_hi > b_hi) | ((a_hi == b_hi) & (a_lo >= b_lo))
+
+
+def _to_float(hi, lo):
+    return hi.astype(np.float64) * _TWO_TO_THE_64 + lo.astype(np.float64)
+
+
+def _div_128(n_hi, n_lo, d):
+    # floor((n_hi * 2**64 + n_lo) / d) for d > 0 and n_hi < d (the quotient fits in uint64)
+    d_float = d.astype(np.float64)
+    q = np.clip(np.floor(_to_float(n_hi, n_lo) / d_float), 0, _MAX_FLOAT_UINT64).astype(np.uint64)
+
+    # The float estimate is off by at most a few thousands, correct it with the exact remainder
+    p_hi, p_lo = _mul_128(q, d)
+    over = ~_ge_128(n_hi, n_lo, p_hi, p_lo)
+    r_hi, r_lo = _sub_128(np.where(over, p_hi, n_hi), np.where(over, p_lo, n_lo), np.where(over, n_hi, p_hi), np.where(over, n_lo, p_lo))
+    correction = np.floor(_to_float(r_hi, r_lo) / d_float).astype(np.uint64)
+    q = np.where(over, q - correction, q + correction)
+
+    # The remaining error is at most 1 in either direction
+    for _ in range(2):
+        p_hi, p_lo = _mul_128(q, d)
+        over = ~_ge_128(n_hi, n_lo, p_hi, p_lo)
+        q = np.where(over, q - np.uint64(1), q)
+    for _ in range(2):
+        p_hi, p_lo = _mul_128(q + np.uint64(1), d)
+        under = _ge_128(n_hi, n_lo, p_hi, p_lo) & (q < _MAX_UINT64)
+        q = np.where(under, q + np.uint64(1), q)
+    return q
+
+
+def get_fixed_input_swap_quotes(input_supply, output_supply, input_amount, total_fee_share, protocol_fee_ratio):
+    """
+    Vectorized get_fixed_input_swap_quote, arguments are broadcast against each other.
+    """
+    input_supply, output_supply, input_amount, total_fee_share, protocol_fee_ratio = np.broadcast_arrays(
+        _as_uint64(input_supply), _as_uint64(output_supply), _as_uint64(input_amount), _as_uint64(total_fee_share), _as_uint64(protocol_fee_ratio)
+    )
+    valid = input_amount > 0
+
+    # calculate_fixed_input_fee_amounts
+    valid &= (total_fee_share == 0) | (input_amount <= _MAX_UINT64 // np.maximum(total_fee_share, np.uint64(1)))
+    valid &= protocol_fee_ratio > 0
+    total_fee_amount = (input_amount * total_fee_share) // np.uint64(10000)
+    protocol_fee_amount = total_fee_amount // np.where(valid, protocol_fee_ratio, np.uint64(1))
+    poolers_fee_amount = total_fee_amount - protocol_fee_amount
+    # The total fee is larger than the input amount if the total fee share is above 10000
+    valid &= total_fee_amount <= input_amount
+    swap_amount = input_amount - total_fee_amount
+
+    # calculate_fixed_input_swap
+    valid &= swap_amount <= _MAX_UINT64 - input_supply
+    denominator = np.where(valid, input_supply + swap_amount, np.uint64(1))
+    valid &= denominator > 0
+    denominator = np.where(valid, denominator, np.uint64(1))
+    k_hi, k_lo = _mul_128(input_supply, output_supply)
+    # input_supply <= denominator so the quotient always fits in uint64
+    quotient = _div_128(np.where(valid, k_hi, np.uint64(0)), k_lo, denominator)
+    valid &= quotient < output_supply
+    output_amount = output_supply - (quotient + np.uint64(1))
+
+    valid &= (output_amount > 0) & (total_fee_amount > 0)
+    # input reserves update
+    valid &= (swap_amount + poolers_fee_amount) <= _MAX_UINT64 - input_supply
+    change = np.zeros_like(input_amount)
+    return SwapQuotes(valid, input_amount, swap_amount, change, output_amount, poolers_fee_amount, protocol_fee_amount, total_fee_amount)
+
+
+def get_fixed_output_swap_quotes(input_supply, output_supply, output_amount, total_fee_share, protocol_fee_ratio, input_amount=None):
+    """
+    Vectorized get_fixed_output_swap_quote, arguments are broadcast against each other.
+    """
+    if input_amount is None:
+        input_amount = 0
+        use_required_input_amount = True
+    else:
+        use_required_input_amount = False
+
+    input_supply, output_supply, output_amount, total_fee_share, protocol_fee_ratio, input_amount = np.broadcast_arrays(
+        _as_uint64(input_supply), _as_uint64(output_supply), _as_uint64(output_amount), _as_uint64(total_fee_share), _as_uint64(protocol_fee_ratio), _as_uint64(input_amount)
+    )
+    valid = output_amount > 0
+
+    # calculate_fixed_output_swap
+    valid &= output_amount < output_supply
+    denominator = np.where(valid, output_supply - output_amount, np.uint64(1))
+    k_hi, k_lo = _mul_128(input_supply, output_supply)
+    # btoi fails if the quotient does not fit in uint64
+    valid &= k_hi < denominator
+    quotient = _div_128(np.where(valid, k_hi, np.uint64(0)), k_lo, denominator)
+    valid &= quotient < _MAX_UINT64
+    valid &= quotient + np.uint64(1) >= input_supply
+    swap_amount = quotient + np.uint64(1) - input_supply
+
+    # calculate_fixed_output_fee_amounts
+    valid &= (total_fee_share < np.uint64(10000)) & (swap_amount <= _MAX_UINT64 // np.uint64(10000))
+    valid &= protocol_fee_ratio > 0
+    total_amount = (swap_amount * np.uint64(10000)) // np.where(valid, np.uint64(10000) - total_fee_share, np.uint64(1))
+    total_fee_amount = total_amount - swap_amount
+    protocol_fee_amount = total_fee_amount // np.where(valid, protocol_fee_ratio, np.uint64(1))
+    poolers_fee_amount = total_fee_amount - protocol_fee_amount
+
+    # required_input_amount = swap_amount + total_fee_amount
+    valid &= total_fee_amount <= _MAX_UINT64 - swap_amount
+    required_input_amount = swap_amount + total_fee_amount
+    if use_required_input_amount:
+        input_amount = required_input_amount
+    valid &= (input_amount > 0) & (total_fee_amount > 0) & (input_amount >= required_input_amount)
+    change = input_amount - required_input_amount
+
+    # input reserves update
+    valid &= (swap_amount + poolers_fee_amount) <= _MAX_UINT64 - input_supply
+    return SwapQuotes(valid, input_amount, swap_amount, change, output_amount, poolers_fee_amount, protocol_fee_amount, total_fee_amount)
+
+
+def get_add_initial_liquidity_quote(asset_1_amount, asset_2_amount):
+    # Mirrors the add_initial_liquidity block
+    if not asset_1_amount:
+        raise LogicError('assert(asset_1_amount)')
+    if not asset_2_amount:
+        raise LogicError('assert(asset_2_amount)')
+
+    # pool_tokens_out = sqrt(asset_1_amount * asset_2_amount) - LOCKED_POOL_TOKENS
+    issued_pool_tokens = btoi(bsqrt(asset_1_amount * asset_2_amount))
+    if issued_pool_tokens <= LOCKED_POOL_TOKENS:
+        raise LogicError('assert(issued_pool_tokens > LOCKED_POOL_TOKENS)')
+    pool_tokens_out = issued_pool_tokens - LOCKED_POOL_TOKENS
+    return AddLiquidityQuote(asset_1_amount, asset_2_amount, pool_tokens_out, 0, True, 0, 0, 0, 0, asset_1_amount, asset_2_amount, issued_pool_tokens)
+
+
+def get_add_liquidity_quote(asset_1_reserves, asset_2_reserves, issued_pool_tokens, asset_1_amount, asset_2_amount, total_fee_share, protocol_fee_ratio):
+    """
+    Mirrors the add_liquidity block. One of the amounts is 0 for the single mode.
+    """
+    if not issued_pool_tokens:
+        raise LogicError('assert(issued_pool_tokens)')
+
+    # new_issued_pool_tokens = sqrt((new_k * issued_pool_tokens^2) / old_k)
+    new_k = add(asset_1_reserves, asset_1_amount) * add(asset_2_reserves, asset_2_amount)
+    old_k = asset_1_reserves * asset_2_reserves
+    new_issued_pool_tokens = btoi(bsqrt(bdiv(new_k * issued_pool_tokens * issued_pool_tokens, old_k)))
+    pool_tokens_out = sub(new_issued_pool_tokens, issued_pool_tokens)
+
+    new_asset_1_reserves = asset_1_reserves + asset_1_amount
+    new_asset_2_reserves = asset_2_reserves + asset_2_amount
+
+    # Value of the pool_tokens_out in terms of the two assets
+    z1 = btoi(bdiv(pool_tokens_out * new_asset_1_reserves, new_issued_pool_tokens))
+    z2 = btoi(bdiv(pool_tokens_out * new_asset_2_reserves, new_issued_pool_tokens))
+
+    # Select the bigger swap amount, asset 2 wins the ties
+    swap_amount = 0
+    swap_from_asset_1 = True
+    if asset_1_amount > z1:
+        swap_amount = asset_1_amount - z1
+    if asset_2_amount > z2 and swap_amount <= asset_2_amount - z2:
+        swap_amount = asset_2_amount - z2
+        swap_from_asset_1 = False
+
+    total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_output_fee_amounts(swap_amount, total_fee_share, protocol_fee_ratio)
+    # fee_as_pool_tokens = ((total_fee_amount / input_reserves) * issued_pool_tokens) / 2
+    if swap_from_asset_1:
+        fee_as_pool_tokens = btoi(bdiv(total_fee_amount * new_issued_pool_tokens, new_asset_1_reserves * 2))
+        new_asset_1_reserves = sub(new_asset_1_reserves, protocol_fee_amount)
+    else:
+        fee_as_pool_tokens = btoi(bdiv(total_fee_amount * new_issued_pool_tokens, new_asset_2_reserves * 2))
+        new_asset_2_reserves = sub(new_asset_2_reserves, protocol_fee_amount)
+
+    pool_tokens_out = sub(pool_tokens_out, fee_as_pool_tokens)
+    new_issued_pool_tokens = sub(new_issued_pool_tokens, fee_as_pool_tokens)
+    if not pool_tokens_out:
+        raise LogicError('assert(pool_tokens_out)')
+
+    if not check_pool_token_value(asset_1_reserves, asset_2_reserves, issued_pool_tokens, new_asset_1_reserves, new_asset_2_reserves, new_issued_pool_tokens).passed:
+        raise LogicError('assert(tmp_initial b<= tmp_final)')
+
+    return AddLiquidityQuote(
+        asset_1_amount, asset_2_amount, pool_tokens_out, swap_amount, swap_from_asset_1, fee_as_pool_tokens,
+        poolers_fee_amount, protocol_fee_amount, total_fee_amount, new_asset_1_reserves, new_asset_2_reserves, new_issued_pool_tokens
+    )
+
+
+def get_remove_liquidity_quote(asset_1_reserves, asset_2_reserves, issued_pool_tokens, pool_token_amount, total_fee_share, protocol_fee_ratio, single_asset=None):
+    """
+    Mirrors the remove_liquidity block. single_asset is 1 or 2 to receive only that asset, the other asset is swapped.
+    """
+    if not pool_token_amount:
+        raise LogicError('assert(removed_pool_token_amount)')
+
+    if add(pool_token_amount, LOCKED_POOL_TOKENS) == issued_pool_tokens:
+        asset_1_amount = asset_1_reserves
+        asset_2_amount = asset_2_reserves
+        new_issued_pool_tokens = 0
+    else:
+        asset_1_amount = btoi(bdiv(pool_token_amount * asset_1_reserves, issued_pool_tokens))
+        asset_2_amount = btoi(bdiv(pool_token_amount * asset_2_reserves, issued_pool_tokens))
+        new_issued_pool_tokens = sub(issued_pool_tokens, pool_token_amount)
+
+    if not (asset_1_amount and asset_2_amount):
+        raise LogicError('assert(asset_1_amount && asset_2_amount)')
+
+    new_asset_1_reserves = sub(asset_1_reserves, asset_1_amount)
+    new_asset_2_reserves = sub(asset_2_reserves, asset_2_amount)
+
+    swap_amount = swap_output_amount = total_fee_amount = poolers_fee_amount = protocol_fee_amount = 0
+    if single_asset is not None:
+        if not new_issued_pool_tokens:
+            raise LogicError('assert(issued_pool_tokens > 0)')
+        if single_asset == 1:
+            total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(asset_2_amount, total_fee_share, protocol_fee_ratio)
+            swap_amount = sub(asset_2_amount, total_fee_amount)
+            swap_output_amount = calculate_fixed_input_swap(new_asset_2_reserves, new_asset_1_reserves, swap_amount)
+            new_asset_1_reserves = sub(new_asset_1_reserves, swap_output_amount)
+            new_asset_2_reserves = add(new_asset_2_reserves, add(swap_amount, poolers_fee_amount))
+            asset_1_amount, asset_2_amount = add(asset_1_amount, swap_output_amount), 0
+        elif single_asset == 2:
+            total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(asset_1_amount, total_fee_share, protocol_fee_ratio)
+            swap_amount = sub(asset_1_amount, total_fee_amount)
+            swap_output_amount = calculate_fixed_input_swap(new_asset_1_reserves, new_asset_2_reserves, swap_amount)
+            new_asset_2_reserves = sub(new_asset_2_reserves, swap_output_amount)
+            new_asset_1_reserves = add(new_asset_1_reserves, add(swap_amount, poolers_fee_amount))
+            asset_1_amount, asset_2_amount = 0, add(asset_2_amount, swap_output_amount)
+        else:
+            raise ValueError('single_asset must be None, 1 or 2')
+
+    if new_issued_pool_tokens and not check_pool_token_value(asset_1_reserves, asset_2_reserves, issued_pool_tokens, new_asset_1_reserves, new_asset_2_reserves, new_issued_pool_tokens).passed:
+        raise LogicError('assert(tmp_initial b<= tmp_final)')
+
+    return RemoveLiquidityQuote(
+        pool_token_amount, asset_1_amount, asset_2_amount, swap_amount, swap_output_amount,
+        poolers_fee_amount, protocol_fee_amount, total_fee_amount, new_asset_1_reserves, new_asset_2_reserves, new_issued_pool_tokens
+    )
+
+
+def _get_quotes(get_quote, quote_class, quotes_class, *args):
+    # The square roots are computed exactly with Python ints, only the arguments and results are vectorized
+    args = np.broadcast_arrays(*(_as_uint64(arg) for arg in args))
+    shape = args[0].shape
+    valid = np.zeros(shape, dtype=bool)
+    fields = [np.zeros(shape, dtype=bool if field == 'swap_from_asset_1' else np.uint64) for field in quote_class._fields]
+    for index in np.ndindex(shape):
+        try:
+            quote = get_quote(*(int(arg[index]) for arg in args))
+        except LogicError:
+            continue
+        valid[index] = True
+        for field, value in zip(fields, quote):
+            field[index] = value
+    return quotes_class(valid, *fields)
+
+
+def get_add_initial_liquidity_quotes(asset_1_amount, asset_2_amount):
+    """
+    Batch get_add_initial_liquidity_quote, arguments are broadcast against each other.
+    """
+    return _get_quotes(get_add_initial_liquidity_quote, AddLiquidityQuote, AddLiquidityQuotes, asset_1_amount, asset_2_amount)
+
+
+def get_add_liquidity_quotes(asset_1_reserves, asset_2_reserves, issued_pool_tokens, asset_1_amount, asset_2_amount, total_fee_share, protocol_fee_ratio):
+    """
+    Batch get_add_liquidity_quote, arguments are broadcast against each other.
+    """
+    return _get_quotes(
+        get_add_liquidity_quote, AddLiquidityQuote, AddLiquidityQuotes,
+        asset_1_reserves, asset_2_reserves, issued_pool_tokens, asset_1_amount, asset_2_amount, total_fee_share, protocol_fee_ratio
+    )
+
+
+def _mul_div(a, b, d, valid):
+    # btoi((a * b) / d), invalid where the quotient does not fit in uint64
+    p_hi, p_lo = _mul_128(a, b)
+    valid = valid & (p_hi < d)
+    return _div_128(np.where(valid, p_hi, np.uint64(0)), p_lo, np.where(valid, d, np.uint64(1))), valid
+
+
+def _fixed_input_swaps(input_supply, output_supply, swap_amount, total_fee_share, protocol_fee_ratio, valid):
+    # calculate_fixed_input_fee_amounts and calculate_fixed_input_swap without the asserts of the swap block
+    valid = valid & ((total_fee_share == 0) | (swap_amount <= _MAX_UINT64 // np.maximum(total_fee_share, np.uint64(1))))
+    valid &= protocol_fee_ratio > 0
+    total_fee_amount = (swap_amount * total_fee_share) // np.uint64(10000)
+    protocol_fee_amount = total_fee_amount // np.where(valid, protocol_fee_ratio, np.uint64(1))
+    poolers_fee_amount = total_fee_amount - protocol_fee_amount
+    valid &= total_fee_amount <= swap_amount
+    swap_amount = swap_amount - total_fee_amount
+
+    valid &= swap_amount <= _MAX_UINT64 - input_supply
+    denominator = np.where(valid, input_supply + swap_amount, np.uint64(1))
+    valid &= denominator > 0
+    quotient, valid = _mul_div(input_supply, output_supply, np.where(valid, denominator, np.uint64(1)), valid)
+    valid &= quotient < output_supply
+    output_amount = output_supply - (quotient + np.uint64(1))
+    return swap_amount, output_amount, total_fee_amount, poolers_fee_amount, protocol_fee_amount, valid
+
+
+def get_remove_liquidity_quotes(asset_1_reserves, asset_2_reserves, issued_pool_tokens, pool_token_amount, total_fee_share, protocol_fee_ratio, single_asset=None):
+    """
+    Vectorized get_remove_liquidity_quote, arguments except single_asset are broadcast against each other.
+    """
+    if single_asset not in (None, 1, 2):
+        raise ValueError('single_asset must be None, 1 or 2')
+
+    asset_1_reserves, asset_2_reserves, issued_pool_tokens, pool_token_amount, total_fee_share, protocol_fee_ratio = np.broadcast_arrays(
+        _as_uint64(asset_1_reserves), _as_uint64(asset_2_reserves), _as_uint64(issued_pool_tokens), _as_uint64(pool_token_amount), _as_uint64(total_fee_share), _as_uint64(protocol_fee_ratio)
+    )
+    valid = pool_token_amount > 0
+    valid &= pool_token_amount <= _MAX_UINT64 - np.uint64(LOCKED_POOL_TOKENS)
+    remove_all = valid & (pool_token_amount + np.uint64(LOCKED_POOL_TOKENS) == issued_pool_tokens)
+
+    # The quotient is greater than the reserves if pool_token_amount > issued_pool_tokens, it fails at the reserves update
+    valid &= remove_all | (pool_token_amount <= issued_pool_tokens)
+    divisor = np.where(issued_pool_tokens > 0, issued_pool_tokens, np.uint64(1))
+    valid &= remove_all | (issued_pool_tokens > 0)
+    asset_1_amount, valid = _mul_div(pool_token_amount, asset_1_reserves, divisor, valid)
+    asset_2_amount, valid = _mul_div(pool_token_amount, asset_2_reserves, divisor, valid)
+    asset_1_amount = np.where(remove_all, asset_1_reserves, asset_1_amount)
+    asset_2_amount = np.where(remove_all, asset_2_reserves, asset_2_amount)
+    new_issued_pool_tokens = np.where(remove_all, np.uint64(0), issued_pool_tokens - pool_token_amount)
+
+    valid &= (asset_1_amount > 0) & (asset_2_amount > 0)
+    new_asset_1_reserves = asset_1_reserves - asset_1_amount
+    new_asset_2_reserves = asset_2_reserves - asset_2_amount
+
+    zeros = np.zeros_like(pool_token_amount)
+    swap_amount = swap_output_amount = total_fee_amount = poolers_fee_amount = protocol_fee_amount = zeros
+    if single_asset is not None:
+        valid &= new_issued_pool_tokens > 0
+        if single_asset == 1:
+            swap_amount, swap_output_amount, total_fee_amount, poolers_fee_amount, protocol_fee_amount, valid = _fixed_input_swaps(
+                new_asset_2_reserves, new_asset_1_reserves, asset_2_amount, total_fee_share, protocol_fee_ratio, valid
+            )
+            # The input reserves do not exceed the initial reserves, the output amount does not exceed the initial reserves
+            new_asset_1_reserves = new_asset_1_reserves - swap_output_amount
+            new_asset_2_reserves = new_asset_2_reserves + swap_amount + poolers_fee_amount
+            asset_1_amount, asset_2_amount = asset_1_amount + swap_output_amount, zeros
+        else:
+            swap_amount, swap_output_amount, total_fee_amount, poolers_fee_amount, protocol_fee_amount, valid = _fixed_input_swaps(
+                new_asset_1_reserves, new_asset_2_reserves, asset_1_amount, total_fee_share, protocol_fee_ratio, valid
+            )
+            new_asset_2_reserves = new_asset_2_reserves - swap_output_amount
+            new_asset_1_reserves = new_asset_1_reserves + swap_amount + poolers_fee_amount
+            asset_1_amount, asset_2_amount = zeros, asset_2_amount + swap_output_amount
+
+    # check_pool_token_value always passes: the amounts are rounded down and the swap does not decrease k
+    return RemoveLiquidityQuotes(
+        valid, pool_token_amount, asset_1_amount, asset_2_amount, swap_amount, swap_output_amount,
+        poolers_fee_amount, protocol_fee_amount, total_fee_amount, new_asset_1_reserves, new_asset_2_reserves, new_issued_pool_tokens
+    )
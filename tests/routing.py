@@ -0,0 +1,325 @@
+"""
+Multi-hop fixed-input swap routes over the pools of a PoolStateStore snapshot.
+
+The search is a layered DP: layer k has the best amount of every asset reachable with k swaps.
+Each layer relaxes all edges out of the reached assets at once with the exact contract math (get_fixed_input_swap_quotes),
+a pool is used at most once in a route since its reserves would change after the first swap.
+
+Large amounts can be split across routes which do not share pools with find_split_routes.
+"""
+from collections import namedtuple
+from itertools import permutations
+
+import numpy as np
+from algosdk.constants import MIN_TXN_FEE, TX_GROUP_LIMIT
+from algosdk.future import transaction
+
+from .amm_math import LogicError
+from .constants import ALGO_ASSET_ID, APPLICATION_ID, METHOD_SWAP
+from .pool_state import PoolStateStore
+from .quotes import get_fixed_input_swap_quote, get_fixed_input_swap_quotes
+
+Hop = namedtuple('Hop', ['pool_address', 'asset_1_id', 'asset_2_id', 'input_asset_id', 'output_asset_id', 'input_amount', 'output_amount', 'input_supply', 'output_supply', 'total_fee_share', 'protocol_fee_ratio'])
+Route = namedtuple('Route', ['input_amount', 'output_amount', 'hops'])
+
+# The swap app call pays for the output transfer
+SWAP_APP_CALL_FEE = 2 * MIN_TXN_FEE
+
+
+class RouteGraph:
+    """
+    Asset graph of the pools, two directed edges per pool. Locked and empty pools are left out.
+    """
+
+    def __init__(self, store, max_hops=3):
+        self.max_hops = max_hops
+        self.app_id = store.app_id
+        self.addresses = store.addresses()
+
+        asset_1_id = store.column('asset_1_id')
+        asset_2_id = store.column('asset_2_id')
+        asset_1_reserves = store.column('asset_1_reserves')
+        asset_2_reserves = store.column('asset_2_reserves')
+        pools = np.nonzero((asset_1_reserves > 0) & (asset_2_reserves > 0) & (store.column('lock') == 0))[0]
+
+        self.asset_ids, asset_indexes = np.unique(np.concatenate([asset_1_id[pools], asset_2_id[pools]]), return_inverse=True)
+        self.asset_indexes = {int(asset_id): i for i, asset_id in enumerate(self.asset_ids)}
+        asset_1_index, asset_2_index = asset_indexes[:len(pools)], asset_indexes[len(pools):]
+
+        # Edges: asset_1 -> asset_2 for every pool, then asset_2 -> asset_1
+        self.edge_pool = np.concatenate([pools, pools])
+        self.edge_src = np.concatenate([asset_1_index, asset_2_index])
+        self.edge_dst = np.concatenate([asset_2_index, asset_1_index])
+        self.edge_input_supply = np.concatenate([asset_1_reserves[pools], asset_2_reserves[pools]])
+        self.edge_output_supply = np.concatenate([asset_2_reserves[pools], asset_1_reserves[pools]])
+        self.edge_total_fee_share = np.tile(store.column('total_fee_share')[pools], 2)
+        self.edge_protocol_fee_ratio = np.tile(store.column('protocol_fee_ratio')[pools], 2)
+        # Pool address -> (asset_1 -> asset_2 edge, asset_2 -> asset_1 edge)
+        self.pool_edges = {self.addresses[pool]: (i, i + len(pools)) for i, pool in enumerate(pools)}
+
+    @classmethod
+    def from_pool_states(cls, pool_states, app_id=APPLICATION_ID, max_hops=3):
+        """ pool_states: {pool address: local state dict} i.e. preflight.get_pool_states() """
+        store = PoolStateStore(app_id=app_id, capacity=max(len(pool_states), 1))
+        for address, local_state in pool_states.items():
+            store.set_pool(address, local_state)
+        return cls(store, max_hops=max_hops)
+
+    def update_pools(self, store, addresses):
+        """
+        Updates the edges of the pools from the store.
+        Returns False if the graph has to be rebuilt, if a pool is new, locked or empty.
+        """
+        for address in addresses:
+            pool_state = store.get(address)
+            edges = self.pool_edges.get(address)
+            if edges is None or pool_state is None or pool_state.lock or not (pool_state.asset_1_reserves and pool_state.asset_2_reserves):
+                return False
+            forward, backward = edges
+            self.edge_input_supply[forward] = self.edge_output_supply[backward] = pool_state.asset_1_reserves
+            self.edge_output_supply[forward] = self.edge_input_supply[backward] = pool_state.asset_2_reserves
+            self.edge_total_fee_share[[forward, backward]] = pool_state.total_fee_share
+            self.edge_protocol_fee_ratio[[forward, backward]] = pool_state.protocol_fee_ratio
+        return True
+
+    def _relax(self, amounts, route_pools, allowed):
+        # Returns the best edge into every asset from the reached assets, and their output amounts
+        edges = np.nonzero((amounts[self.edge_src] > 0) & allowed)[0]
+        if route_pools.shape[1]:
+            reused = (route_pools[self.edge_src[edges]] == self.edge_pool[edges, None]).any(axis=1)
+            edges = edges[~reused]
+
+        quotes = get_fixed_input_swap_quotes(
+            self.edge_input_supply[edges],
+            self.edge_output_supply[edges],
+            amounts[self.edge_src[edges]],
+            self.edge_total_fee_share[edges],
+            self.edge_protocol_fee_ratio[edges],
+        )
+        edges, output_amounts = edges[quotes.valid], quotes.output_amount[quotes.valid]
+        if not len(edges):
+            return edges, output_amounts
+
+        # Sorted by destination then output amount, the last one of each destination is the best
+        order = np.lexsort((output_amounts, self.edge_dst[edges]))
+        edges, output_amounts = edges[order], output_amounts[order]
+        dst = self.edge_dst[edges]
+        last = np.append(dst[1:] != dst[:-1], True)
+        return edges[last], output_amounts[last]
+
+    def _find_edges(self, src, dst, input_amount, max_hops, excluded_pools=()):
+        # Returns the edges of the best route or None
+        asset_count = len(self.asset_ids)
+        allowed = ~np.isin(self.edge_pool, list(excluded_pools))
+        amounts = np.zeros(asset_count, dtype=np.uint64)
+        amounts[src] = input_amount
+        route_pools = np.full((asset_count, 0), -1)
+        # Best edge into each asset per layer
+        layers = []
+        best_amount, best_hop_count = 0, 0
+        for hop in range(max_hops):
+            edges, output_amounts = self._relax(amounts, route_pools, allowed)
+            if not len(edges):
+                break
+            assets = self.edge_dst[edges]
+
+            layer = np.full(asset_count, -1)
+            layer[assets] = edges
+            layers.append(layer)
+
+            amounts = np.zeros(asset_count, dtype=np.uint64)
+            amounts[assets] = output_amounts
+            next_route_pools = np.full((asset_count, hop + 1), -1)
+            next_route_pools[assets, :hop] = route_pools[self.edge_src[edges]]
+            next_route_pools[assets, hop] = self.edge_pool[edges]
+            route_pools = next_route_pools
+
+            if amounts[dst] > best_amount:
+                best_amount, best_hop_count = int(amounts[dst]), hop + 1
+
+        if not best_amount:
+            return None
+
+        edges = []
+        asset = dst
+        for layer in reversed(layers[:best_hop_count]):
+            edge = layer[asset]
+            edges.append(edge)
+            asset = self.edge_src[edge]
+        return edges[::-1]
+
+    def _get_asset_indexes(self, input_asset_id, output_asset_id, input_amount):
+        src = self.asset_indexes.get(input_asset_id)
+        dst = self.asset_indexes.get(output_asset_id)
+        if src is None or dst is None or src == dst or not input_amount:
+            return None
+        return src, dst
+
+    def find_route(self, input_asset_id, output_asset_id, input_amount, max_hops=None):
+        """ Returns the Route with the max output amount or None if there is not any """
+        indexes = self._get_asset_indexes(input_asset_id, output_asset_id, input_amount)
+        if indexes is None:
+            return None
+        edges = self._find_edges(*indexes, input_amount, max_hops or self.max_hops)
+        if edges is None:
+            return None
+        return self._get_route(edges, input_amount)
+
+    def _get_output_amount(self, edges, input_amount):
+        # Exact output of the route, None if the contract rejects any of the swaps
+        if not input_amount:
+            return 0
+        amount = input_amount
+        for edge in edges:
+            try:
+                amount = get_fixed_input_swap_quote(
+                    int(self.edge_input_supply[edge]),
+                    int(self.edge_output_supply[edge]),
+                    amount,
+                    int(self.edge_total_fee_share[edge]),
+                    int(self.edge_protocol_fee_ratio[edge]),
+                ).output_amount
+            except LogicError:
+                return None
+        return amount
+
+    def find_split_routes(self, input_asset_id, output_asset_id, input_amount, max_routes=4, max_hops=None, steps=100):
+        """
+        Splits the input amount across routes which do not share pools to maximize the total output.
+        Returns the Routes with non zero input amounts, [] if there is not any route.
+
+        The candidate routes are the best routes for input_amount / max_routes, each one excluding the pools of the previous ones.
+        The amount is allocated in steps to the route with the max marginal output (water-filling), the output is concave so
+        this is optimal up to the step size. Then the allocations are corrected by moving smaller amounts between the routes
+        down to 1 with the exact integer math. The transaction group size limit caps the number of routes.
+        """
+        indexes = self._get_asset_indexes(input_asset_id, output_asset_id, input_amount)
+        if indexes is None:
+            return []
+
+        candidates = []
+        excluded_pools = set()
+        txn_count = 0
+        while len(candidates) < max_routes:
+            edges = self._find_edges(*indexes, max(input_amount // max_routes, 1), max_hops or self.max_hops, excluded_pools)
+            if edges is None or txn_count + 2 * len(edges) > TX_GROUP_LIMIT:
+                break
+            candidates.append(edges)
+            excluded_pools.update(int(self.edge_pool[edge]) for edge in edges)
+            txn_count += 2 * len(edges)
+
+        allocations = [0] * len(candidates)
+        output_amounts = [0] * len(candidates)
+
+        def get_gain(i, amount):
+            output_amount = self._get_output_amount(candidates[i], allocations[i] + amount)
+            return None if output_amount is None else output_amount - output_amounts[i]
+
+        def allocate(i, amount):
+            allocations[i] += amount
+            output_amounts[i] = self._get_output_amount(candidates[i], allocations[i])
+
+        # Water-filling, only the gain of the route which gets the step changes
+        step = max(input_amount // steps, 1)
+        remaining = input_amount
+        gains = [get_gain(i, step) for i in range(len(candidates))]
+        while remaining:
+            amount = min(step, remaining)
+            if amount != step:
+                gains = [get_gain(i, amount) for i in range(len(candidates))]
+            valid_gains = [(gain, i) for i, gain in enumerate(gains) if gain is not None]
+            if not valid_gains:
+                # The rest is too small for the contract (i.e. no fee), it goes to the route with the biggest allocation
+                i = max(range(len(candidates)), key=lambda i: allocations[i], default=None)
+                if i is None or get_gain(i, remaining) is None:
+                    return []
+                allocate(i, remaining)
+                break
+            _, i = max(valid_gains)
+            allocate(i, amount)
+            remaining -= amount
+            gains[i] = get_gain(i, step)
+
+        # Integer correction, move amounts from a route to another while the total output increases
+        while step:
+            moved = True
+            while moved:
+                moved = False
+                for i, j in permutations(range(len(candidates)), 2):
+                    if allocations[i] < step:
+                        continue
+                    reduced_output_amount = self._get_output_amount(candidates[i], allocations[i] - step)
+                    gain = get_gain(j, step)
+                    if reduced_output_amount is None or gain is None or gain <= output_amounts[i] - reduced_output_amount:
+                        continue
+                    allocate(i, -step)
+                    allocate(j, step)
+                    moved = True
+            step //= 2
+
+        return [self._get_route(edges, amount) for edges, amount in zip(candidates, allocations) if amount]
+
+    def _get_route(self, edges, input_amount):
+        hops = []
+        amount = input_amount
+        for edge in edges:
+            input_supply, output_supply = int(self.edge_input_supply[edge]), int(self.edge_output_supply[edge])
+            total_fee_share, protocol_fee_ratio = int(self.edge_total_fee_share[edge]), int(self.edge_protocol_fee_ratio[edge])
+            quote = get_fixed_input_swap_quote(input_supply, output_supply, amount, total_fee_share, protocol_fee_ratio)
+            input_asset_id = int(self.asset_ids[self.edge_src[edge]])
+            output_asset_id = int(self.asset_ids[self.edge_dst[edge]])
+            # The first half of the edges are asset_1 -> asset_2
+            is_asset_1_input = edge < len(self.edge_pool) // 2
+            hops.append(Hop(
+                pool_address=self.addresses[self.edge_pool[edge]],
+                asset_1_id=input_asset_id if is_asset_1_input else output_asset_id,
+                asset_2_id=output_asset_id if is_asset_1_input else input_asset_id,
+                input_asset_id=input_asset_id,
+                output_asset_id=output_asset_id,
+                input_amount=amount,
+                output_amount=quote.output_amount,
+                input_supply=input_supply,
+                output_supply=output_supply,
+                total_fee_share=total_fee_share,
+                protocol_fee_ratio=protocol_fee_ratio,
+            ))
+            amount = quote.output_amount
+        return Route(input_amount, amount, hops)
+
+
+def get_route_transactions(route, sender, sp, app_id=APPLICATION_ID, slippage=0):
+    """
+    Returns the transactions of the route, an input transfer and a fixed-input swap app call per hop.
+
+    slippage is in basis points. The min_output of a hop is the input amount of the next hop,
+    so the next transfer is covered by what the previous swap guarantees.
+    Raises LogicError if the contract rejects the swap of a reduced amount.
+    """
+    txns = []
+    amount = route.input_amount
+    for hop in route.hops:
+        if hop.input_asset_id == ALGO_ASSET_ID:
+            txns.append(transaction.PaymentTxn(sender=sender, sp=sp, receiver=hop.pool_address, amt=amount))
+        else:
+            txns.append(transaction.AssetTransferTxn(sender=sender, sp=sp, receiver=hop.pool_address, index=hop.input_asset_id, amt=amount))
+
+        # The amount can be less than the quoted input amount with slippage, its output is quoted on the pool state of the route
+        output_amount = get_fixed_input_swap_quote(hop.input_supply, hop.output_supply, amount, hop.total_fee_share, hop.protocol_fee_ratio).output_amount
+        min_output = output_amount - output_amount * slippage // 10000
+        app_call = transaction.ApplicationNoOpTxn(
+            sender=sender,
+            sp=sp,
+            index=app_id,
+            app_args=[METHOD_SWAP, "fixed-input", min_output],
+            foreign_assets=[hop.asset_1_id, hop.asset_2_id],
+            accounts=[hop.pool_address],
+        )
+        app_call.fee = SWAP_APP_CALL_FEE
+        txns.append(app_call)
+        amount = min_output
+    return txns
+
+
+def get_split_route_transactions(routes, sender, sp, app_id=APPLICATION_ID, slippage=0):
+    """ Returns the transactions of the routes of find_split_routes in one group """
+    return [txn for route in routes for txn in get_route_transactions(route, sender, sp, app_id=app_id, slippage=slippage)]
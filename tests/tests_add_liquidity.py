@@ -24,7 +24,7 @@ class TestAddLiquidity(BaseTestCase):
         cls.asset_1_id = 5
         cls.asset_2_id = 2
 
-    def reset_ledger(self):
+    def build_ledger(self):
         self.ledger = JigLedger()
         self.create_amm_app()
         self.ledger.set_account_balance(self.user_addr, 1_000_000)
@@ -878,7 +878,7 @@ class TestAddLiquidityAlgoPair(BaseTestCase):
         cls.asset_1_id = 5
         cls.asset_2_id = ALGO_ASSET_ID
 
-    def setUp(self):
+    def build_ledger(self):
         self.ledger = JigLedger()
         self.create_amm_app()
         self.ledger.set_account_balance(self.user_addr, 2_000_000)
@@ -887,6 +887,9 @@ class TestAddLiquidityAlgoPair(BaseTestCase):
         self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
         self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
 
+    def setUp(self):
+        self.reset_ledger()
+
     def test_pass_initial_add_liquidity(self):
         asset_1_added_liquidity_amount = 10_000
         asset_2_added_liquidity_amount = 15_000
@@ -0,0 +1,180 @@
+import unittest
+
+from algojig import get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .amm_math import (CheckResult, LogicError, calculate_fixed_input_fee_amounts, calculate_fixed_input_swap,
+                       calculate_fixed_output_fee_amounts, calculate_fixed_output_swap, check_invariant, check_pool_token_value)
+from .constants import *
+from .core import BaseTestCase
+from .logs import decode_logs
+
+
+class TestAMMMath(unittest.TestCase):
+
+    def test_fixed_input_swap(self):
+        total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(10_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual((total_fee_amount, poolers_fee_amount, protocol_fee_amount), (30, 25, 5))
+        self.assertEqual(calculate_fixed_input_swap(1_000_000, 1_000_000, 10_000 - total_fee_amount), 9871)
+
+    def test_fixed_output_swap(self):
+        swap_amount = calculate_fixed_output_swap(1_000_000, 1_000_000, 9871)
+        self.assertEqual(swap_amount, 9970)
+        self.assertEqual(calculate_fixed_output_fee_amounts(swap_amount, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO), (30, 25, 5))
+
+    def test_uint64_failures(self):
+        with self.assertRaises(LogicError):
+            # output_supply - output_amount
+            calculate_fixed_output_swap(1_000_000, 1_000_000, 1_000_001)
+        with self.assertRaises(LogicError):
+            # output_supply == output_amount
+            calculate_fixed_output_swap(1_000_000, 1_000_000, 1_000_000)
+        with self.assertRaises(LogicError):
+            # btoi(k / 1) > MAX_UINT64
+            calculate_fixed_output_swap(MAX_UINT64, 2, 1)
+        with self.assertRaises(LogicError):
+            calculate_fixed_input_fee_amounts(MAX_UINT64, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        with self.assertRaises(LogicError):
+            calculate_fixed_input_swap(0, 0, 0)
+
+    def test_check_invariant(self):
+        # Swap 10_000 of asset 1, the poolers fee stays in the pool
+        total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(10_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        output_amount = calculate_fixed_input_swap(1_000_000, 1_000_000, 10_000 - total_fee_amount)
+        final_asset_1_reserves = 1_000_000 + 10_000 - protocol_fee_amount
+        final_asset_2_reserves = 1_000_000 - output_amount
+        result = check_invariant(1_000_000, 1_000_000, final_asset_1_reserves, final_asset_2_reserves, poolers_fee_amount, 0)
+        self.assertEqual(result, CheckResult(True, (final_asset_1_reserves - poolers_fee_amount) * final_asset_2_reserves - 1_000_000 ** 2))
+
+        # One more unit of output
+        result = check_invariant(1_000_000, 1_000_000, final_asset_1_reserves, final_asset_2_reserves - 2, poolers_fee_amount, 0)
+        self.assertFalse(result.passed)
+        self.assertLess(result.margin, 0)
+
+        with self.assertRaises(LogicError):
+            check_invariant(1, 1, 1, 1, 2, 0)
+
+    def test_check_pool_token_value(self):
+        self.assertEqual(check_pool_token_value(1_000_000, 1_000_000, 1_000_000, 995_000, 995_000, 995_000), CheckResult(True, 0))
+        self.assertEqual(check_pool_token_value(1_000_000, 1_000_000, 1_000_000, 995_000, 995_000, 995_001).passed, False)
+        # Rounding in favour of the pool
+        result = check_pool_token_value(1_000_000, 1_000_000, 1_000_000, 995_001, 995_000, 995_000)
+        self.assertEqual(result, CheckResult(True, 995_000 * 1_000_000 ** 2))
+
+
+class TestAMMMathConformance(BaseTestCase):
+    test_cases = [
+        # (asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio, input_amount)
+        (1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, 10_000),
+        (1_000_000, 1_000_000, 100, 3, 999_999),
+        (12_345, 6_789_012, 1, 10, 33_400),
+        (6_789_012, 12_345, 77, 7, 1_000_000),
+        (10**12, 3, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, 10**15),
+        (MAX_ASSET_AMOUNT // 2, MAX_ASSET_AMOUNT // 3, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, 10**14),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def reset_ledger(self, asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT - asset_1_reserves, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.set_account_balance(self.pool_address, asset_1_reserves, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.pool_address, asset_2_reserves, asset_id=self.asset_2_id)
+        self.ledger.update_local_state(
+            address=self.pool_address,
+            app_id=APPLICATION_ID,
+            state_delta={
+                b'asset_1_reserves': asset_1_reserves,
+                b'asset_2_reserves': asset_2_reserves,
+                b'issued_pool_tokens': LOCKED_POOL_TOKENS + 1,
+                b'total_fee_share': total_fee_share,
+                b'protocol_fee_ratio': protocol_fee_ratio,
+            }
+        )
+
+    def eval_swap(self, mode, input_amount, min_output):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=input_amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, mode, min_output],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 3000
+        txn_group = transaction.assign_group_id(txn_group)
+        stxns = self.sign_txns(txn_group, self.user_sk)
+        block = self.ledger.eval_transactions(stxns)
+        return decode_logs(block[b'txns'][1])
+
+    def test_fixed_input(self):
+        for asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio, input_amount in self.test_cases:
+            with self.subTest(asset_1_reserves=asset_1_reserves, asset_2_reserves=asset_2_reserves, total_fee_share=total_fee_share, protocol_fee_ratio=protocol_fee_ratio, input_amount=input_amount):
+                self.reset_ledger(asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio)
+
+                total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_input_fee_amounts(input_amount, total_fee_share, protocol_fee_ratio)
+                swap_amount = input_amount - total_fee_amount
+                output_amount = calculate_fixed_input_swap(asset_1_reserves, asset_2_reserves, swap_amount)
+
+                logs = self.eval_swap("fixed-input", input_amount, min_output=0)
+                self.assertEqual(logs.swap_amount, swap_amount)
+                self.assertEqual(logs.output_amount, output_amount)
+                self.assertEqual(logs.total_fee_amount, total_fee_amount)
+                self.assertEqual(logs.poolers_fee_amount, poolers_fee_amount)
+                self.assertEqual(logs.protocol_fee_amount, protocol_fee_amount)
+
+    def test_fixed_output(self):
+        for asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio, input_amount in self.test_cases:
+            with self.subTest(asset_1_reserves=asset_1_reserves, asset_2_reserves=asset_2_reserves, total_fee_share=total_fee_share, protocol_fee_ratio=protocol_fee_ratio, input_amount=input_amount):
+                self.reset_ledger(asset_1_reserves, asset_2_reserves, total_fee_share, protocol_fee_ratio)
+
+                # Request the output of the same input amount in fixed-input mode
+                total_fee_amount, _, _ = calculate_fixed_input_fee_amounts(input_amount, total_fee_share, protocol_fee_ratio)
+                output_amount = calculate_fixed_input_swap(asset_1_reserves, asset_2_reserves, input_amount - total_fee_amount)
+
+                swap_amount = calculate_fixed_output_swap(asset_1_reserves, asset_2_reserves, output_amount)
+                total_fee_amount, poolers_fee_amount, protocol_fee_amount = calculate_fixed_output_fee_amounts(swap_amount, total_fee_share, protocol_fee_ratio)
+                change = input_amount - (swap_amount + total_fee_amount)
+
+                logs = self.eval_swap("fixed-output", input_amount, min_output=output_amount)
+                self.assertEqual(logs.swap_amount, swap_amount)
+                self.assertEqual(logs.output_amount, output_amount)
+                self.assertEqual(logs.change, change)
+                self.assertEqual(logs.total_fee_amount, total_fee_amount)
+                self.assertEqual(logs.poolers_fee_amount, poolers_fee_amount)
+                self.assertEqual(logs.protocol_fee_amount, protocol_fee_amount)
+
+    def test_fail_output_amount_is_zero(self):
+        asset_1_reserves, asset_2_reserves = 10**12, 3
+        self.reset_ledger(asset_1_reserves, asset_2_reserves, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+
+        input_amount = 1_000
+        total_fee_amount, _, _ = calculate_fixed_input_fee_amounts(input_amount, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(calculate_fixed_input_swap(asset_1_reserves, asset_2_reserves, input_amount - total_fee_amount), 0)
+
+        with self.assertRaises(LogicEvalError) as e:
+            self.eval_swap("fixed-input", input_amount, min_output=0)
+        self.assertEqual(e.exception.source['line'], 'assert(output_amount)')
@@ -0,0 +1,124 @@
+import random
+import unittest
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .arbitrage import ArbitrageDetector
+from .constants import *
+from .core import BaseTestCase
+from .pool_state import PoolStateStore
+from .routing import get_route_transactions
+from .utils import get_pool_logicsig_bytecode
+
+
+class TestArbitrage(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.store = PoolStateStore()
+
+    def set_pool(self, asset_1_id, asset_2_id, asset_1_reserves, asset_2_reserves):
+        pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id).address()
+        self.ledger.set_account_balance(pool_address, 1_000_000)
+        self.ledger.set_auth_addr(pool_address, APPLICATION_ADDRESS)
+        self.ledger.set_account_balance(pool_address, asset_1_reserves, asset_id=asset_1_id)
+        self.ledger.set_account_balance(pool_address, asset_2_reserves, asset_id=asset_2_id)
+        local_state = {
+            b'asset_1_id': asset_1_id,
+            b'asset_2_id': asset_2_id,
+            b'asset_1_reserves': asset_1_reserves,
+            b'asset_2_reserves': asset_2_reserves,
+            b'total_fee_share': TOTAL_FEE_SHARE,
+            b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+        }
+        self.ledger.set_local_state(address=pool_address, app_id=APPLICATION_ID, state=local_state)
+        self.store.set_pool(pool_address, local_state)
+        return pool_address
+
+    def test_triangle(self):
+        self.ledger.set_account_balance(self.user_addr, 10_000_000, asset_id=5)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=2)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=7)
+        self.set_pool(5, 2, 10_000_000, 10_000_000)
+        self.set_pool(7, 2, 10_000_000, 10_000_000)
+        # 7 is cheaper in this pool
+        self.set_pool(7, 5, 11_000_000, 10_000_000)
+
+        detector = ArbitrageDetector(self.store, start_asset_ids={5})
+        opportunities = detector.scan()
+        self.assertEqual(len(opportunities), 1)
+        profit, route = opportunities[0]
+        self.assertEqual([(hop.input_asset_id, hop.output_asset_id) for hop in route.hops], [(5, 7), (7, 2), (2, 5)])
+        self.assertGreater(profit, 0)
+
+        # The input amount is the max of the exact profit
+        edges = [detector.graph.pool_edges[hop.pool_address][hop.input_asset_id != hop.asset_1_id] for hop in route.hops]
+        self.assertEqual(detector._get_profit(edges, route.input_amount), profit)
+        for delta in [1, 2, 10, 100, route.input_amount // 100]:
+            for input_amount in [route.input_amount - delta, route.input_amount + delta]:
+                self.assertLessEqual(detector._get_profit(edges, input_amount), profit)
+
+        txn_group = transaction.assign_group_id(get_route_transactions(route, self.user_addr, self.sp))
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, 5)[0], 10_000_000 + profit)
+
+        # Both directions of every start asset
+        self.assertEqual(len(ArbitrageDetector(self.store).scan()), 3)
+
+
+class TestArbitrageIncremental(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(1)
+        # Consistent prices, there is not any arbitrage
+        prices = {asset_id: rng.randint(1, 1000) for asset_id in range(1, 41)}
+        self.store = PoolStateStore()
+        self.pools = []
+        for _ in range(300):
+            asset_1_id, asset_2_id = sorted(rng.sample(list(prices), 2), reverse=True)
+            liquidity = rng.randint(10**6, 10**9)
+            local_state = {
+                b'asset_1_id': asset_1_id,
+                b'asset_2_id': asset_2_id,
+                b'asset_1_reserves': liquidity * prices[asset_2_id],
+                b'asset_2_reserves': liquidity * prices[asset_1_id],
+                b'total_fee_share': TOTAL_FEE_SHARE,
+                b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+            }
+            address = generate_account()[1]
+            self.store.set_pool(address, local_state)
+            self.pools.append((address, local_state))
+
+    def test_update(self):
+        detector = ArbitrageDetector(self.store)
+        self.assertEqual(detector.scan(), [])
+
+        address, local_state = self.pools[0]
+        self.store.set_pool(address, {**local_state, b'asset_1_reserves': local_state[b'asset_1_reserves'] * 2})
+        opportunities = detector.update([address])
+        self.assertTrue(opportunities)
+        for opportunity in opportunities:
+            self.assertIn(address, [hop.pool_address for hop in opportunity.route.hops])
+            self.assertEqual(opportunity.profit, opportunity.route.output_amount - opportunity.route.input_amount)
+        self.assertLessEqual(max(len(opportunity.route.hops) for opportunity in opportunities), 4)
+        # The best one is found by the full scan too
+        self.assertEqual(ArbitrageDetector(self.store).scan()[0].profit, opportunities[0].profit)
+
+        self.store.set_pool(address, local_state)
+        self.assertEqual(detector.update([address]), [])
+
+        # Locked pools are left out, the graph is rebuilt
+        self.store.set_pool(self.pools[1][0], {**self.pools[1][1], b'lock': 1})
+        self.assertEqual(detector.update([self.pools[1][0]]), [])
+        self.assertNotIn(self.pools[1][0], detector.graph.pool_edges)
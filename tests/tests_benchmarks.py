@@ -0,0 +1,292 @@
+import json
+import os
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .profiler import CostProfiler
+from .utils import get_pool_logicsig_bytecode
+
+# Opcode cost, inner transaction count and min fee of the canonical group of each method.
+# Run with TINYMAN_UPDATE_BENCHMARKS=1 to write the results of the executed benchmarks to the baseline.
+BENCHMARKS_FILENAME = os.path.join(os.path.dirname(__file__), 'benchmarks.json')
+UPDATE_BENCHMARKS = bool(os.environ.get('TINYMAN_UPDATE_BENCHMARKS'))
+
+
+class TestBenchmarks(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.profiler = CostProfiler()
+
+        cls.benchmarks = {}
+        if os.path.exists(BENCHMARKS_FILENAME):
+            with open(BENCHMARKS_FILENAME) as f:
+                cls.benchmarks = json.load(f)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if UPDATE_BENCHMARKS:
+            with open(BENCHMARKS_FILENAME, 'w') as f:
+                json.dump(cls.benchmarks, f, indent=4, sort_keys=True)
+                f.write('\n')
+
+    def build_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.app_creator_address, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, MAX_ASSET_AMOUNT, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=100_000_000, asset_2_reserves=100_000_000, liquidity_provider_address=self.user_addr)
+
+    def setUp(self):
+        self.reset_ledger()
+
+    def assertBenchmark(self, name, txn_group, signers=None):
+        profiles = self.profiler.profile(self.ledger, txn_group, signers or {self.user_addr: self.user_sk}, self.sp)
+        opcode_costs = {}
+        for profile in profiles:
+            method = txn_group[profile.txn_index].app_args[0].decode()
+            opcode_costs[method] = profile.total_cost
+        inner_transaction_count = sum(profile.inner_transaction_count for profile in profiles)
+        result = dict(
+            opcode_costs=opcode_costs,
+            inner_transaction_count=inner_transaction_count,
+            min_fee=(len(txn_group) + inner_transaction_count) * self.sp.min_fee,
+        )
+
+        baseline = self.benchmarks.get(name)
+        if UPDATE_BENCHMARKS:
+            self.benchmarks[name] = result
+        if baseline is None:
+            if not UPDATE_BENCHMARKS:
+                self.fail(f'There is no baseline for {name}, run with TINYMAN_UPDATE_BENCHMARKS=1.')
+            return
+
+        self.assertEqual(opcode_costs.keys(), baseline['opcode_costs'].keys())
+        for method, opcode_cost in opcode_costs.items():
+            self.assertLessEqual(opcode_cost, baseline['opcode_costs'][method], msg=f'{name}: {method} opcode cost')
+        self.assertLessEqual(inner_transaction_count, baseline['inner_transaction_count'], msg=f'{name}: inner transaction count')
+        self.assertLessEqual(result['min_fee'], baseline['min_fee'], msg=f'{name}: min fee')
+
+    def test_bootstrap(self):
+        asset_2_id = self.ledger.create_asset(asset_id=None, params=dict(unit_name="BTC"))
+        asset_1_id = self.ledger.create_asset(asset_id=None, params=dict(unit_name="USD"))
+        lsig = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id)
+        self.ledger.set_account_balance(lsig.address(), MIN_POOL_BALANCE_ASA_ASA_PAIR + 10_000 + 100_000)
+        txn_group = [
+            transaction.ApplicationOptInTxn(
+                sender=lsig.address(),
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_BOOTSTRAP],
+                foreign_assets=[asset_1_id, asset_2_id],
+                rekey_to=APPLICATION_ADDRESS,
+            )
+        ]
+        txn_group[0].fee = 10_000
+        self.assertBenchmark('bootstrap', txn_group, {lsig.address(): lsig})
+
+    def test_add_initial_liquidity(self):
+        self.asset_1_id, self.asset_2_id = 7, 6
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_2_id)
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+
+        txn_group = self.get_add_initial_liquidity_transactions(asset_1_amount=1_000_000, asset_2_amount=1_000_000, app_call_fee=10_000)
+        self.assertBenchmark('add_initial_liquidity', txn_group)
+
+    def test_add_liquidity_flexible(self):
+        txn_group = self.get_add_liquidity_transactions(asset_1_amount=1_000_000, asset_2_amount=1_500_000, app_call_fee=10_000)
+        self.assertBenchmark('add_liquidity_flexible', txn_group)
+
+    def test_add_liquidity_single(self):
+        txn_group = self.get_add_liquidity_transactions(asset_1_amount=1_000_000, asset_2_amount=None, app_call_fee=10_000)
+        self.assertBenchmark('add_liquidity_single', txn_group)
+
+    def test_remove_liquidity(self):
+        txn_group = self.get_remove_liquidity_transactions(liquidity_asset_amount=1_000_000, app_call_fee=10_000)
+        self.assertBenchmark('remove_liquidity', txn_group)
+
+    def test_remove_liquidity_single(self):
+        txn_group = self.get_remove_liquidity_single_transactions(liquidity_asset_amount=1_000_000, asset_id=self.asset_1_id, app_call_fee=10_000)
+        self.assertBenchmark('remove_liquidity_single', txn_group)
+
+    def get_swap_transactions(self, mode, input_amount, min_output):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=input_amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, mode, min_output],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 10_000
+        return txn_group
+
+    def test_swap_fixed_input(self):
+        txn_group = self.get_swap_transactions('fixed-input', input_amount=1_000_000, min_output=900_000)
+        self.assertBenchmark('swap_fixed_input', txn_group)
+
+    def test_swap_fixed_output(self):
+        txn_group = self.get_swap_transactions('fixed-output', input_amount=1_100_000, min_output=1_000_000)
+        self.assertBenchmark('swap_fixed_output', txn_group)
+
+    def test_flash_loan(self):
+        index_diff = 3
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_LOAN, index_diff, 1_000_000, 2_000_000],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=1_010_000,
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_2_id,
+                amt=2_020_000,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_LOAN, index_diff],
+                foreign_assets=[],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[0].fee = 10_000
+        self.assertBenchmark('flash_loan', txn_group)
+
+    def test_flash_swap(self):
+        index_diff = 2
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_SWAP, index_diff, 1_000_000, 2_000_000],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=3_100_000,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_SWAP, index_diff],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[0].fee = 10_000
+        self.assertBenchmark('flash_swap', txn_group)
+
+    def test_claim_fees(self):
+        fee_collector = self.app_creator_address
+        self.ledger.opt_in_asset(fee_collector, self.asset_1_id)
+        self.ledger.opt_in_asset(fee_collector, self.asset_2_id)
+        self.set_pool_protocol_fees(5_000, 10_000)
+
+        txn_group = self.get_claim_fee_transactions(sender=self.user_addr, fee_collector=fee_collector, app_call_fee=10_000)
+        self.assertBenchmark('claim_fees', txn_group)
+
+    def test_claim_extra(self):
+        fee_collector = self.app_creator_address
+        self.ledger.opt_in_asset(fee_collector, self.asset_1_id)
+        self.ledger.move(5_000, self.asset_1_id, receiver=self.pool_address)
+
+        txn_group = self.get_claim_extra_transactions(sender=self.user_addr, asset_id=self.asset_1_id, address=self.pool_address, fee_collector=fee_collector, app_call_fee=10_000)
+        self.assertBenchmark('claim_extra', txn_group)
+
+    def test_set_fee(self):
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.app_creator_address,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SET_FEE, 50, 5],
+                accounts=[self.pool_address],
+            )
+        ]
+        self.assertBenchmark('set_fee', txn_group, {self.app_creator_address: self.app_creator_sk})
+
+    def test_set_fee_collector(self):
+        _, fee_collector = generate_account()
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.app_creator_address,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SET_FEE_COLLECTOR],
+                accounts=[fee_collector],
+            )
+        ]
+        self.assertBenchmark('set_fee_collector', txn_group, {self.app_creator_address: self.app_creator_sk})
+
+    def test_set_fee_setter(self):
+        _, fee_setter = generate_account()
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.app_creator_address,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SET_FEE_SETTER],
+                accounts=[fee_setter],
+            )
+        ]
+        self.assertBenchmark('set_fee_setter', txn_group, {self.app_creator_address: self.app_creator_sk})
+
+    def test_set_fee_manager(self):
+        _, fee_manager = generate_account()
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.app_creator_address,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SET_FEE_MANAGER],
+                accounts=[fee_manager],
+            )
+        ]
+        self.assertBenchmark('set_fee_manager', txn_group, {self.app_creator_address: self.app_creator_sk})
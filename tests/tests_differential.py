@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from .amm_math import LogicError
+from .constants import *
+from .differential import (FUNCTIONS, DiffCase, DifferentialHarness, Mismatch, build_driver_teal, evaluate_mirror,
+                           generate_boundary_cases, get_boundary_values, get_call_capacity, pack_calls, read_corpus,
+                           run_cases, write_corpus)
+from .profiler import AMM_APPROVAL_TEAL_FILENAME
+
+
+class TestDifferential(unittest.TestCase):
+
+    def test_boundary_values(self):
+        self.assertEqual(get_boundary_values(0), [0, 1, 2**32, 2**63, MAX_UINT64])
+        self.assertEqual(
+            get_boundary_values(1),
+            [0, 1, 2, 2**32 - 1, 2**32, 2**32 + 1, 2**63 - 1, 2**63, 2**63 + 1, MAX_UINT64 - 1, MAX_UINT64]
+        )
+        cases = generate_boundary_cases(['calculate_fixed_input_swap'], offsets=0)
+        self.assertEqual(len(cases), 5**3)
+
+    def test_evaluate_mirror(self):
+        case = DiffCase('calculate_fixed_input_fee_amounts', (10_000,), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(evaluate_mirror(case), (30, 25, 5))
+
+        case = DiffCase('calculate_fixed_input_fee_amounts', (MAX_UINT64,), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(str(evaluate_mirror(case)), "* overflowed")
+
+        case = DiffCase('calculate_fixed_output_fee_amounts', (1,), 10_000, PROTOCOL_FEE_RATIO)
+        self.assertEqual(str(evaluate_mirror(case)), "/ 0")
+
+        # k / (input_supply + swap_amount) does not fit in uint64
+        case = DiffCase('calculate_fixed_input_swap', (1, MAX_UINT64, 0), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(str(evaluate_mirror(case)), "+ overflowed")
+        case = DiffCase('calculate_fixed_output_swap', (1, MAX_UINT64, MAX_UINT64), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertIsInstance(evaluate_mirror(case), LogicError)
+
+    def test_pack_calls(self):
+        cases = generate_boundary_cases(['calculate_fixed_input_fee_amounts', 'calculate_fixed_output_swap'], offsets=1)
+        calls = pack_calls(cases)
+        self.assertEqual(sum(len(call) for call in calls), len(cases))
+        for call in calls:
+            self.assertLessEqual(len(call), get_call_capacity(FUNCTIONS[call[0].function]))
+            self.assertEqual(len({(case.function, case.total_fee_share, case.protocol_fee_ratio) for case in call}), 1)
+
+    def test_build_driver_teal(self):
+        with open(AMM_APPROVAL_TEAL_FILENAME) as f:
+            teal = build_driver_teal(f.read())
+        for name in [*FUNCTIONS, 'increase_cost_budget']:
+            self.assertEqual(teal.count(f'__func__{name}:'), 1)
+
+    def test_corpus(self):
+        case = DiffCase('calculate_fixed_output_swap', (1, 2, 3), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'corpus.jsonl')
+            write_corpus(filename, [Mismatch(case, 'result', [1], [2])])
+            write_corpus(filename, [Mismatch(case._replace(args=(4, 5, 6)), 'outcome', "- would result negative", [7])])
+            self.assertEqual(read_corpus(filename), [case, case._replace(args=(4, 5, 6))])
+
+
+class TestDifferentialLedger(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.harness = DifferentialHarness()
+
+    def test_boundary_cases(self):
+        # The fee functions and a smaller grid of the swap functions, python -m tests.differential runs the full grid
+        cases = generate_boundary_cases(['calculate_fixed_input_fee_amounts', 'calculate_fixed_output_fee_amounts'], offsets=1)
+        cases += generate_boundary_cases(['calculate_fixed_input_swap', 'calculate_fixed_output_swap'], offsets=0)
+        self.assertEqual(run_cases(self.harness, cases), [])
+
+    def test_batching(self):
+        cases = [
+            DiffCase('calculate_fixed_input_swap', (1_000_000, 1_000_000, amount), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+            for amount in range(1, 1001)
+        ]
+        evaluation_count = self.harness.evaluation_count
+        self.assertEqual(run_cases(self.harness, cases), [])
+        self.assertEqual(self.harness.evaluation_count - evaluation_count, 1)
@@ -0,0 +1,156 @@
+import io
+import unittest
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address, encode_address
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .events import Event, iter_columns, iter_events, write_csv
+
+
+class TestEvents(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def build_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+        self.pool = decode_address(self.pool_address)
+        self.user = decode_address(self.user_addr)
+
+    def setUp(self):
+        self.reset_ledger()
+
+    def eval_transactions(self, txn_group):
+        txn_group = transaction.assign_group_id(txn_group)
+        return self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+
+    def get_swap_transactions(self):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=10_100,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-output", 9871],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 3000
+        return txn_group
+
+    def test_swap(self):
+        block = self.eval_transactions(self.get_swap_transactions())
+        self.assertEqual(list(iter_events([block])), [
+            Event(block[b'rnd'], 0, b'swap', self.pool, self.asset_1_id, 10_100, self.user, self.pool),
+            Event(block[b'rnd'], 1, b'swap', self.pool, self.asset_1_id, 100, self.pool, self.user),
+            Event(block[b'rnd'], 1, b'swap', self.pool, self.asset_2_id, 9871, self.pool, self.user),
+        ])
+
+    def test_add_liquidity(self):
+        block = self.eval_transactions(self.get_add_liquidity_transactions(asset_1_amount=10_000, asset_2_amount=10_000, app_call_fee=3_000))
+        self.assertEqual(list(iter_events([{b'block': block}])), [
+            Event(block[b'rnd'], 0, b'add_liquidity', self.pool, self.asset_1_id, 10_000, self.user, self.pool),
+            Event(block[b'rnd'], 1, b'add_liquidity', self.pool, self.asset_2_id, 10_000, self.user, self.pool),
+            Event(block[b'rnd'], 2, b'add_liquidity', self.pool, self.pool_token_asset_id, 10_000, self.pool, self.user),
+        ])
+
+    def test_flash_loan(self):
+        index_diff = 2
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_LOAN, index_diff, 10_000, 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=10_040,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_LOAN, index_diff],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[0].fee = 2000
+        block = self.eval_transactions(txn_group)
+        self.assertEqual(list(iter_events([block])), [
+            Event(block[b'rnd'], 0, b'flash_loan', self.pool, self.asset_1_id, 10_000, self.pool, self.user),
+            Event(block[b'rnd'], 1, b'verify_flash_loan', self.pool, self.asset_1_id, 10_040, self.user, self.pool),
+        ])
+
+    def test_writers(self):
+        block = self.eval_transactions(self.get_swap_transactions())
+        file = io.StringIO()
+        self.assertEqual(write_csv(iter_events([block] * 3), file), 9)
+        lines = file.getvalue().splitlines()
+        self.assertEqual(lines[0], 'round,txn_index,method,pool_address,asset_id,amount,sender,receiver')
+        self.assertEqual(lines[1], f'{block[b"rnd"]},0,swap,{self.pool_address},{self.asset_1_id},10100,{self.user_addr},{self.pool_address}')
+
+        chunks = list(iter_columns(iter_events([block] * 3), chunk_size=4))
+        self.assertEqual([len(chunk['amount']) for chunk in chunks], [4, 4, 1])
+        self.assertEqual(chunks[0]['amount'], [10_100, 100, 9871, 10_100])
+        self.assertEqual(chunks[0]['receiver'][0], self.pool_address)
+
+
+class TestEventsInnerAppCalls(unittest.TestCase):
+
+    def test_proxy(self):
+        pool, user, proxy = b'p' * 32, b'u' * 32, b'x' * 32
+        block = {
+            b'rnd': 7,
+            b'txns': [
+                {b'txn': {b'type': b'pay', b'snd': user, b'rcv': proxy, b'amt': 5}},
+                {b'txn': {b'type': b'axfer', b'snd': user, b'arcv': proxy, b'xaid': 5, b'aamt': 1000, b'grp': b'g'}},
+                {
+                    b'txn': {b'type': b'appl', b'snd': user, b'apid': APPLICATION_ID + 1, b'apaa': [b'swap'], b'grp': b'g'},
+                    b'dt': {b'itx': [
+                        {b'txn': {b'type': b'axfer', b'snd': proxy, b'arcv': pool, b'xaid': 5, b'aamt': 990}},
+                        {
+                            b'txn': {b'type': b'appl', b'snd': proxy, b'apid': APPLICATION_ID, b'apaa': [b'swap'], b'apat': [pool]},
+                            b'dt': {b'itx': [{b'txn': {b'type': b'axfer', b'snd': pool, b'arcv': proxy, b'xaid': 2, b'aamt': 900}}]},
+                        },
+                        {b'txn': {b'type': b'axfer', b'snd': proxy, b'arcv': user, b'xaid': 2, b'aamt': 900}},
+                    ]},
+                },
+            ]
+        }
+        self.assertEqual(list(iter_events([block])), [
+            Event(7, 2, b'swap', pool, 5, 990, proxy, pool),
+            Event(7, 2, b'swap', pool, 2, 900, pool, proxy),
+        ])
+        self.assertEqual(encode_address(pool), next(iter_columns(iter_events([block])))['pool_address'][0])
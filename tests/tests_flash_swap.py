@@ -8,8 +8,9 @@ from algosdk.future import transaction
 
 from .constants import *
 from .core import BaseTestCase
+from .program_cache import LazyTealishProgram
 
-dummy_program = TealishProgram('tests/dummy_program.tl')
+dummy_program = LazyTealishProgram('tests/dummy_program.tl')
 DUMMY_APP_ID = 11
 
 
@@ -0,0 +1,104 @@
+import unittest
+
+from . import fuzzing
+from .amm_math import LogicError
+from .constants import *
+from .quotes import get_fixed_input_swap_quote
+
+
+class TestFuzzing(unittest.TestCase):
+
+    def test_generate_case(self):
+        cases = [fuzzing.generate_case(seed) for seed in range(500)]
+        self.assertEqual(cases, [fuzzing.generate_case(seed) for seed in range(500)])
+        self.assertEqual({case.operation for case in cases}, set(fuzzing.OPERATIONS))
+        for case in cases:
+            self.assertTrue(fuzzing.is_valid_case(case), msg=case)
+
+    def test_apply_operation(self):
+        pool = fuzzing.PoolModel(1_000_000, 1_000_000, 1_000_000, 0, 0)
+        case = fuzzing.FuzzCase(0, 'swap-fixed-input', 2, 1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (10_000, 0))
+        quote = get_fixed_input_swap_quote(1_000_000, 1_000_000, 10_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(
+            fuzzing.apply_operation(pool, case),
+            fuzzing.PoolModel(1_000_000 - quote.output_amount, 1_000_000 + quote.swap_amount + quote.poolers_fee_amount, 1_000_000, 0, quote.protocol_fee_amount)
+        )
+        with self.assertRaises(LogicError):
+            fuzzing.apply_operation(pool, case._replace(amounts=(10_000, quote.output_amount + 1)))
+
+        # 1_000 + 3 fee
+        case = fuzzing.FuzzCase(0, 'flash-loan', None, 1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (1_000, 0, 1_003, 0))
+        self.assertEqual(fuzzing.apply_operation(pool, case), fuzzing.PoolModel(1_000_003, 1_000_000, 1_000_000, 0, 0))
+        with self.assertRaises(LogicError):
+            fuzzing.apply_operation(pool, case._replace(amounts=(1_000, 0, 1_002, 0)))
+
+        # The output is not paid back
+        case = fuzzing.FuzzCase(0, 'flash-swap', None, 1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (1_000, 0, 1_000, 0))
+        with self.assertRaises(LogicError):
+            fuzzing.apply_operation(pool, case)
+
+    def test_check_properties(self):
+        initial = fuzzing.PoolModel(1_000_000, 1_000_000, 1_000_000, 0, 0)
+        case = fuzzing.FuzzCase(0, 'swap-fixed-input', 1, 1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (10_000, 0))
+        self.assertIsNone(fuzzing.check_properties(initial, initial._replace(asset_1_reserves=1_010_000, asset_2_reserves=990_100), case))
+        self.assertEqual(fuzzing.check_properties(initial, initial._replace(asset_1_reserves=1_010_000, asset_2_reserves=990_000), case), 'invariant')
+
+        case = case._replace(operation='remove-liquidity', amounts=(1_000,))
+        self.assertEqual(fuzzing.check_properties(initial, initial._replace(asset_1_reserves=999_000, asset_2_reserves=998_000, issued_pool_tokens=999_000), case), 'pool_token_value')
+        self.assertIsNone(fuzzing.check_properties(initial, fuzzing.PoolModel(0, 0, 0, 0, 0), case))
+
+    def test_shrink(self):
+        case = fuzzing.FuzzCase(0, 'add-liquidity-flexible', None, 123_456_789, 987_654_321, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (1_024_000, 77_777))
+        calls = []
+
+        def is_failing(candidate):
+            calls.append(candidate)
+            return candidate.amounts[0] >= 1_000
+
+        shrunk = fuzzing.shrink(case, is_failing)
+        self.assertEqual(shrunk.amounts, (1_000, 0))
+        self.assertEqual(shrunk.asset_1_reserves, 1)
+        # The pool of the shrunk case can still be set up
+        self.assertTrue(fuzzing.is_valid_case(shrunk))
+
+        calls.clear()
+        fuzzing.shrink(case, is_failing, max_attempts=10)
+        self.assertEqual(len(calls), 10)
+
+    def test_replay_case(self):
+        self.assertEqual(fuzzing.parse_replay_case('42'), fuzzing.generate_case(42))
+        shrunk = fuzzing.generate_case(42)._replace(asset_1_reserves=1_000, amounts=(1,) * len(fuzzing.generate_case(42).amounts))
+        self.assertEqual(fuzzing.parse_replay_case(fuzzing.case_to_json(shrunk)), shrunk)
+        case = fuzzing.FuzzCase(7, 'add-liquidity-flexible', None, 1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (10, 20))
+        self.assertEqual(fuzzing.parse_replay_case(fuzzing.case_to_json(case)), case)
+
+
+class TestFuzzingLedger(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.harness = fuzzing.FuzzHarness()
+
+    def test_cases(self):
+        # A few cases of every operation, the workers of python -m tests.fuzzing run many more
+        operations = dict.fromkeys(fuzzing.OPERATIONS, 0)
+        seed = 0
+        while min(operations.values()) < 3:
+            case = fuzzing.generate_case(seed)
+            seed += 1
+            if operations[case.operation] >= 3:
+                continue
+            operations[case.operation] += 1
+            rejected, mismatch = fuzzing.check_case(self.harness, case)
+            self.assertIsNone(mismatch, msg=case)
+
+    def test_check_case(self):
+        case = fuzzing.FuzzCase(0, 'swap-fixed-input', 1, 1_000_000, 1_000_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, (10_000, 0))
+        rejected, mismatch = fuzzing.check_case(self.harness, case)
+        self.assertFalse(rejected)
+        self.assertIsNone(mismatch)
+
+        # assert(input_amount)
+        rejected, mismatch = fuzzing.check_case(self.harness, case._replace(amounts=(0, 0)))
+        self.assertTrue(rejected)
+        self.assertIsNone(mismatch)
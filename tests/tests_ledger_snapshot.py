@@ -0,0 +1,132 @@
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+
+
+def get_mutable_state_ids(value, shared_ids):
+    """ Returns the ids of the containers and objects reachable from the value, except the objects of shared_ids """
+    ids = set()
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if id(value) in shared_ids or id(value) in ids:
+            continue
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, set)):
+            stack.extend(value)
+        elif isinstance(value, bytearray):
+            pass
+        elif hasattr(value, '__dict__'):
+            stack.append(vars(value))
+        else:
+            # Immutable values (int, bytes, str, tuple of them) can be shared
+            continue
+        ids.add(id(value))
+    return ids
+
+
+class TestLedgerSnapshot(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.build_count = 0
+
+    def build_ledger(self):
+        type(self).build_count += 1
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_1_id)
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+
+    def test_restore(self):
+        self.reset_ledger()
+        ledger = self.ledger
+        pool_address = self.pool_address
+        pool_token_asset_id = self.pool_token_asset_id
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=self.asset_1_id)
+        del self.pool_address
+
+        self.reset_ledger()
+        self.assertEqual(self.build_count, 1)
+        self.assertIsNot(self.ledger, ledger)
+        self.assertEqual(self.pool_address, pool_address)
+        self.assertEqual(self.pool_token_asset_id, pool_token_asset_id)
+        self.assertEqual(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], 0)
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_1_id)[0], 1_000_000)
+        # Programs are shared
+        self.assertIs(self.ledger.apps[APPLICATION_ID]['approval_program'], ledger.apps[APPLICATION_ID]['approval_program'])
+
+    def test_restore_does_not_share_state(self):
+        self.reset_ledger()
+        self.reset_ledger()
+        snapshot_ledger = type(self).ledger_snapshot.ledger
+        programs = {id(app['approval_program']) for app in snapshot_ledger.apps.values()}
+        shared = get_mutable_state_ids(self.ledger, programs) & get_mutable_state_ids(snapshot_ledger, programs)
+        self.assertEqual(shared, set())
+
+        # The changes of a test are not in the next restored ledger
+        self.ledger.set_account_balance(self.user_addr, 0)
+        self.ledger.update_local_state(self.pool_address, APPLICATION_ID, {b'asset_1_reserves': 1})
+        self.ledger.update_global_state(APPLICATION_ID, {b'fee_collector': b''})
+        self.ledger.apps[APPLICATION_ID]['local_ints'] = 0
+        self.reset_ledger()
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr)[0], 1_000_000)
+        self.assertEqual(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], 0)
+        self.assertNotEqual(self.ledger.get_global_state(APPLICATION_ID)[b'fee_collector'], b'')
+        self.assertEqual(self.ledger.apps[APPLICATION_ID]['local_ints'], APP_LOCAL_INTS)
+
+    def test_build_ledger_is_required(self):
+        class TestWithoutBuildLedger(BaseTestCase):
+            def runTest(self):
+                pass
+
+        with self.assertRaises(TypeError):
+            TestWithoutBuildLedger().reset_ledger()
+
+
+class TestLedgerSnapshotAfterEvaluation(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def build_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_2_id)
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+
+        # The ledger keeps the sqlite connections of the evaluation
+        txn_group = self.get_add_initial_liquidity_transactions(asset_1_amount=100_000, asset_2_amount=100_000, app_call_fee=2_000)
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(txn_group), self.user_sk))
+
+    def test_restore(self):
+        self.reset_ledger()
+        self.assertEqual(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], 100_000)
+        txn_group = self.get_add_liquidity_transactions(asset_1_amount=10_000, asset_2_amount=10_000, app_call_fee=3_000)
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(txn_group), self.user_sk))
+        self.assertEqual(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], 110_000)
+
+        self.reset_ledger()
+        self.assertEqual(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], 100_000)
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_1_id)[0], 900_000)
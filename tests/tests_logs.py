@@ -0,0 +1,140 @@
+import unittest
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .logs import (FlashSwapLogs, RemoveLiquidityLogs, SwapLogs, VerifyFlashLoanLogs, decode_block_logs, decode_logs,
+                   iter_int_logs)
+from .utils import itob
+
+
+def get_app_call(method, logs, inner_transactions=()):
+    return {
+        b'txn': {b'type': b'appl', b'apid': APPLICATION_ID, b'apaa': [method]},
+        b'dt': {b'lg': logs, b'itx': list(inner_transactions)},
+    }
+
+
+class TestLogs(unittest.TestCase):
+
+    def test_decode_logs(self):
+        txn = get_app_call(b'flash_swap', [itob(100), itob(200)])
+        self.assertEqual(decode_logs(txn), FlashSwapLogs(100, 200))
+
+        txn = get_app_call(b'verify_flash_loan', [b'asset_2_output_amount %i' + itob(1000), b'asset_2_total_fee_amount %i' + itob(3)])
+        record = decode_logs(txn)
+        self.assertEqual(record.asset_2_output_amount, 1000)
+        self.assertEqual(record.asset_2_total_fee_amount, 3)
+        self.assertEqual(record.asset_1_output_amount, 0)
+
+        self.assertIsNone(decode_logs(get_app_call(b'set_fee', [])))
+        self.assertIsNone(decode_logs(get_app_call(b'swap', [b'swap_amount %i' + itob(1)]), app_id=APPLICATION_ID + 1))
+
+    def test_decode_block_logs(self):
+        inner_app_call = get_app_call(b'swap', [b'swap_amount %i' + itob(1)])
+        block = {
+            b'txns': [
+                {b'txn': {b'type': b'pay'}},
+                get_app_call(b'proxy_swap', [b'unknown %i' + itob(2)], [{b'txn': {b'type': b'axfer'}}, inner_app_call]),
+            ]
+        }
+        self.assertEqual(decode_block_logs(block), [(1, SwapLogs(0, 0, 1, 0, 0, 0, 0, 0, 0))])
+
+    def test_iter_int_logs(self):
+        logs = [b'swap_amount %i' + itob(7), itob(8), b'a %b']
+        self.assertEqual(list(iter_int_logs(logs)), [(b'swap_amount', 7)])
+
+
+class TestLogsConformance(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def build_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def setUp(self):
+        self.reset_ledger()
+
+    def eval_transactions(self, txn_group):
+        txn_group = transaction.assign_group_id(txn_group)
+        return self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+
+    def test_swap(self):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=10_100,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-output", 9871],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 3000
+        block = self.eval_transactions(txn_group)
+        self.assertEqual(decode_block_logs(block), [
+            (1, SwapLogs(input_asset_id=self.asset_1_id, input_amount=10_100, swap_amount=9970, change=100, output_asset_id=self.asset_2_id, output_amount=9871, poolers_fee_amount=25, protocol_fee_amount=5, total_fee_amount=30))
+        ])
+
+    def test_remove_liquidity_single(self):
+        txn_group = self.get_remove_liquidity_single_transactions(liquidity_asset_amount=5_000, asset_id=self.asset_1_id, app_call_fee=3_000)
+        block = self.eval_transactions(txn_group)
+        record = decode_logs(block[b'txns'][1])
+        self.assertEqual(record, RemoveLiquidityLogs(input_asset_id=self.asset_2_id, input_amount=5_000, swap_amount=4985, output_asset_id=self.asset_1_id, output_amount=4960, poolers_fee_amount=13, protocol_fee_amount=2, total_fee_amount=15))
+
+    def test_flash_loan(self):
+        index_diff = 2
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_LOAN, index_diff, 10_000, 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=10_040,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_LOAN, index_diff],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[0].fee = 2000
+        block = self.eval_transactions(txn_group)
+        self.assertEqual(decode_block_logs(block), [
+            (2, VerifyFlashLoanLogs(10_000, 10_040, 10, 25, 5, 30, 0, 0, 0, 0, 0, 0))
+        ])
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .oracle_sampler import OracleSampler
+from .pool_state import PoolStateStore
+from .twap import Observation
+
+BOOTSTRAP_TIMESTAMP = 1_640_995_200
+DAY = 24 * 60 * 60
+
+
+class TestOracleSampler(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'oracle.samples')
+
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=4_000_000, liquidity_provider_address=self.user_addr)
+        self.ledger.update_local_state(address=self.pool_address, app_id=APPLICATION_ID, state_delta={b'cumulative_price_update_timestamp': BOOTSTRAP_TIMESTAMP})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def swap(self, amount, block_timestamp):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-input", 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 2000
+        txn_group = transaction.assign_group_id(txn_group)
+        return self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk), block_timestamp=block_timestamp)
+
+    def test_add_block(self):
+        store = PoolStateStore.from_ledger(self.ledger)
+        expected = []
+        with OracleSampler(self.path, pool_capacity=4, sample_capacity=2) as sampler:
+            for i in range(1, 4):
+                block = self.swap(100_000, block_timestamp=BOOTSTRAP_TIMESTAMP + i * DAY)
+                sampler.add_block(block)
+                store.apply_block(block)
+                pool_state = store.get(self.pool_address)
+                expected.append(Observation(pool_state.cumulative_price_update_timestamp, pool_state.asset_1_cumulative_price, pool_state.asset_2_cumulative_price))
+
+        # The history is kept after a restart
+        with OracleSampler(self.path) as sampler:
+            self.assertEqual(len(sampler), 1)
+            self.assertEqual(sampler.get_observations(self.pool_address), expected[-2:])
+            asset_1_price, asset_2_price, start, end = sampler.get_twap(self.pool_address, BOOTSTRAP_TIMESTAMP + 2 * DAY, BOOTSTRAP_TIMESTAMP + 3 * DAY + 10)
+            self.assertEqual((start, end), (BOOTSTRAP_TIMESTAMP + 2 * DAY, BOOTSTRAP_TIMESTAMP + 3 * DAY))
+            self.assertEqual(asset_1_price, (expected[2].asset_1_cumulative_price - expected[1].asset_1_cumulative_price) // DAY)
+            self.assertEqual(asset_2_price, (expected[2].asset_2_cumulative_price - expected[1].asset_2_cumulative_price) // DAY)
+
+        with self.assertRaises(ValueError):
+            OracleSampler(self.path, app_id=APPLICATION_ID + 1)
+
+
+class TestOracleSamplerRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'oracle.samples')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_wrap_around(self):
+        pool_addresses = [generate_account()[1] for _ in range(3)]
+        public_keys = [decode_address(address) for address in pool_addresses]
+        # Cumulative prices which do not fit in 128 bits, the price of asset 1 is 3 and 5 for the pools
+        base = 2**130 + 7
+        with OracleSampler(self.path, pool_capacity=3, sample_capacity=4) as sampler:
+            for timestamp in range(100, 1100, 100):
+                sampler.add_samples(
+                    public_keys[:2],
+                    [timestamp] * 2,
+                    [base + timestamp * 3 * PRICE_SCALE_FACTOR, base + timestamp * 5 * PRICE_SCALE_FACTOR],
+                    [timestamp, timestamp],
+                )
+            sampler.add_samples(public_keys[2:], [50], [1], [2])
+            with self.assertRaises(ValueError):
+                sampler.add_samples([public_keys[0], public_keys[0]], [1, 2], [0, 0], [0, 0])
+            with self.assertRaises(ValueError):
+                sampler.add_samples([generate_account()[1].encode()[:32]], [1], [0], [0])
+
+        with OracleSampler(self.path) as sampler:
+            self.assertEqual([observation.timestamp for observation in sampler.get_observations(pool_addresses[0])], [700, 800, 900, 1000])
+            self.assertEqual(sampler.get_observations(pool_addresses[1])[0].asset_1_cumulative_price, base + 700 * 5 * PRICE_SCALE_FACTOR)
+            self.assertEqual(sampler.get_observations(pool_addresses[2]), [Observation(50, 1, 2)])
+            self.assertEqual(sampler.get_twap(pool_addresses[0], 700, 1000)[:2], (3 * PRICE_SCALE_FACTOR, 1))
+            self.assertEqual(sampler.get_twap(pool_addresses[1], 750, 950)[:2], (5 * PRICE_SCALE_FACTOR, 1))
+            with self.assertRaises(ValueError):
+                sampler.get_twap(pool_addresses[0], 600, 1000)
+            self.assertEqual(sampler.get_observations(generate_account()[1]), [])
+
+    def test_long_window(self):
+        pool_address = generate_account()[1]
+        public_key = decode_address(pool_address)
+        # The increase of the cumulative price of asset 1 does not fit in 128 bits, the price is 2^40 for 200 days
+        price = 2**40 * PRICE_SCALE_FACTOR
+        base = 2**510
+        with OracleSampler(self.path, pool_capacity=1, sample_capacity=4) as sampler:
+            sampler.add_samples([public_key], [0], [base], [0])
+            sampler.add_samples([public_key], [200 * DAY], [base + price * 200 * DAY], [200 * DAY])
+            with self.assertRaises(ValueError):
+                sampler.add_samples([public_key], [201 * DAY], [2**520], [0])
+            with self.assertRaises(ValueError):
+                sampler.add_samples([public_key], [201 * DAY], [-1], [0])
+
+            self.assertGreaterEqual(price * 200 * DAY, 2**128)
+            self.assertEqual(sampler.get_observations(pool_address)[-1].asset_1_cumulative_price, base + price * 200 * DAY)
+            self.assertEqual(sampler.get_twap(pool_address, 0, 200 * DAY), (price, 1, 0, 200 * DAY))
@@ -0,0 +1,51 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from .parallel import JIG_DIR, create_jig_dir, get_test_classes, main, run_tests
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_get_test_classes(self):
+        test_classes = get_test_classes(['tests.tests_add_liquidity', 'tests.tests_set_fee.TestSetFee.test_set_fee'])
+        self.assertEqual([test_ids[0].rsplit('.', 1)[0] for test_ids in test_classes], [
+            'tests.tests_add_liquidity.TestAddLiquidity',
+            'tests.tests_add_liquidity.TestAddLiquidityAlgoPair',
+            'tests.tests_set_fee.TestSetFee',
+        ])
+        self.assertEqual(test_classes[-1], ['tests.tests_set_fee.TestSetFee.test_set_fee'])
+
+    def test_run_tests(self):
+        result = run_tests(['tests.tests_ledger_snapshot.TestLedgerSnapshot.test_restore'], verbosity=1)
+        self.assertEqual(result['tests_run'], 1)
+        self.assertEqual(result['failures'], [])
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['output'], '.')
+
+    def test_create_jig_dir(self):
+        with tempfile.TemporaryDirectory() as binary_dir:
+            jig_dir, binary = create_jig_dir(binary_dir)
+            other_jig_dir, other_binary = create_jig_dir(binary_dir)
+            try:
+                self.assertEqual(len(jig_dir), len(JIG_DIR))
+                self.assertNotEqual(jig_dir, other_jig_dir)
+                with open(binary, 'rb') as f:
+                    program = f.read()
+                self.assertNotIn(JIG_DIR.encode(), program)
+                self.assertIn(f'{jig_dir}/stxns'.encode(), program)
+                self.assertTrue(os.access(binary, os.X_OK))
+            finally:
+                shutil.rmtree(jig_dir)
+                shutil.rmtree(other_jig_dir)
+
+    def test_main(self):
+        # The test classes evaluate transactions in two workers at the same time
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = main(['-j', '2', 'tests.tests_ledger_snapshot', 'tests.tests_swap'])
+        self.assertEqual(status, 0, stderr.getvalue())
+        self.assertIn('(2 processes)', stderr.getvalue())
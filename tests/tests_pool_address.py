@@ -0,0 +1,28 @@
+import unittest
+
+from .constants import *
+from .utils import derive_pool_address, derive_pool_addresses, get_pool_address, get_pool_logicsig_bytecode
+
+POOLS = [
+    (APPLICATION_ID, 5, 2),
+    (APPLICATION_ID, 5, ALGO_ASSET_ID),
+    (APPLICATION_ID, 31566704, ALGO_ASSET_ID),
+    (1002541853, 31566704, 27165954),
+    (1002541853, MAX_UINT64, MAX_UINT64 - 1),
+]
+
+
+class TestPoolAddress(unittest.TestCase):
+
+    def test_derive_pool_address(self):
+        for app_id, asset_1_id, asset_2_id in POOLS:
+            with self.subTest(app_id=app_id, asset_1_id=asset_1_id, asset_2_id=asset_2_id):
+                lsig = get_pool_logicsig_bytecode(amm_pool_template, app_id, asset_1_id, asset_2_id)
+                self.assertEqual(derive_pool_address(app_id, asset_1_id, asset_2_id), lsig.address())
+                self.assertEqual(get_pool_address(app_id, asset_1_id, asset_2_id), lsig.address())
+
+    def test_derive_pool_addresses(self):
+        pools = [(APPLICATION_ID, asset_1_id, asset_2_id) for asset_1_id in range(1, 60) for asset_2_id in range(asset_1_id)]
+        expected = [derive_pool_address(*pool) for pool in pools]
+        self.assertEqual(derive_pool_addresses(pools), expected)
+        self.assertEqual(derive_pool_addresses(pools, processes=2, chunk_size=500), expected)
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from algosdk.account import generate_account
+
+from .constants import *
+from .pool_index import PoolAddressIndex
+from .utils import derive_pool_address
+
+
+class TestPoolAddressIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'pools.idx')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookup(self):
+        asset_ids = [5, 2, 7, 31566704]
+        with PoolAddressIndex(self.path, APPLICATION_ID) as index:
+            for asset_id in asset_ids:
+                index.add_asset(asset_id)
+            # Pending pools are visible before flush
+            self.assertEqual(index.lookup(derive_pool_address(APPLICATION_ID, 5, 2)), (5, 2))
+
+        index = PoolAddressIndex(self.path, APPLICATION_ID)
+        # 5 assets including ALGO
+        self.assertEqual(len(index), 10)
+        for asset_1_id in asset_ids + [ALGO_ASSET_ID]:
+            for asset_2_id in asset_ids + [ALGO_ASSET_ID]:
+                if asset_1_id > asset_2_id:
+                    self.assertEqual(index.lookup(derive_pool_address(APPLICATION_ID, asset_1_id, asset_2_id)), (asset_1_id, asset_2_id))
+
+        # Reversed asset order is not a pool
+        self.assertIsNone(index.lookup(derive_pool_address(APPLICATION_ID, 2, 5)))
+        self.assertNotIn(generate_account()[1], index)
+        index.close()
+
+    def test_incremental_insert(self):
+        with PoolAddressIndex(self.path, APPLICATION_ID) as index:
+            index.add_asset(5)
+
+        with PoolAddressIndex(self.path, APPLICATION_ID) as index:
+            self.assertEqual(len(index), 1)
+            index.add_asset(2)
+            index.add_pool(2, 5)
+            self.assertEqual(len(index), 3)
+
+        index = PoolAddressIndex(self.path, APPLICATION_ID)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.lookup(derive_pool_address(APPLICATION_ID, 5, ALGO_ASSET_ID)), (5, ALGO_ASSET_ID))
+        self.assertEqual(index.lookup(derive_pool_address(APPLICATION_ID, 2, ALGO_ASSET_ID)), (2, ALGO_ASSET_ID))
+        self.assertEqual(index.lookup(derive_pool_address(APPLICATION_ID, 5, 2)), (5, 2))
+        index.close()
+
+    def test_other_app_id(self):
+        PoolAddressIndex(self.path, APPLICATION_ID).close()
+        with self.assertRaises(ValueError):
+            PoolAddressIndex(self.path, APPLICATION_ID + 1)
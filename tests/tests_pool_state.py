@@ -0,0 +1,111 @@
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .pool_state import BYTES_KEYS, PoolState, PoolStateStore
+from .preflight import get_pool_states
+
+
+class TestPoolStateStore(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def build_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000, liquidity_provider_address=self.user_addr)
+
+    def setUp(self):
+        self.reset_ledger()
+
+    def eval_transactions(self, txn_group, block_timestamp=None):
+        txn_group = transaction.assign_group_id(txn_group)
+        return self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk), block_timestamp=block_timestamp)
+
+    def assertSameState(self, store):
+        pool_states = get_pool_states(self.ledger)
+        self.assertEqual(len(store), len(pool_states))
+        for address, local_state in pool_states.items():
+            expected = {key: local_state.get(key.encode(), 0) for key in PoolState._fields}
+            for key in BYTES_KEYS:
+                expected[key] = int.from_bytes(expected[key] or b'', 'big')
+            self.assertEqual(store.get(address), PoolState(**expected))
+
+    def test_apply_block(self):
+        store = PoolStateStore.from_ledger(self.ledger)
+        self.assertSameState(store)
+        self.assertEqual(store.get_value(self.pool_address, 'issued_pool_tokens'), 1_000_000)
+
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=10_000,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-input", 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 2000
+        # Cumulative prices are updated, 100 years later
+        store.apply_block(self.eval_transactions(txn_group, block_timestamp=100 * 365 * 24 * 3600))
+        self.assertSameState(store)
+        self.assertGreater(store.get(self.pool_address).asset_1_cumulative_price, MAX_UINT64)
+        self.assertEqual(store.get_value(self.pool_address, 'asset_1_reserves'), 1_000_000 + 10_000 - 5)
+
+        store.apply_block({b'block': self.eval_transactions(self.get_remove_liquidity_transactions(liquidity_asset_amount=5_000, app_call_fee=3000), block_timestamp=101 * 365 * 24 * 3600)})
+        self.assertSameState(store)
+
+    def test_new_pools(self):
+        store = PoolStateStore(capacity=2)
+        pool_addresses = [generate_account()[1] for _ in range(5)]
+        for i, address in enumerate(pool_addresses):
+            txn = {
+                b'txn': {b'type': b'appl', b'apid': APPLICATION_ID, b'snd': decode_address(address)},
+                b'dt': {b'ld': {0: {
+                    b'asset_1_id': {b'at': 2, b'ui': 10 + i},
+                    b'asset_1_cumulative_price': {b'at': 1, b'bs': BYTE_ZERO},
+                    b'lock': {b'at': 2, b'ui': 1},
+                }}},
+            }
+            store.apply_block({b'txns': [{b'txn': {b'type': b'appl', b'apid': 99}, b'dt': {b'itx': [txn]}}]})
+        txn[b'dt'][b'ld'][0][b'lock'] = {b'at': 3}
+        txn[b'dt'][b'ld'][0][b'asset_1_cumulative_price'] = {b'at': 1, b'bs': b'\x01' + BYTE_ZERO}
+        store.apply_local_deltas(txn)
+
+        self.assertEqual(store.addresses(), pool_addresses)
+        self.assertEqual(list(store.column('asset_1_id')), [10, 11, 12, 13, 14])
+        self.assertEqual(list(store.column('lock')), [1, 1, 1, 1, 0])
+        self.assertEqual(store.get(pool_addresses[4]).asset_1_cumulative_price, 2**64)
+        self.assertIsNone(store.get(self.user_addr))
+        self.assertNotIn(self.user_addr, store)
+
+    def test_size(self):
+        store = PoolStateStore(capacity=50_000)
+        for i in range(50_000):
+            store._get_row(i.to_bytes(32, 'big'))
+        self.assertEqual(len(store), 50_000)
+        self.assertLess(store.nbytes, 12 * 2**20)
@@ -0,0 +1,233 @@
+from algojig import get_suggested_params, LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .preflight import PreflightError, get_pool_states, validate_transaction_group, validate_transaction_groups
+
+
+class TestPreflight(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.other_sk, cls.other_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def build_ledger(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        for address in [self.user_addr, self.other_addr]:
+            self.ledger.set_account_balance(address, 10_000_000)
+            self.ledger.set_account_balance(address, 200_000_000, asset_id=self.asset_1_id)
+            self.ledger.set_account_balance(address, 200_000_000, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=100_000_000, asset_2_reserves=100_000_000, liquidity_provider_address=self.user_addr)
+
+    def setUp(self):
+        self.reset_ledger()
+        self.pool_states = get_pool_states(self.ledger)
+
+    def assertSameResult(self, txn_group):
+        try:
+            validate_transaction_group(txn_group, self.pool_states)
+        except PreflightError as e:
+            error = e
+        else:
+            error = None
+
+        txn_group = transaction.assign_group_id(txn_group)
+        keys = {self.user_addr: self.user_sk, self.other_addr: self.other_sk}
+        stxns = [txn.sign(keys[txn.sender]) for txn in txn_group]
+        self.reset_ledger()
+        if error is None:
+            self.ledger.eval_transactions(stxns)
+        else:
+            with self.assertRaises(LogicEvalError) as e:
+                self.ledger.eval_transactions(stxns)
+            self.assertEqual(e.exception.source['line'], error.source_line)
+            self.assertEqual(e.exception.txn_id, stxns[error.txn_index].get_txid())
+        return error
+
+    def get_swap_transactions(self):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=1_000_000,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-input", 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 2000
+        return txn_group
+
+    def get_flash_loan_transactions(self, index_diff=3, asset_1_amount=10_000_000, asset_2_amount=20_000_000, repayment_amount=25_000_000):
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_LOAN, index_diff, asset_1_amount, asset_2_amount],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=15_000_000,
+            ),
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_2_id,
+                amt=repayment_amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_LOAN, index_diff],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[0].fee = 3000
+        return txn_group
+
+    def get_flash_swap_transactions(self, index_diff=2, txns=()):
+        return [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_FLASH_SWAP, index_diff, 10_000, 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            ),
+            *txns,
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=11_000,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_VERIFY_FLASH_SWAP, index_diff],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+
+    def test_swap(self):
+        self.assertIsNone(self.assertSameResult(self.get_swap_transactions()))
+
+        txn_group = self.get_swap_transactions()
+        txn_group[0].receiver = self.user_addr
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[input_txn_index].AssetReceiver == pool_address)')
+
+        txn_group = self.get_swap_transactions()
+        txn_group[0].sender = self.other_addr
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[input_txn_index].Sender == user_address)')
+
+        txn_group = self.get_swap_transactions()
+        txn_group[0].amount = 0
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(input_amount)')
+
+        txn_group = self.get_swap_transactions()
+        txn_group[0].index = self.pool_token_asset_id
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'error()')
+
+        txn_group = self.get_swap_transactions()
+        txn_group[1].app_args = txn_group[1].app_args[:2]
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'int min_output = btoi(Txn.ApplicationArgs[2])')
+
+        txn_group = self.get_swap_transactions()
+        txn_group[1].accounts = [self.other_addr]
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'int asset_1_id = app_local_get(1, "asset_1_id")')
+
+    def test_add_and_remove_liquidity(self):
+        self.assertIsNone(self.assertSameResult(self.get_add_liquidity_transactions(asset_1_amount=1_000_000, asset_2_amount=1_000_000)))
+        self.assertIsNone(self.assertSameResult(self.get_add_liquidity_transactions(asset_1_amount=None, asset_2_amount=1_000_000)))
+
+        txn_group = self.get_add_liquidity_transactions(asset_1_amount=1_000_000, asset_2_amount=1_000_000)
+        txn_group[0], txn_group[1] = txn_group[1], txn_group[0]
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[asset_1_txn_index].XferAsset == asset_1_id)')
+
+        txn_group = self.get_add_liquidity_transactions(asset_1_amount=1_000_000, asset_2_amount=1_000_000)
+        txn_group[1].sender = self.other_addr
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[asset_2_txn_index].Sender == user_address)')
+
+        self.assertIsNone(self.assertSameResult(self.get_remove_liquidity_transactions(liquidity_asset_amount=1_000_000, app_call_fee=3000)))
+
+        txn_group = self.get_remove_liquidity_transactions(liquidity_asset_amount=1_000_000, app_call_fee=3000)
+        txn_group[1].foreign_assets = [self.asset_2_id, self.asset_1_id]
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Txn.Assets[0] == asset_1_id)')
+
+        txn_group = self.get_remove_liquidity_single_transactions(liquidity_asset_amount=1_000_000, asset_id=self.pool_token_asset_id, app_call_fee=3000)
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'error()')
+
+    def test_flash_loan(self):
+        self.assertIsNone(self.assertSameResult(self.get_flash_loan_transactions()))
+
+        txn_group = self.get_flash_loan_transactions(index_diff=2)
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(index_diff > 2)')
+
+        txn_group = self.get_flash_loan_transactions(repayment_amount=20_000_000)
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[asset_2_txn_index].AssetAmount >= asset_2_repayment_amount)')
+
+        txn_group = self.get_flash_loan_transactions()
+        txn_group[3].app_args[1] = (4).to_bytes(8, "big")
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[verify_flash_loan_txn_index].ApplicationArgs[1] == Txn.ApplicationArgs[1])')
+
+        txn_group = self.get_flash_loan_transactions()
+        txn_group[3].sender = self.other_addr
+        self.assertEqual(str(self.assertSameResult(txn_group)), 'assert(Gtxn[verify_flash_loan_txn_index].Sender == user_address)')
+
+    def test_flash_swap(self):
+        validate_transaction_group(self.get_flash_swap_transactions(), self.pool_states)
+
+        # The pool is locked until verify_flash_swap
+        txn_group = self.get_flash_swap_transactions(index_diff=4, txns=self.get_swap_transactions())
+        with self.assertRaises(PreflightError) as e:
+            validate_transaction_group(txn_group, self.pool_states)
+        self.assertEqual(e.exception.txn_index, 2)
+        self.assertEqual(e.exception.source_line, 'assert(app_local_get(1, "lock") == (Txn.ApplicationArgs[0] == "verify_flash_swap"))')
+
+        with self.assertRaises(PreflightError) as e:
+            validate_transaction_group(self.get_flash_swap_transactions(index_diff=1), self.pool_states)
+        self.assertEqual(e.exception.source_line, 'assert(index_diff > 1)')
+
+        with self.assertRaises(PreflightError) as e:
+            validate_transaction_group(self.get_flash_swap_transactions()[1:], self.pool_states)
+        self.assertEqual(e.exception.txn_index, 1)
+        self.assertEqual(e.exception.source_line, 'assert(app_local_get(1, "lock") == (Txn.ApplicationArgs[0] == "verify_flash_swap"))')
+
+    def test_validate_transaction_groups(self):
+        txn_group = self.get_swap_transactions()
+        txn_group[0].amount = 0
+        errors = validate_transaction_groups([self.get_swap_transactions(), txn_group] * 500, self.pool_states)
+        self.assertEqual(len(errors), 1000)
+        self.assertEqual(errors[:2], [None, errors[1]])
+        self.assertEqual(errors[1].source_line, 'assert(input_amount)')
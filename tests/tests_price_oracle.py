@@ -1,3 +1,4 @@
+import unittest
 from datetime import datetime, timedelta
 from unittest.mock import ANY
 from zoneinfo import ZoneInfo
@@ -9,10 +10,13 @@ from algosdk.encoding import decode_address
 from algosdk.future import transaction
 
 from .constants import *
+from .amm_math import LogicError
 from .core import BaseTestCase
+from .price_oracle_reader import PriceOracleReader, calculate_prices
+from .program_cache import LazyTealishProgram
 from .utils import int_to_bytes_without_zero_padding
 
-price_oracle_reader_program = TealishProgram('tests/price_oracle_reader.tl')
+price_oracle_reader_program = LazyTealishProgram('tests/price_oracle_reader.tl')
 PRICE_ORACLE_READER_APP_ID = 10
 
 
@@ -280,3 +284,95 @@ class TestPriceOracle(BaseTestCase):
         self.assertAlmostEqual(int.from_bytes(block_txns[2][b'dt'][b'gd'][byte_pool_address + b'_asset_2_price'][b'bs'], "big") / PRICE_SCALE_FACTOR, 1.0000, delta=0.001)
         self.assertEqual(int.from_bytes(block_txns[2][b'dt'][b'gd'][byte_pool_address + b'_asset_1_cumulative_price'][b'bs'], "big"), 55327950791573035863364)
         self.assertEqual(int.from_bytes(block_txns[2][b'dt'][b'gd'][byte_pool_address + b'_asset_2_cumulative_price'][b'bs'], "big"), 55352521832832831195923)
+
+    def test_read_price_mirror(self):
+        """
+        PriceOracleReader stores the same global state as the reader app.
+        """
+        self.ledger.create_app(app_id=PRICE_ORACLE_READER_APP_ID, approval_program=price_oracle_reader_program)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, 1_000_000, 3_000_000)
+        reader = PriceOracleReader()
+
+        for block_timestamp in [2000, 2000 + 7 * 24 * 60 * 60, 10**9]:
+            txn_group = [
+                transaction.AssetTransferTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    receiver=self.pool_address,
+                    index=self.asset_1_id,
+                    amt=10_000,
+                ),
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=APPLICATION_ID,
+                    app_args=[METHOD_SWAP, "fixed-input", 0],
+                    foreign_assets=[self.asset_1_id, self.asset_2_id],
+                    accounts=[self.pool_address],
+                )
+            ]
+            txn_group[1].fee = 2000
+            txn_group = transaction.assign_group_id(txn_group)
+            stxns = [
+                txn_group[0].sign(self.user_sk),
+                txn_group[1].sign(self.user_sk),
+                transaction.ApplicationNoOpTxn(
+                    sender=self.user_addr,
+                    sp=self.sp,
+                    index=PRICE_ORACLE_READER_APP_ID,
+                    foreign_apps=[APPLICATION_ID],
+                    accounts=[self.pool_address],
+                ).sign(self.user_sk)
+            ]
+            block = self.ledger.eval_transactions(stxns, block_timestamp=block_timestamp)
+            block_txns = block[b'txns']
+
+            pool_local_state_delta = block_txns[1][b'dt'][b'ld'][1]
+            delta = reader.read(
+                self.pool_address,
+                pool_local_state_delta[b'asset_1_cumulative_price'][b'bs'],
+                pool_local_state_delta[b'asset_2_cumulative_price'][b'bs'],
+                pool_local_state_delta[b'cumulative_price_update_timestamp'][b'ui'],
+            )
+            self.assertDictEqual(block_txns[2][b'dt'][b'gd'], delta)
+        self.assertIsNotNone(reader.get_prices(self.pool_address))
+
+
+class TestPriceOracleReader(unittest.TestCase):
+
+    def test_read_many(self):
+        reader = PriceOracleReader()
+        pools = [generate_account()[1] for _ in range(100)]
+        observations = [(pool, i * PRICE_SCALE_FACTOR, 0, 1000) for i, pool in enumerate(pools)]
+        observations += [(pool, i * PRICE_SCALE_FACTOR + i * 2 * 500 * PRICE_SCALE_FACTOR, 500 * PRICE_SCALE_FACTOR, 1500) for i, pool in enumerate(pools)]
+        deltas = reader.read_many(observations)
+
+        self.assertEqual(len(deltas), 200)
+        for i, pool in enumerate(pools):
+            self.assertEqual(reader.get_prices(pool), (i * 2 * PRICE_SCALE_FACTOR, PRICE_SCALE_FACTOR))
+        # A zero price is empty bytes like the byte math results
+        self.assertEqual(deltas[100][decode_address(pools[0]) + b'_asset_1_price'], {b'at': 1, b'bs': b''})
+
+        # The same timestamp does not change the global state
+        self.assertEqual(reader.read(pools[0], 0, 0, 1500), {})
+
+    def test_failures(self):
+        reader = PriceOracleReader()
+        pool = generate_account()[1]
+        # Nothing is stored at timestamp 0
+        self.assertEqual(reader.read(pool, 1, 1, 0), {})
+        self.assertIsNone(reader.get_prices(pool))
+        reader.read(pool, 100, 100, 10)
+
+        global_state = dict(reader.global_state)
+        with self.assertRaises(LogicError):
+            # cumulative_price_update_timestamp - app_global_get(pool_cumulative_price_update_timestamp_key)
+            reader.read(pool, 200, 200, 9)
+        with self.assertRaises(LogicError):
+            # asset_1_cumulative_price b- app_global_get(pool_asset_1_cumulative_price_key)
+            reader.read(pool, 99, 200, 20)
+        self.assertEqual(reader.global_state, global_state)
+
+        self.assertEqual(calculate_prices((b'\x00' * 8, 0), (10, 25), 5), (b'\x02', b'\x05'))
+        with self.assertRaises(LogicError):
+            calculate_prices((0, 0), (1, 1), 0)
@@ -0,0 +1,209 @@
+import unittest
+
+from algojig import TealProgram, get_suggested_params
+from algojig.exceptions import LogicEvalError
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .profiler import (MAX_GROUP_SIZE, PROBE_LABEL, PROBE_SUBROUTINE, PROFILE_SLOT, CostProfile, CostProfiler,
+                       get_basic_block_counts, parse_annotated_teal)
+
+TEAL = """#pragma version 7
+// int x = btoi(Txn.ApplicationArgs[0])
+txna ApplicationArgs 0
+btoi
+// if x:
+bz l0_else
+  // then:
+  // f()
+  callsub __func__f
+  // f()
+  callsub __func__f
+  b l0_end
+  l0_else:
+  // f()
+  callsub __func__f
+l0_end: // end
+// exit(1)
+pushint 1
+return
+
+// func f():
+__func__f:
+// pop(itob(1) b* itob(2))
+pushint 1
+itob
+pushint 2
+itob
+b*
+pop
+retsub
+"""
+
+# Calls the probe 1 btoi(Txn.ApplicationArgs[0]) times, the counter of the probe 1 starts at Txn.ApplicationArgs[1]
+PROBE_LOOP_TEAL = "\n".join([
+    "#pragma version 7",
+    "pushint 8",
+    "bzero",
+    "txna ApplicationArgs 1",
+    "concat",
+    f"store {PROFILE_SLOT}",
+    "pushint 0",
+    "store 0",
+    "loop:",
+    "load 0",
+    "txna ApplicationArgs 0",
+    "btoi",
+    "<",
+    "bz done",
+    "pushint 1",
+    f"callsub {PROBE_LABEL}",
+    "load 0",
+    "pushint 1",
+    "+",
+    "store 0",
+    "b loop",
+    "done:",
+    f"load {PROFILE_SLOT}",
+    "log",
+    "pushint 1",
+    "return",
+    *PROBE_SUBROUTINE,
+])
+PROBE_LOOP_APP_ID = 20_000
+
+
+class TestCostProfile(unittest.TestCase):
+
+    def test_parse_annotated_teal(self):
+        ops, basic_blocks, probe_count, instrumented_teal = parse_annotated_teal(TEAL)
+        self.assertEqual(len(ops), 16)
+        self.assertEqual(probe_count, 1)
+        self.assertEqual(ops[0].source_line, 'int x = btoi(Txn.ApplicationArgs[0])')
+        self.assertEqual(ops[-1].scope, 'f')
+        self.assertIn('callsub profiler__probe', instrumented_teal)
+
+        # then
+        basic_block_counts = get_basic_block_counts(basic_blocks, [1])
+        profile = CostProfile(ops, basic_block_counts, txn_index=0)
+        self.assertEqual(profile.get_scope_costs(), {'(top level)': 8, 'f': 2 * 26})
+        self.assertEqual(profile.total_cost, 60)
+
+        # else
+        basic_block_counts = get_basic_block_counts(basic_blocks, [0])
+        profile = CostProfile(ops, basic_block_counts, txn_index=0)
+        self.assertEqual(profile.get_scope_costs(), {'(top level)': 6, 'f': 26})
+        self.assertEqual(profile.get_source_line_costs()[-1], ('f', 'pop(itob(1) b* itob(2))', 26))
+
+    def test_amm_approval_program(self):
+        profiler = CostProfiler()
+        self.assertLessEqual(len(profiler.instrumented_program.bytecode), 8192)
+
+
+class TestCostProfiler(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.profiler = CostProfiler()
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=1_000_000)
+
+    def get_swap_transactions(self):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=10_000,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-input", 9000],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 2000
+        return txn_group
+
+    def test_swap(self):
+        txn_group = self.get_swap_transactions()
+
+        profiles = self.profiler.profile(self.ledger, txn_group, {self.user_addr: self.user_sk}, self.sp)
+        self.assertEqual(len(profiles), 1)
+        profile = profiles[0]
+        self.assertEqual(profile.txn_index, 1)
+
+        scope_costs = profile.get_scope_costs()
+        self.assertEqual(sum(scope_costs.values()), profile.total_cost)
+        self.assertLessEqual(profile.total_cost, 700)
+        self.assertIn('main.amm.swap', scope_costs)
+        self.assertNotIn('calculate_fixed_output_swap', scope_costs)
+        # Straight line function, every op is executed once
+        static_cost = sum(op.cost for op in self.profiler.ops if op.scope == 'calculate_fixed_input_swap')
+        self.assertEqual(scope_costs['calculate_fixed_input_swap'], static_cost)
+
+        # The ledger is not changed
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_1_id)[0], 1_000_000)
+        self.assertIs(self.ledger.apps[APPLICATION_ID]['approval_program'], amm_approval_program)
+
+    def test_profile_after_evaluation(self):
+        # The ledger keeps the sqlite connections of the evaluation, the profiler copies it
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(self.get_swap_transactions()), self.user_sk))
+        asset_1_reserves = self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves']
+        self.assertGreater(asset_1_reserves, 1_000_000)
+
+        profiles = self.profiler.profile(self.ledger, self.get_swap_transactions(), {self.user_addr: self.user_sk}, self.sp)
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('main.amm.swap', profiles[0].get_scope_costs())
+        self.assertEqual(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], asset_1_reserves)
+
+        # The ledger can still evaluate groups
+        self.ledger.eval_transactions(self.sign_txns(transaction.assign_group_id(self.get_swap_transactions()), self.user_sk))
+        self.assertGreater(self.ledger.get_local_state(self.pool_address, APPLICATION_ID)[b'asset_1_reserves'], asset_1_reserves)
+
+    def evaluate_probe_loop(self, call_count, initial_count):
+        self.ledger.create_app(app_id=PROBE_LOOP_APP_ID, approval_program=TealProgram(teal=PROBE_LOOP_TEAL))
+        txn_group = [
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=PROBE_LOOP_APP_ID,
+                app_args=[call_count if i == 0 else 0, initial_count.to_bytes(8, 'big')],
+                note=i.to_bytes(1, 'big'),
+            )
+            # The other app calls pool their budget with the first one
+            for i in range(MAX_GROUP_SIZE)
+        ]
+        txn_group = transaction.assign_group_id(txn_group)
+        block = self.ledger.eval_transactions([txn.sign(self.user_sk) for txn in txn_group])
+        counters = block[b'txns'][0][b'dt'][b'lg'][-1]
+        return int.from_bytes(counters[8:16], 'big')
+
+    def test_probe_counters(self):
+        # The counters do not wrap at 255
+        self.assertEqual(self.evaluate_probe_loop(300, 0), 300)
+        self.assertEqual(self.evaluate_probe_loop(1, 2**32), 2**32 + 1)
+
+        with self.assertRaises(LogicEvalError) as e:
+            self.evaluate_probe_loop(1, MAX_UINT64)
+        self.assertIn('+ overflowed', e.exception.error)
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from algojig import TealishProgram
+
+from . import program_cache
+from .program_cache import LazyTealishProgram, load_tealish_program
+
+
+class TestProgramCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        patcher = patch.object(program_cache, 'PROGRAM_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_load_tealish_program(self):
+        filename = 'contracts/pool_template.tl'
+        compiled_program = TealishProgram(filename)
+
+        program = load_tealish_program(filename)
+        self.assertEqual(program.bytecode, compiled_program.bytecode)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        with patch('algojig.TealishProgram') as tealish_program:
+            program = load_tealish_program(filename)
+            tealish_program.assert_not_called()
+        self.assertEqual(program.bytecode, compiled_program.bytecode)
+        self.assertEqual(program.filename, filename)
+        self.assertEqual(program.teal, compiled_program.teal)
+
+    def test_source_change(self):
+        filename = os.path.join(self.tmp_dir.name, 'program.tl')
+        shutil.copy('tests/dummy_program.tl', filename)
+        program = load_tealish_program(filename)
+
+        with open(filename, 'a') as f:
+            f.write('\n# changed\n')
+        changed_program = load_tealish_program(filename)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertNotEqual(program.tealish_source, changed_program.tealish_source)
+
+    def test_corrupted_cache(self):
+        filename = 'contracts/pool_template.tl'
+        program = load_tealish_program(filename)
+        cache_path = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(cache_path, 'wb') as f:
+            f.write(b'corrupted')
+
+        self.assertEqual(load_tealish_program(filename).bytecode, program.bytecode)
+
+    def test_lazy_tealish_program(self):
+        filename = 'contracts/pool_template.tl'
+        program = LazyTealishProgram(filename)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+        self.assertEqual(program.bytecode, load_tealish_program(filename).bytecode)
+        self.assertEqual(program.filename, filename)
+        with patch('algojig.TealishProgram') as tealish_program:
+            program.teal
+            tealish_program.assert_not_called()
@@ -0,0 +1,195 @@
+import random
+import unittest
+
+from .amm_math import LogicError, check_invariant
+from .constants import *
+from .quotes import (RemoveLiquidityQuote, SwapQuote, get_add_initial_liquidity_quote, get_add_initial_liquidity_quotes,
+                     get_add_liquidity_quote, get_add_liquidity_quotes, get_fixed_input_swap_quote, get_fixed_input_swap_quotes,
+                     get_fixed_output_swap_quote, get_fixed_output_swap_quotes, get_remove_liquidity_quote, get_remove_liquidity_quotes)
+
+BOUNDARY_VALUES = [0, 1, 2, 3, 2**32 - 1, 2**32, 2**32 + 1, 2**63 - 1, 2**63, MAX_UINT64 - 1, MAX_UINT64]
+
+
+def random_amount(rng):
+    if rng.random() < 0.2:
+        return rng.choice(BOUNDARY_VALUES)
+    return rng.randrange(0, 10 ** rng.randint(1, 19))
+
+
+class TestSwapQuotes(unittest.TestCase):
+
+    def test_fixed_input_swap_quote(self):
+        quote = get_fixed_input_swap_quote(1_000_000, 1_000_000, 10_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(quote, SwapQuote(input_amount=10_000, swap_amount=9970, change=0, output_amount=9871, poolers_fee_amount=25, protocol_fee_amount=5, total_fee_amount=30))
+
+        with self.assertRaises(LogicError) as e:
+            get_fixed_input_swap_quote(1_000_000, 1_000_000, 100, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(str(e.exception), 'assert(total_fee_amount)')
+
+    def test_fixed_output_swap_quote(self):
+        quote = get_fixed_output_swap_quote(1_000_000, 1_000_000, 9871, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, input_amount=10_100)
+        self.assertEqual(quote, SwapQuote(input_amount=10_100, swap_amount=9970, change=100, output_amount=9871, poolers_fee_amount=25, protocol_fee_amount=5, total_fee_amount=30))
+
+        with self.assertRaises(LogicError) as e:
+            get_fixed_output_swap_quote(1_000_000, 1_000_000, 9871, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, input_amount=9999)
+        self.assertEqual(str(e.exception), 'assert(input_amount >= required_input_amount)')
+
+    def test_batch_quotes(self):
+        rng = random.Random(0)
+        size = 20_000
+        input_supplies = [random_amount(rng) for _ in range(size)]
+        output_supplies = [random_amount(rng) for _ in range(size)]
+        amounts = [random_amount(rng) for _ in range(size)]
+        total_fee_shares = [rng.randint(1, 100) for _ in range(size)]
+        # The total fee is larger than the amount
+        total_fee_shares[:size // 100] = [rng.randint(10_001, 100_000) for _ in range(size // 100)]
+        protocol_fee_ratios = [rng.randint(3, 10) for _ in range(size)]
+
+        for get_quote, get_quotes in [(get_fixed_input_swap_quote, get_fixed_input_swap_quotes), (get_fixed_output_swap_quote, get_fixed_output_swap_quotes)]:
+            quotes = get_quotes(input_supplies, output_supplies, amounts, total_fee_shares, protocol_fee_ratios)
+            for i in range(size):
+                try:
+                    quote = get_quote(input_supplies[i], output_supplies[i], amounts[i], total_fee_shares[i], protocol_fee_ratios[i])
+                except LogicError:
+                    quote = None
+
+                if quote is None:
+                    self.assertFalse(quotes.valid[i])
+                else:
+                    self.assertTrue(quotes.valid[i])
+                    self.assertEqual(SwapQuote(*(int(getattr(quotes, field)[i]) for field in SwapQuote._fields)), quote)
+
+    def test_invariant(self):
+        rng = random.Random(1)
+        for _ in range(10_000):
+            input_supply, output_supply, amount = random_amount(rng), random_amount(rng), random_amount(rng)
+            for get_quote in [get_fixed_input_swap_quote, get_fixed_output_swap_quote]:
+                try:
+                    quote = get_quote(input_supply, output_supply, amount, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+                except LogicError:
+                    continue
+                final_input_supply = input_supply + quote.swap_amount + quote.poolers_fee_amount
+                final_output_supply = output_supply - quote.output_amount
+                self.assertTrue(check_invariant(input_supply, output_supply, final_input_supply, final_output_supply, quote.poolers_fee_amount, 0).passed)
+
+    def test_batch_quotes_broadcast(self):
+        input_amounts = [1_000, 10_000, 100_000, 10**12]
+        quotes = get_fixed_input_swap_quotes(1_000_000, 1_000_000, input_amounts, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(quotes.valid.tolist(), [True, True, True, True])
+        self.assertEqual(quotes.output_amount.tolist(), [get_fixed_input_swap_quote(1_000_000, 1_000_000, amount, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO).output_amount for amount in input_amounts])
+
+
+class TestAddLiquidityQuotes(unittest.TestCase):
+
+    def test_add_initial_liquidity_quote(self):
+        quote = get_add_initial_liquidity_quote(10_000, 15_000)
+        self.assertEqual((quote.pool_tokens_out, quote.issued_pool_tokens), (12247 - LOCKED_POOL_TOKENS, 12247))
+        quote = get_add_initial_liquidity_quote(MAX_ASSET_AMOUNT, MAX_ASSET_AMOUNT)
+        self.assertEqual(quote.pool_tokens_out, MAX_ASSET_AMOUNT - LOCKED_POOL_TOKENS)
+
+        with self.assertRaises(LogicError) as e:
+            get_add_initial_liquidity_quote(LOCKED_POOL_TOKENS, LOCKED_POOL_TOKENS)
+        self.assertEqual(str(e.exception), 'assert(issued_pool_tokens > LOCKED_POOL_TOKENS)')
+
+    def test_add_liquidity_quote(self):
+        # Expected values are from tests_add_liquidity
+        cases = [
+            ((1_000_000, 1_000_000, 1_000_000, 10_000, 10_001), 10000),
+            ((1_000_000, 1_250_000, 1_118_033, 10_000, 12_500), 11180),
+            ((100_000_000, 1_000_000, 10_000_000, 5_432_198, 1_234_567), 5344406),
+            ((100_000_000, 1_000_000, 10_000_000, 1_234_567, 5_432_198), 15508778),
+            ((LOCKED_POOL_TOKENS + 1, LOCKED_POOL_TOKENS + 1, LOCKED_POOL_TOKENS + 1, MAX_ASSET_AMOUNT - (LOCKED_POOL_TOKENS + 1), MAX_ASSET_AMOUNT - (LOCKED_POOL_TOKENS + 1)), MAX_ASSET_AMOUNT - (LOCKED_POOL_TOKENS + 1)),
+        ]
+        for args, pool_tokens_out in cases:
+            quote = get_add_liquidity_quote(*args, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+            self.assertEqual(quote.pool_tokens_out, pool_tokens_out)
+
+        # Single
+        quote = get_add_liquidity_quote(10_000, 15_000, 12247, 10_000, 0, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual((quote.pool_tokens_out, quote.protocol_fee_amount, quote.swap_from_asset_1), (5067, 2, True))
+        self.assertEqual(quote.asset_1_reserves, 20_000 - 2)
+        self.assertEqual(quote.issued_pool_tokens, 12247 + 5067)
+
+        with self.assertRaises(LogicError):
+            get_add_liquidity_quote(MAX_ASSET_AMOUNT // 2, MAX_ASSET_AMOUNT // 2, MAX_ASSET_AMOUNT // 2, MAX_ASSET_AMOUNT // 2 + 2, 0, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+
+    def test_batch_quotes(self):
+        rng = random.Random(0)
+        size = 2_000
+        args = [[random_amount(rng) for _ in range(size)] for _ in range(5)]
+        quotes = get_add_liquidity_quotes(*args, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        for i in range(size):
+            try:
+                quote = get_add_liquidity_quote(*(arg[i] for arg in args), TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+            except LogicError:
+                self.assertFalse(quotes.valid[i])
+            else:
+                self.assertTrue(quotes.valid[i])
+                self.assertEqual(tuple(getattr(quotes, field)[i] for field in quote._fields), quote)
+
+        quotes = get_add_initial_liquidity_quotes([0, 1000, 10_000], 15_000)
+        self.assertEqual(quotes.valid.tolist(), [False, True, True])
+        self.assertEqual(quotes.pool_tokens_out.tolist(), [0, 2872, 11247])
+
+
+class TestRemoveLiquidityQuotes(unittest.TestCase):
+
+    def test_remove_liquidity_quote(self):
+        quote = get_remove_liquidity_quote(1_000_000, 1_000_000, 1_000_000, 5_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(quote, RemoveLiquidityQuote(5_000, 5_000, 5_000, 0, 0, 0, 0, 0, 995_000, 995_000, 995_000))
+
+        # Remove all circulating pool tokens
+        quote = get_remove_liquidity_quote(100_000_000, 1, 10_000, 10_000 - LOCKED_POOL_TOKENS, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual((quote.asset_1_amount, quote.asset_2_amount, quote.issued_pool_tokens), (100_000_000, 1, 0))
+
+        with self.assertRaises(LogicError) as e:
+            get_remove_liquidity_quote(100_000_000, 1, 10_000, 500, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO)
+        self.assertEqual(str(e.exception), 'assert(asset_1_amount && asset_2_amount)')
+
+    def test_remove_liquidity_single_quote(self):
+        # Expected values are from tests_remove_liquidity
+        quote = get_remove_liquidity_quote(1_000_000, 1_000_000, 1_000_000, 5_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, single_asset=1)
+        self.assertEqual((quote.asset_1_amount, quote.asset_2_amount, quote.protocol_fee_amount), (9960, 0, 2))
+        self.assertEqual((quote.asset_1_reserves, quote.asset_2_reserves, quote.issued_pool_tokens), (1_000_000 - 9960, 1_000_000 - 2, 995_000))
+        self.assertEqual(quote.swap_amount + quote.total_fee_amount, 5_000)
+
+        quote = get_remove_liquidity_quote(1_000_000, 1_000_000, 1_000_000, 5_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, single_asset=2)
+        self.assertEqual((quote.asset_1_amount, quote.asset_2_amount), (0, 9960))
+
+        with self.assertRaises(LogicError) as e:
+            get_remove_liquidity_quote(1_000_000, 1_000_000, 1_000_000, 999_000, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, single_asset=1)
+        self.assertEqual(str(e.exception), 'assert(issued_pool_tokens > 0)')
+
+    def test_batch_quotes(self):
+        rng = random.Random(0)
+        size = 20_000
+        issued_pool_tokens = [random_amount(rng) for _ in range(size)]
+        asset_1_reserves = [random_amount(rng) for _ in range(size)]
+        asset_2_reserves = [random_amount(rng) for _ in range(size)]
+        # Mostly valid amounts
+        pool_token_amounts = [rng.choice([random_amount(rng), rng.randint(0, issued), max(issued - LOCKED_POOL_TOKENS, 0)]) for issued in issued_pool_tokens]
+        total_fee_shares = [rng.randint(1, 100) for _ in range(size)]
+        # The total fee is larger than the amount
+        total_fee_shares[:size // 100] = [rng.randint(10_001, 100_000) for _ in range(size // 100)]
+        protocol_fee_ratios = [rng.randint(3, 10) for _ in range(size)]
+
+        for single_asset in [None, 1, 2]:
+            quotes = get_remove_liquidity_quotes(asset_1_reserves, asset_2_reserves, issued_pool_tokens, pool_token_amounts, total_fee_shares, protocol_fee_ratios, single_asset=single_asset)
+            self.assertGreater(quotes.valid.sum(), size // 10)
+            for i in range(size):
+                try:
+                    quote = get_remove_liquidity_quote(asset_1_reserves[i], asset_2_reserves[i], issued_pool_tokens[i], pool_token_amounts[i], total_fee_shares[i], protocol_fee_ratios[i], single_asset=single_asset)
+                except LogicError:
+                    quote = None
+
+                if quote is None:
+                    self.assertFalse(quotes.valid[i])
+                else:
+                    self.assertTrue(quotes.valid[i])
+                    self.assertEqual(RemoveLiquidityQuote(*(int(getattr(quotes, field)[i]) for field in RemoveLiquidityQuote._fields)), quote)
+
+    def test_batch_quotes_broadcast(self):
+        pool_token_amounts = [1_000, 10_000, 100_000, 999_000]
+        quotes = get_remove_liquidity_quotes(1_000_000, 1_000_000, 1_000_000, pool_token_amounts, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, single_asset=2)
+        self.assertEqual(quotes.valid.tolist(), [True, True, True, False])
+        self.assertEqual(quotes.asset_2_amount[:3].tolist(), [get_remove_liquidity_quote(1_000_000, 1_000_000, 1_000_000, amount, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO, single_asset=2).asset_2_amount for amount in pool_token_amounts[:3]])
@@ -0,0 +1,239 @@
+import itertools
+import random
+import unittest
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .amm_math import LogicError
+from .constants import *
+from .core import BaseTestCase
+from .quotes import get_fixed_input_swap_quote
+from .routing import RouteGraph, get_route_transactions, get_split_route_transactions
+from .utils import get_pool_logicsig_bytecode
+
+
+class TestRouting(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+        cls.asset_3_id = 7
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 1_000_000)
+        self.ledger.set_account_balance(self.user_addr, 1_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=self.asset_2_id)
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=self.asset_3_id)
+        self.pool_states = {}
+
+    def set_pool(self, asset_1_id, asset_2_id, asset_1_reserves, asset_2_reserves):
+        pool_address = get_pool_logicsig_bytecode(amm_pool_template, APPLICATION_ID, asset_1_id, asset_2_id).address()
+        self.ledger.set_account_balance(pool_address, 1_000_000)
+        self.ledger.set_auth_addr(pool_address, APPLICATION_ADDRESS)
+        self.ledger.set_account_balance(pool_address, asset_1_reserves, asset_id=asset_1_id)
+        self.ledger.set_account_balance(pool_address, asset_2_reserves, asset_id=asset_2_id)
+        local_state = {
+            b'asset_1_id': asset_1_id,
+            b'asset_2_id': asset_2_id,
+            b'asset_1_reserves': asset_1_reserves,
+            b'asset_2_reserves': asset_2_reserves,
+            b'total_fee_share': TOTAL_FEE_SHARE,
+            b'protocol_fee_ratio': PROTOCOL_FEE_RATIO,
+        }
+        self.ledger.set_local_state(address=pool_address, app_id=APPLICATION_ID, state=local_state)
+        self.pool_states[pool_address] = local_state
+        return pool_address
+
+    def get_route_output_amount(self, route, input_amount):
+        amount = input_amount
+        for hop in route.hops:
+            local_state = self.pool_states[hop.pool_address]
+            reserves = {local_state[b'asset_1_id']: local_state[b'asset_1_reserves'], local_state[b'asset_2_id']: local_state[b'asset_2_reserves']}
+            try:
+                amount = get_fixed_input_swap_quote(reserves[hop.input_asset_id], reserves[hop.output_asset_id], amount, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO).output_amount
+            except LogicError:
+                return None
+        return amount
+
+    def test_two_hops(self):
+        # Same pools as tests_swap_groupped and a shallow direct pool
+        pool_address1 = self.set_pool(self.asset_1_id, self.asset_2_id, 1_000_000, 1_000_000)
+        pool_address2 = self.set_pool(self.asset_2_id, self.asset_3_id, 1_000_000, 1_000_000)
+        self.set_pool(self.asset_3_id, self.asset_1_id, 300_000, 300_000)
+
+        graph = RouteGraph.from_pool_states(self.pool_states)
+        route = graph.find_route(self.asset_1_id, self.asset_3_id, 10_000)
+        self.assertEqual(route.output_amount, 9746)
+        self.assertEqual([(hop.pool_address, hop.output_amount) for hop in route.hops], [(pool_address1, 9871), (pool_address2, 9746)])
+
+        txn_group = transaction.assign_group_id(get_route_transactions(route, self.user_addr, self.sp))
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], 0)
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_3_id)[0], 9746)
+
+        # The direct pool is better for small amounts
+        route = graph.find_route(self.asset_1_id, self.asset_3_id, 1000)
+        self.assertEqual(len(route.hops), 1)
+        self.assertEqual(route.hops[0].input_asset_id, self.asset_1_id)
+        self.assertEqual((route.hops[0].asset_1_id, route.hops[0].asset_2_id), (self.asset_3_id, self.asset_1_id))
+
+        self.assertEqual(len(graph.find_route(self.asset_1_id, self.asset_3_id, 10_000, max_hops=1).hops), 1)
+        self.assertIsNone(graph.find_route(self.asset_1_id, 99, 1000))
+        # No fee, the contract rejects it
+        self.assertIsNone(graph.find_route(self.asset_1_id, self.asset_3_id, 10))
+
+    def test_slippage(self):
+        self.set_pool(self.asset_1_id, self.asset_2_id, 1_000_000, 1_000_000)
+        self.set_pool(self.asset_2_id, self.asset_3_id, 1_000_000, 1_000_000)
+
+        route = RouteGraph.from_pool_states(self.pool_states).find_route(self.asset_1_id, self.asset_3_id, 10_000)
+        txn_group = get_route_transactions(route, self.user_addr, self.sp, slippage=100)
+        # min_output of the first hop is sent to the second pool
+        min_output = int.from_bytes(txn_group[1].app_args[2], 'big')
+        self.assertEqual(min_output, 9871 - 98)
+        self.assertEqual(txn_group[2].amount, min_output)
+        self.assertLessEqual(int.from_bytes(txn_group[3].app_args[2], 'big'), get_fixed_input_swap_quote(1_000_000, 1_000_000, min_output, TOTAL_FEE_SHARE, PROTOCOL_FEE_RATIO).output_amount)
+
+        txn_group = transaction.assign_group_id(txn_group)
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], 98)
+
+    def test_slippage_three_hops(self):
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=9)
+        self.set_pool(self.asset_1_id, self.asset_2_id, 1_000_000, 3_000_000)
+        self.set_pool(self.asset_2_id, self.asset_3_id, 5_000_000, 700_000)
+        self.set_pool(self.asset_3_id, 9, 400_000, 2_000_000)
+
+        route = RouteGraph.from_pool_states(self.pool_states).find_route(self.asset_1_id, 9, 10_000)
+        self.assertEqual(len(route.hops), 3)
+        slippage = 250
+        txn_group = get_route_transactions(route, self.user_addr, self.sp, slippage=slippage)
+
+        # The min_output of every hop is the quote of the reduced amount which is sent to the pool
+        amount = route.input_amount
+        for i, hop in enumerate(route.hops):
+            self.assertEqual(txn_group[2 * i].amount, amount)
+            output_amount = self.get_route_output_amount(route._replace(hops=[hop]), amount)
+            min_output = output_amount - output_amount * slippage // 10000
+            self.assertEqual(int.from_bytes(txn_group[2 * i + 1].app_args[2], 'big'), min_output)
+            amount = min_output
+        self.assertLess(amount, route.output_amount)
+
+        txn_group = transaction.assign_group_id(txn_group)
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, 9)[0], output_amount)
+        # The slippage of the intermediate assets is left in the account
+        self.assertGreater(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], 0)
+        self.assertGreater(self.ledger.get_account_balance(self.user_addr, self.asset_3_id)[0], 0)
+
+    def test_split(self):
+        self.ledger.set_account_balance(self.user_addr, 0, asset_id=9)
+        self.set_pool(self.asset_1_id, self.asset_2_id, 1_000_000, 1_000_000)
+        self.set_pool(self.asset_3_id, self.asset_1_id, 1_000_000, 1_000_000)
+        self.set_pool(self.asset_3_id, self.asset_2_id, 2_000_000, 2_000_000)
+        self.set_pool(9, self.asset_1_id, 500_000, 500_000)
+        self.set_pool(9, self.asset_2_id, 500_000, 500_000)
+        graph = RouteGraph.from_pool_states(self.pool_states)
+
+        input_amount = 300_000
+        routes = graph.find_split_routes(self.asset_1_id, self.asset_2_id, input_amount)
+        self.assertEqual([len(route.hops) for route in routes], [1, 2, 2])
+        self.assertEqual(sum(route.input_amount for route in routes), input_amount)
+        output_amount = sum(route.output_amount for route in routes)
+        self.assertGreater(output_amount, graph.find_route(self.asset_1_id, self.asset_2_id, input_amount).output_amount)
+
+        # One more unit to any other route does not increase the output
+        for route in routes:
+            for other_route in routes:
+                if route is not other_route:
+                    output_amount_after_move = self.get_route_output_amount(route, route.input_amount - 1) + self.get_route_output_amount(other_route, other_route.input_amount + 1)
+                    self.assertLessEqual(output_amount_after_move, route.output_amount + other_route.output_amount)
+
+        txn_group = transaction.assign_group_id(get_split_route_transactions(routes, self.user_addr, self.sp))
+        self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk))
+        self.assertEqual(self.ledger.get_account_balance(self.user_addr, self.asset_2_id)[0], output_amount)
+
+    def test_split_brute_force(self):
+        self.set_pool(self.asset_1_id, self.asset_2_id, 10_000, 15_000)
+        self.set_pool(self.asset_3_id, self.asset_1_id, 20_000, 9_000)
+        self.set_pool(self.asset_3_id, self.asset_2_id, 30_000, 40_000)
+        graph = RouteGraph.from_pool_states(self.pool_states)
+
+        input_amount = 5_000
+        routes = graph.find_split_routes(self.asset_1_id, self.asset_2_id, input_amount, steps=10)
+        self.assertEqual(len(routes), 2)
+        best_output_amount = 0
+        for amount in range(input_amount + 1):
+            output_amounts = [self.get_route_output_amount(route, a) for route, a in zip(routes, [amount, input_amount - amount])]
+            if None not in output_amounts:
+                best_output_amount = max(best_output_amount, sum(output_amounts))
+        self.assertEqual(sum(route.output_amount for route in routes), best_output_amount)
+
+        self.assertEqual(graph.find_split_routes(self.asset_1_id, 99, input_amount), [])
+
+
+class TestRoutingSearch(unittest.TestCase):
+
+    def get_pool_states(self, pool_count, asset_count, seed):
+        rng = random.Random(seed)
+        pool_states = {}
+        for i, (asset_1_id, asset_2_id) in enumerate(rng.sample(list(itertools.combinations(range(1, asset_count + 1), 2)), pool_count)):
+            pool_states[generate_account()[1]] = {
+                b'asset_1_id': asset_2_id,
+                b'asset_2_id': asset_1_id,
+                b'asset_1_reserves': rng.randint(1, 10**12),
+                b'asset_2_reserves': rng.randint(1, 10**12),
+                b'total_fee_share': rng.randint(1, 100),
+                b'protocol_fee_ratio': rng.randint(3, 10),
+                b'lock': int(i % 50 == 0),
+            }
+        return pool_states
+
+    def get_best_output(self, pool_states, input_asset_id, output_asset_id, input_amount, max_hops):
+        # Depth first search of the routes which use a pool at most once
+        edges = []
+        for local_state in pool_states.values():
+            if local_state[b'lock']:
+                continue
+            edges.append((local_state[b'asset_1_id'], local_state[b'asset_2_id'], local_state[b'asset_1_reserves'], local_state[b'asset_2_reserves'], local_state))
+            edges.append((local_state[b'asset_2_id'], local_state[b'asset_1_id'], local_state[b'asset_2_reserves'], local_state[b'asset_1_reserves'], local_state))
+
+        def search(asset_id, amount, used, hops):
+            best = amount if asset_id == output_asset_id and hops else 0
+            if hops == max_hops:
+                return best
+            for src, dst, input_supply, output_supply, local_state in edges:
+                if src != asset_id or id(local_state) in used:
+                    continue
+                try:
+                    quote = get_fixed_input_swap_quote(input_supply, output_supply, amount, local_state[b'total_fee_share'], local_state[b'protocol_fee_ratio'])
+                except LogicError:
+                    continue
+                best = max(best, search(dst, quote.output_amount, used | {id(local_state)}, hops + 1))
+            return best
+
+        return search(input_asset_id, input_amount, frozenset(), 0)
+
+    def test_best_route(self):
+        pool_states = self.get_pool_states(pool_count=40, asset_count=12, seed=1)
+        graph = RouteGraph.from_pool_states(pool_states)
+        rng = random.Random(2)
+        for _ in range(30):
+            input_asset_id, output_asset_id = rng.sample(range(1, 13), 2)
+            input_amount = rng.choice([10**3, 10**6, 10**9, 10**11])
+            route = graph.find_route(input_asset_id, output_asset_id, input_amount)
+            best_output = self.get_best_output(pool_states, input_asset_id, output_asset_id, input_amount, max_hops=3)
+            self.assertEqual(route.output_amount if route else 0, best_output)
+            if route:
+                self.assertEqual(route.hops[0].input_amount, input_amount)
+                self.assertEqual(route.hops[-1].output_asset_id, output_asset_id)
+                self.assertEqual(len({hop.pool_address for hop in route.hops}), len(route.hops))
@@ -18,7 +18,7 @@ class TestSetFee(BaseTestCase):
         cls.asset_1_id = 5
         cls.asset_2_id = 2
 
-    def reset_ledger(self):
+    def build_ledger(self):
         self.ledger = JigLedger()
         self.create_amm_app()
         self.ledger.set_account_balance(self.user_addr, 1_000_000)
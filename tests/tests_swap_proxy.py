@@ -6,8 +6,9 @@ from algosdk.future import transaction
 
 from .constants import *
 from .core import BaseTestCase
+from .program_cache import LazyTealishProgram
 
-proxy_approval_program = TealishProgram('tests/proxy_approval_program.tl')
+proxy_approval_program = LazyTealishProgram('tests/proxy_approval_program.tl')
 PROXY_APP_ID = 10
 PROXY_ADDRESS = get_application_address(PROXY_APP_ID)
 
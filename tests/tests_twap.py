@@ -0,0 +1,123 @@
+import unittest
+
+from algojig import get_suggested_params
+from algojig.ledger import JigLedger
+from algosdk.account import generate_account
+from algosdk.future import transaction
+
+from .constants import *
+from .core import BaseTestCase
+from .pool_state import PoolStateStore
+from .twap import Observation, ObservationBuffer, TWAPOracle, extrapolate_cumulative_prices
+from .utils import int_to_bytes_without_zero_padding
+
+BOOTSTRAP_TIMESTAMP = 1_640_995_200
+DAY = 24 * 60 * 60
+
+
+class TestTWAP(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sp = get_suggested_params()
+        cls.app_creator_sk, cls.app_creator_address = generate_account()
+        cls.user_sk, cls.user_addr = generate_account()
+        cls.asset_1_id = 5
+        cls.asset_2_id = 2
+
+    def setUp(self):
+        self.ledger = JigLedger()
+        self.create_amm_app()
+        self.ledger.set_account_balance(self.user_addr, 10_000_000)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_1_id)
+        self.ledger.set_account_balance(self.user_addr, 200_000_000, asset_id=self.asset_2_id)
+
+        self.pool_address, self.pool_token_asset_id = self.bootstrap_pool(self.asset_1_id, self.asset_2_id)
+        self.ledger.opt_in_asset(self.user_addr, self.pool_token_asset_id)
+        self.set_initial_pool_liquidity(self.pool_address, self.asset_1_id, self.asset_2_id, self.pool_token_asset_id, asset_1_reserves=1_000_000, asset_2_reserves=4_000_000, liquidity_provider_address=self.user_addr)
+        self.ledger.update_local_state(address=self.pool_address, app_id=APPLICATION_ID, state_delta={b'cumulative_price_update_timestamp': BOOTSTRAP_TIMESTAMP})
+
+    def swap(self, amount, block_timestamp):
+        txn_group = [
+            transaction.AssetTransferTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                receiver=self.pool_address,
+                index=self.asset_1_id,
+                amt=amount,
+            ),
+            transaction.ApplicationNoOpTxn(
+                sender=self.user_addr,
+                sp=self.sp,
+                index=APPLICATION_ID,
+                app_args=[METHOD_SWAP, "fixed-input", 0],
+                foreign_assets=[self.asset_1_id, self.asset_2_id],
+                accounts=[self.pool_address],
+            )
+        ]
+        txn_group[1].fee = 2000
+        txn_group = transaction.assign_group_id(txn_group)
+        return self.ledger.eval_transactions(self.sign_txns(txn_group, self.user_sk), block_timestamp=block_timestamp)
+
+    def test_twap(self):
+        store = PoolStateStore.from_ledger(self.ledger)
+        oracle = TWAPOracle()
+        oracle.add_pool_state(self.pool_address, store.get(self.pool_address))
+
+        observations = [oracle.get_cumulative_prices(self.pool_address, BOOTSTRAP_TIMESTAMP)]
+        for i, amount in enumerate([100_000, 200_000, 50_000], start=1):
+            timestamp = BOOTSTRAP_TIMESTAMP + i * DAY
+            # The cumulative prices after the last observation are extrapolated from the reserves
+            extrapolated = oracle.get_cumulative_prices(self.pool_address, timestamp)
+            store.apply_block(self.swap(amount, block_timestamp=timestamp))
+            pool_state = store.get(self.pool_address)
+            self.assertEqual(extrapolated, Observation(timestamp, pool_state.asset_1_cumulative_price, pool_state.asset_2_cumulative_price))
+            oracle.add_pool_state(self.pool_address, pool_state)
+            observations.append(extrapolated)
+
+        # price_oracle_reader.tl
+        first, last = observations[0], observations[-1]
+        self.assertEqual(
+            oracle.get_twap(self.pool_address, first.timestamp, last.timestamp),
+            ((last.asset_1_cumulative_price - first.asset_1_cumulative_price) // (3 * DAY), (last.asset_2_cumulative_price - first.asset_2_cumulative_price) // (3 * DAY)),
+        )
+        # The first day, the price of asset 1 is 4
+        self.assertEqual(oracle.get_twap(self.pool_address, BOOTSTRAP_TIMESTAMP, BOOTSTRAP_TIMESTAMP + DAY // 2), (4 * PRICE_SCALE_FACTOR, PRICE_SCALE_FACTOR // 4))
+        asset_1_price, asset_2_price = oracle.get_twap(self.pool_address, BOOTSTRAP_TIMESTAMP + DAY // 2, BOOTSTRAP_TIMESTAMP + 5 * DAY // 2)
+        self.assertLess(asset_1_price, 4 * PRICE_SCALE_FACTOR)
+        self.assertGreater(asset_2_price, PRICE_SCALE_FACTOR // 4)
+
+        with self.assertRaises(ValueError):
+            oracle.get_twap(self.pool_address, BOOTSTRAP_TIMESTAMP - 1, BOOTSTRAP_TIMESTAMP + DAY)
+
+
+class TestObservationBuffer(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        buffer = ObservationBuffer(capacity=4)
+        for timestamp in range(10, 100, 10):
+            buffer.append(Observation(timestamp, timestamp * 2, timestamp * 3))
+        # The same block
+        buffer.append(Observation(90, 0, 0))
+        with self.assertRaises(ValueError):
+            buffer.append(Observation(80, 0, 0))
+
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual([buffer[i].timestamp for i in range(4)], [60, 70, 80, 90])
+        self.assertEqual(buffer[-1], Observation(90, 180, 270))
+        self.assertEqual([buffer.bisect_right(timestamp) for timestamp in [50, 60, 65, 90, 100]], [0, 1, 1, 4, 4])
+
+    def test_oracle(self):
+        oracle = TWAPOracle(capacity=3)
+        # Longer than 8 bytes
+        cumulative_price = 10**30 * PRICE_SCALE_FACTOR
+        for i in range(5):
+            oracle.add_observation('pool', 1000 + i * 100, int_to_bytes_without_zero_padding(cumulative_price + i * 100 * 3 * PRICE_SCALE_FACTOR), cumulative_price)
+
+        self.assertEqual(oracle.get_twap('pool', 1250, 1350), (3 * PRICE_SCALE_FACTOR, 0))
+        with self.assertRaises(ValueError):
+            oracle.get_cumulative_prices('pool', 1150)
+        with self.assertRaises(ValueError):
+            oracle.get_cumulative_prices('pool', 1500)
+        self.assertEqual(oracle.get_twap('pool', 1300, 1500, reserves=(1, 2)), (5 * PRICE_SCALE_FACTOR // 2, PRICE_SCALE_FACTOR // 4))
+        self.assertEqual(extrapolate_cumulative_prices(Observation(0, 1, 2), 0, 5, 10), Observation(10, 1, 2))
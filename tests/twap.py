@@ -0,0 +1,162 @@
+"""
+Time weighted average prices from the cumulative prices of the pools.
+
+update_price_oracle adds reserves_out * 2^64 * time_delta / reserves_in to the cumulative price of each asset,
+a TWAP is the difference of two cumulative prices divided by the time between them (see price_oracle_reader.tl).
+The cumulative prices are big-endian byte strings which get longer over time, they are kept as Python ints.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .constants import PRICE_SCALE_FACTOR
+
+Observation = namedtuple('Observation', ['timestamp', 'asset_1_cumulative_price', 'asset_2_cumulative_price'])
+
+
+def _to_int(value):
+    return int.from_bytes(value, 'big') if isinstance(value, bytes) else value
+
+
+def extrapolate_cumulative_prices(observation, asset_1_reserves, asset_2_reserves, timestamp):
+    """
+    Returns the Observation of the cumulative prices at the timestamp as update_price_oracle would calculate them,
+    the reserves are the reserves of the pool since the observation.
+    """
+    time_delta = timestamp - observation.timestamp
+    if time_delta < 0:
+        raise ValueError('The timestamp is before the observation.')
+    asset_1_cumulative_price = observation.asset_1_cumulative_price
+    asset_2_cumulative_price = observation.asset_2_cumulative_price
+    if asset_1_reserves and asset_2_reserves and time_delta:
+        asset_1_cumulative_price += (asset_2_reserves * PRICE_SCALE_FACTOR * time_delta) // asset_1_reserves
+        asset_2_cumulative_price += (asset_1_reserves * PRICE_SCALE_FACTOR * time_delta) // asset_2_reserves
+    return Observation(timestamp, asset_1_cumulative_price, asset_2_cumulative_price)
+
+
+class ObservationBuffer:
+    """
+    Ring buffer of the observations of a pool, the oldest one is overwritten when it is full.
+    The timestamps are in an array for the binary search, the cumulative prices are ints of any length.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.asset_1_cumulative_prices = [0] * capacity
+        self.asset_2_cumulative_prices = [0] * capacity
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _index(self, i):
+        return (self.start + i) % self.capacity
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        j = self._index(i)
+        return Observation(int(self.timestamps[j]), self.asset_1_cumulative_prices[j], self.asset_2_cumulative_prices[j])
+
+    def append(self, observation):
+        if self.count and observation.timestamp <= self[-1].timestamp:
+            if observation.timestamp == self[-1].timestamp:
+                # The oracle is updated once per block
+                return
+            raise ValueError('The observations must be in timestamp order.')
+        if self.count == self.capacity:
+            j = self.start
+            self.start = self._index(1)
+        else:
+            j = self._index(self.count)
+            self.count += 1
+        self.timestamps[j] = observation.timestamp
+        self.asset_1_cumulative_prices[j] = observation.asset_1_cumulative_price
+        self.asset_2_cumulative_prices[j] = observation.asset_2_cumulative_price
+
+    def bisect_right(self, timestamp):
+        """ Returns the number of observations at or before the timestamp """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self._index(middle)] <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class TWAPOracle:
+    """
+    Observations of the cumulative prices per pool, queries are O(log n) in the number of observations of the pool.
+
+    Between two observations the cumulative prices are interpolated linearly, which is exact if the oracle was not
+    updated in between. After the last observation they are extrapolated from the reserves like update_price_oracle.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.buffers = {}
+        # The reserves after the last observation, for the extrapolation
+        self.reserves = {}
+
+    def add_observation(self, pool_address, timestamp, asset_1_cumulative_price, asset_2_cumulative_price):
+        """ The cumulative prices can be the bytes of the local state or ints """
+        buffer = self.buffers.get(pool_address)
+        if buffer is None:
+            buffer = self.buffers[pool_address] = ObservationBuffer(self.capacity)
+        buffer.append(Observation(timestamp, _to_int(asset_1_cumulative_price), _to_int(asset_2_cumulative_price)))
+
+    def add_pool_state(self, pool_address, pool_state):
+        """ Observes a PoolState of PoolStateStore, the reserves are kept for the extrapolation """
+        self.add_observation(pool_address, pool_state.cumulative_price_update_timestamp, pool_state.asset_1_cumulative_price, pool_state.asset_2_cumulative_price)
+        self.reserves[pool_address] = (pool_state.asset_1_reserves, pool_state.asset_2_reserves)
+
+    def get_cumulative_prices(self, pool_address, timestamp, reserves=None):
+        """
+        Returns the Observation of the cumulative prices at the timestamp.
+        reserves (asset_1_reserves, asset_2_reserves) are needed after the last observation unless add_pool_state is used.
+        """
+        buffer = self.buffers.get(pool_address)
+        if not buffer:
+            raise ValueError(f'There is not any observation of {pool_address}.')
+        i = buffer.bisect_right(timestamp)
+        if i == 0:
+            raise ValueError(f'{timestamp} is before the oldest observation of {pool_address}.')
+
+        before = buffer[i - 1]
+        if before.timestamp == timestamp:
+            return before
+        if i == len(buffer):
+            reserves = reserves or self.reserves.get(pool_address)
+            if reserves is None:
+                raise ValueError(f'{timestamp} is after the last observation of {pool_address}, the reserves are required.')
+            return extrapolate_cumulative_prices(before, *reserves, timestamp)
+
+        after = buffer[i]
+        time_delta = timestamp - before.timestamp
+        period = after.timestamp - before.timestamp
+        return Observation(
+            timestamp,
+            before.asset_1_cumulative_price + (after.asset_1_cumulative_price - before.asset_1_cumulative_price) * time_delta // period,
+            before.asset_2_cumulative_price + (after.asset_2_cumulative_price - before.asset_2_cumulative_price) * time_delta // period,
+        )
+
+    def get_twap(self, pool_address, start, end, reserves=None):
+        """
+        Returns (asset_1_price, asset_2_price) over [start, end], scaled by PRICE_SCALE_FACTOR like price_oracle_reader.tl.
+        asset_1_price is the price of asset 1 in asset 2.
+        """
+        if end <= start:
+            raise ValueError('The window is empty.')
+        first = self.get_cumulative_prices(pool_address, start, reserves)
+        last = self.get_cumulative_prices(pool_address, end, reserves)
+        time_delta = end - start
+        return (
+            (last.asset_1_cumulative_price - first.asset_1_cumulative_price) // time_delta,
+            (last.asset_2_cumulative_price - first.asset_2_cumulative_price) // time_delta,
+        )
@@ -1,7 +1,24 @@
+import hashlib
+import struct
+from concurrent.futures import ProcessPoolExecutor
 from decimal import ROUND_UP, Decimal
+from functools import lru_cache
 
+from algosdk.encoding import encode_address
 from algosdk.future import transaction
 
+from .logs import iter_int_logs
+
+# These are the bytes of the logicsig template. This needs to be updated if the logicsig is updated.
+POOL_TEMPLATE = b'\x06\x80\x18\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x81\x00[5\x004\x001\x18\x12D1\x19\x81\x01\x12D\x81\x01C'
+
+# The logicsig address is SHA512_256("Program" + program), the bytes before the app id never change.
+_pool_address_hash_prefix = hashlib.new('sha512_256', b'Program' + POOL_TEMPLATE[:3])
+# app_id, asset_1_id, asset_2_id and the rest of the template, reused by every derivation.
+_pool_address_hash_suffix = bytearray(POOL_TEMPLATE[3:])
+
+POOL_ADDRESS_CACHE_SIZE = 2**16
+
 
 def int_to_bytes_without_zero_padding(value):
     length = int((Decimal(value.bit_length()) / 8).quantize(Decimal('1.'), rounding=ROUND_UP))
@@ -14,11 +31,8 @@ def itob(value):
 
 
 def get_pool_logicsig_bytecode(pool_template, app_id, asset_1_id, asset_2_id):
-    # These are the bytes of the logicsig template. This needs to be updated if the logicsig is updated.
     program = bytearray(pool_template.bytecode)
-
-    template = b'\x06\x80\x18\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x81\x00[5\x004\x001\x18\x12D1\x19\x81\x01\x12D\x81\x01C'
-    assert program == bytearray(template)
+    assert program == bytearray(POOL_TEMPLATE)
 
     program[3:11] = app_id.to_bytes(8, 'big')
     program[11:19] = asset_1_id.to_bytes(8, 'big')
@@ -26,12 +40,43 @@ def get_pool_logicsig_bytecode(pool_template, app_id, asset_1_id, asset_2_id):
     return transaction.LogicSigAccount(program)
 
 
+def derive_pool_public_key(app_id, asset_1_id, asset_2_id):
+    """ The 32 bytes public key of the pool logicsig address """
+    struct.pack_into('>QQQ', _pool_address_hash_suffix, 0, app_id, asset_1_id, asset_2_id)
+    h = _pool_address_hash_prefix.copy()
+    h.update(_pool_address_hash_suffix)
+    return h.digest()
+
+
+def derive_pool_address(app_id, asset_1_id, asset_2_id):
+    """ The same as get_pool_logicsig_bytecode(...).address() without building the program """
+    return encode_address(derive_pool_public_key(app_id, asset_1_id, asset_2_id))
+
+
+get_pool_address = lru_cache(maxsize=POOL_ADDRESS_CACHE_SIZE)(derive_pool_address)
+
+
+def _derive_pool_addresses(pools):
+    return [derive_pool_address(app_id, asset_1_id, asset_2_id) for app_id, asset_1_id, asset_2_id in pools]
+
+
+def derive_pool_addresses(pools, processes=None, chunk_size=50_000):
+    """
+    Derives the addresses of (app_id, asset_1_id, asset_2_id) triples in order.
+    If processes is given the triples are split into chunks and derived in a process pool.
+    """
+    pools = list(pools)
+    if not processes or len(pools) <= chunk_size:
+        return _derive_pool_addresses(pools)
+
+    chunks = [pools[i:i + chunk_size] for i in range(0, len(pools), chunk_size)]
+    addresses = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk_addresses in executor.map(_derive_pool_addresses, chunks):
+            addresses.extend(chunk_addresses)
+    return addresses
+
+
 def print_logs(txn):
-    logs = txn[b'dt'].get(b'lg')
-    if logs:
-        for log in logs:
-            if b'%i' in log:
-                i = log.index(b'%i')
-                s = log[0:i].decode()
-                value = int.from_bytes(log[i + 2:], 'big')
-                print(f'{s}: {value}')
+    for name, value in iter_int_logs(txn[b'dt'].get(b'lg', [])):
+        print(f'{name.decode()}: {value}')